@@ -0,0 +1,320 @@
+"""
+BENCHMARK.PY
+
+Measures purge throughput without kicking real people. Starts a local fake Telegram Bot API (getMe, getChat,
+getChatAdministrators, banChatMember, unbanChatMember, sendMessage, editMessageText) with configurable latency and
+injected RetryAfter (429) answers, and a fake Telethon participant source, then runs the same purge path the bot uses
+for scheduled purges (run_policy_purge -> assemble_banned_list -> run_purge) over synthetic chats.
+
+Usage:
+    python benchmark.py --sizes 1000,10000,100000 --latency-ms 30 --retry-after-rate 0.001
+
+Each size prints one JSON result (kicks/s, p50/p95 call latency, total time) tagged with the git commit, and appends it
+to bench_output.txt so runs can be compared across commits.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_CHAT_ID = -1001000000000
+OWNER_ID = 1
+FIRST_USER_ID = 1000
+
+
+# ********* FAKE BOT API *********
+
+class FakeBotAPI:
+    """Minimal HTTP/1.1 server answering the Bot API methods a purge uses, with latency and flood-wait injection."""
+
+    def __init__(self, latency_ms=30, jitter_ms=10, retry_after_rate=0.0, retry_after=1):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.calls = {}
+        self.retry_afters = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method = request_line.split()[1].decode().rsplit('/', 1)[-1]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = await self._answer(method, headers.get('content-type', ''), body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Too Many Requests'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _answer(self, method, content_type, body):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = {}
+        if 'urlencoded' in content_type:
+            params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        elif 'json' in content_type and body:
+            params = json.loads(body)
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if method in ('banChatMember', 'unbanChatMember'):
+            if random.random() < self.retry_after_rate:
+                self.retry_afters += 1
+                return 429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after},
+                }
+            return 200, {'ok': True, 'result': True}
+
+        chat = {'id': int(params.get('chat_id', BENCH_CHAT_ID)), 'type': 'supergroup', 'title': 'Benchmark Chat'}
+        if method == 'getMe':
+            result = {'id': 999, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot',
+                      'can_join_groups': True, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+        elif method == 'getChat':
+            result = chat
+        elif method == 'getChatAdministrators':
+            result = [{'status': 'creator', 'is_anonymous': False, 'user': {'id': OWNER_ID, 'is_bot': False, 'first_name': 'Owner'}}]
+        elif method in ('sendMessage', 'editMessageText'):
+            result = {'message_id': int(params.get('message_id', 1)), 'date': int(time.time()), 'chat': chat, 'text': params.get('text', '')}
+        else:
+            result = True
+        return 200, {'ok': True, 'result': result}
+
+
+# ********* FAKE TELETHON *********
+
+class FakeTelethonPool:
+    """Stands in for the bot's ClientPool. Every client enumerates `size` plain members of the benchmark chat."""
+
+    def __init__(self, size):
+        self.size = size
+
+    @asynccontextmanager
+    async def client(self, group):
+        yield self
+
+    def clients(self):
+        return []
+
+    async def iter_participants(self, chat_id, *args, **kwargs):
+        from telethon.tl.types import ChannelParticipant
+        joined = datetime.utcnow() - timedelta(days=90)
+        for i in range(self.size):
+            user_id = FIRST_USER_ID + i
+            yield SimpleNamespace(
+                id=user_id,
+                first_name=f"User{i}",
+                last_name=None,
+                username=None,
+                participant=ChannelParticipant(user_id=user_id, date=joined),
+            )
+            if i % 1000 == 999:
+                await asyncio.sleep(0)
+
+
+class TimedBot:
+    """Wraps a Bot and records the latency of every kick/ban call, as seen by the bot."""
+
+    def __init__(self, bot, samples):
+        self.bot = bot
+        self.samples = samples
+
+    def __getattr__(self, name):
+        return getattr(self.bot, name)
+
+    async def _timed(self, call, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            self.samples.append((time.perf_counter() - start) * 1000)
+
+    async def ban_chat_member(self, *args, **kwargs):
+        return await self._timed(self.bot.ban_chat_member, *args, **kwargs)
+
+    async def unban_chat_member(self, *args, **kwargs):
+        return await self._timed(self.bot.unban_chat_member, *args, **kwargs)
+
+
+# ********* BENCHMARK *********
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+        return f"{commit}{'-dirty' if dirty else ''}" or None
+    except OSError:
+        return None
+
+
+def install_config(args, work_dir):
+    # kickbot reads config.py at import, so the benchmark provides one in memory
+    config = types.ModuleType('config')
+    config.BOT_TOKEN = '1:bench'
+    config.API_ID = 1
+    config.API_HASH = 'bench'
+    config.DEBUG_CHATS = []
+    config.START_PURGE = ''
+    config.HELP_MESSAGE = ''
+    config.AUTHORIZED_ADMINS = []
+    config.NUM_BATCHES = args.workers
+    config.DATABASE_PATH = os.path.join(work_dir, 'bench.db')
+    config.BOT_API_RATE_LIMIT = args.rate_limit
+    config.HELPER_BOT_RATE_LIMIT = args.rate_limit
+    config.KICK_FLUSH_SIZE = args.flush_size
+    config.KICK_REPORT_SECONDS = 3600
+    sys.modules['config'] = config
+
+
+async def run_benchmark(args):
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+    import kickbot
+    from kick_utils import BotRouter, TokenBucket, percentile
+
+    # Per-user purge logging would measure the console, not the purge
+    logging.getLogger().setLevel(logging.ERROR)
+
+    api = FakeBotAPI(args.latency_ms, args.jitter_ms, args.retry_after_rate, args.retry_after)
+    base_url = await api.start()
+    bots = []
+    for i in range(1 + args.helpers):
+        bot = Bot(f"{i + 1}:bench", base_url=base_url, request=HTTPXRequest(connection_pool_size=256))
+        await bot.initialize()
+        bots.append(bot)
+
+    results = []
+    try:
+        for run_number, size in enumerate(args.sizes):
+            samples = []
+            lanes = [('main', TimedBot(bots[0], samples), kickbot.bot_api_limiter)]
+            lanes += [(f"helper_{i}", TimedBot(bot, samples), TokenBucket(args.rate_limit)) for i, bot in enumerate(bots[1:])]
+            kickbot.kickbot = bots[0]
+            kickbot.bot_router = BotRouter(lanes)
+            kickbot.telethon_pool = FakeTelethonPool(size)
+            kickbot.is_leader = True
+
+            # Keep hold of the executor run_purge() returns, for its counters
+            executors = []
+            run_purge = kickbot.run_purge
+
+            async def recording_run_purge(*purge_args, **purge_kwargs):
+                executor = await run_purge(*purge_args, **purge_kwargs)
+                executors.append(executor)
+                return executor
+
+            kickbot.run_purge = recording_run_purge
+            policy = {'policy_id': run_number, 'chat_id': BENCH_CHAT_ID - run_number, 'inactive_for': '1d', 'ban': False, 'created_by_id': None}
+            retry_afters = api.retry_afters
+            start = time.perf_counter()
+            try:
+                await kickbot.run_policy_purge(policy)
+            finally:
+                kickbot.run_purge = run_purge
+            total_seconds = time.perf_counter() - start
+
+            if not executors:
+                raise RuntimeError(f"The {size} user purge did not reach the kicking stage. See {os.path.join(os.getcwd(), 'app.log')}.")
+            executor = executors[0]
+            kick_seconds = executor.finished - executor.started
+            result = {
+                'commit': git_commit(),
+                'run_at': datetime.utcnow().isoformat(timespec='seconds'),
+                'users': size,
+                'kicked': executor.done,
+                'failed': len(executor.failed),
+                'bots': len(lanes),
+                'kicks_per_second': round(executor.done / kick_seconds, 1) if kick_seconds > 0 else None,
+                'call_p50_ms': round(percentile(samples, 50), 1) if samples else None,
+                'call_p95_ms': round(percentile(samples, 95), 1) if samples else None,
+                'flood_waits': executor.flood_waits,
+                'retry_afters_injected': api.retry_afters - retry_afters,
+                'kick_seconds': round(kick_seconds, 2),
+                'total_seconds': round(total_seconds, 2),
+                'settings': {
+                    'latency_ms': args.latency_ms,
+                    'jitter_ms': args.jitter_ms,
+                    'retry_after_rate': args.retry_after_rate,
+                    'retry_after': args.retry_after,
+                    'rate_limit': args.rate_limit,
+                    'workers': args.workers,
+                    'flush_size': args.flush_size,
+                },
+            }
+            results.append(result)
+            print(json.dumps(result), flush=True)
+    finally:
+        for bot in bots:
+            await bot.shutdown()
+        await api.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge throughput benchmark against a local fake Bot API.")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="Comma-separated purge sizes (synthetic users).")
+    parser.add_argument('--latency-ms', type=float, default=30, help="Mean latency of each fake Bot API call.")
+    parser.add_argument('--jitter-ms', type=float, default=10, help="Random +/- spread around the latency.")
+    parser.add_argument('--retry-after-rate', type=float, default=0.001, help="Share of kick/ban calls answered with a 429 RetryAfter.")
+    parser.add_argument('--retry-after', type=int, default=1, help="Seconds the injected RetryAfter asks for.")
+    parser.add_argument('--rate-limit', type=float, default=1000, help="Requests per second per bot token (BOT_API_RATE_LIMIT).")
+    parser.add_argument('--workers', type=int, default=10, help="Kick workers per bot token (NUM_BATCHES / KICK_MAX_WORKERS).")
+    parser.add_argument('--helpers', type=int, default=0, help="Helper bot tokens to spread the kicks over.")
+    parser.add_argument('--flush-size', type=int, default=500, help="Kick records per database write (KICK_FLUSH_SIZE).")
+    parser.add_argument('--output', default=os.path.join(REPO_DIR, 'bench_output.txt'), help="File the JSON results are appended to.")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    # The bot writes app.log and its database to the working directory, so run it in a scratch one
+    sys.path.insert(0, REPO_DIR)
+    work_dir = tempfile.mkdtemp(prefix='kickbot-bench-')
+    os.chdir(work_dir)
+    install_config(args, work_dir)
+
+    results = asyncio.run(run_benchmark(args))
+    with open(args.output, 'a') as output:
+        for result in results:
+            output.write(json.dumps(result) + '\n')
+
+
+if __name__ == "__main__":
+    main()
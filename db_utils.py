@@ -1,8 +1,12 @@
 import sqlite3
+from array import array
 import pytz
 import csv
 import logging
+import json
 from datetime import datetime, timedelta, timezone
+from collections import Counter
+from contextlib import contextmanager
 from config import DATABASE_PATH
 from telegram.constants import ChatType
 from telegram import ChatMember
@@ -172,6 +176,156 @@ def initialize_db():
             # If the column doesn't exist, add it to the table
             cursor.execute(f"ALTER TABLE group_member ADD COLUMN times_banned BOOLEAN DEFAULT FALSE")
 
+        # The primary keys lead with user_id; the purge planner reads a whole chat at a time
+        cursor.execute("CREATE INDEX IF NOT EXISTS group_member_chat_status_index ON group_member (chat_id, status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS user_activity_channel_index ON user_activity (channel_id, user_id, last_activity)")
+
+    # Create the scan_metrics table if it doesn't exist (one row per completed chat scan)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER,
+                scanned_at TIMESTAMP,
+                iter_seconds REAL,
+                db_update_seconds REAL,
+                ban_leavers_seconds REAL,
+                banned_list_seconds REAL,
+                total_seconds REAL,
+                participant_count INTEGER,
+                joined_count INTEGER,
+                left_count INTEGER,
+                api_calls INTEGER
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS scan_metrics_scanned_at_index ON scan_metrics (scanned_at)")
+        cursor.execute(f"PRAGMA table_info(scan_metrics)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'coverage_shortfall' not in columns:
+            # Members a partitioned scan could not reach with any search query
+            cursor.execute(f"ALTER TABLE scan_metrics ADD COLUMN coverage_shortfall INTEGER")
+
+    # Create the scan_checkpoints table if it doesn't exist (progress of an interrupted room scan)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_checkpoints (
+                chat_id INTEGER PRIMARY KEY,
+                participant_offset INTEGER,
+                participant_count INTEGER,
+                user_ids BLOB,
+                started_at TIMESTAMP,
+                updated_at TIMESTAMP
+            )
+        ''')
+        cursor.execute(f"PRAGMA table_info(scan_checkpoints)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'done_partitions' not in columns:
+            # JSON list of search queries already enumerated by a partitioned scan. NULL for an offset-paged scan.
+            cursor.execute(f"ALTER TABLE scan_checkpoints ADD COLUMN done_partitions TEXT")
+        if 'expected_count' not in columns:
+            # Match count of the '' query seen by a partitioned scan, so a resumed scan can still report its shortfall
+            cursor.execute(f"ALTER TABLE scan_checkpoints ADD COLUMN expected_count INTEGER")
+
+        # Create leader_lease table. One row per lease; the holder renews heartbeat_at/expires_at while it is alive.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS leader_lease (
+                name TEXT PRIMARY KEY,
+                holder TEXT,
+                acquired_at TIMESTAMP,
+                heartbeat_at TIMESTAMP,
+                expires_at TIMESTAMP
+            )
+        ''')
+
+        # Create the purge journal tables: one purge_runs row per purge, one purge_actions row per user acted on
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS purge_runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER,
+                chat_name TEXT,
+                issued_by TEXT,
+                mode TEXT,
+                cutoff_date TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                status TEXT,
+                candidates INTEGER,
+                done INTEGER,
+                failed INTEGER,
+                flood_waits INTEGER
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS purge_actions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER,
+                user_id INTEGER,
+                action TEXT,
+                last_activity TIMESTAMP,
+                kick_number INTEGER,
+                attempts INTEGER,
+                latency_ms REAL,
+                acted_at TIMESTAMP
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS purge_actions_run_index ON purge_actions (run_id)")
+        cursor.execute(f"PRAGMA table_info(purge_runs)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'chat_type' not in columns:
+            cursor.execute(f"ALTER TABLE purge_runs ADD COLUMN chat_type TEXT")
+        if 'quiet' not in columns:
+            cursor.execute(f"ALTER TABLE purge_runs ADD COLUMN quiet BOOLEAN DEFAULT FALSE")
+        if 'deadline' not in columns:
+            # Trickle purges spread their kicks out until this time
+            cursor.execute(f"ALTER TABLE purge_runs ADD COLUMN deadline TIMESTAMP")
+        if 'owner_instance' not in columns:
+            # The instance running the purge; another instance only takes it over once the owner has lost the leader lease
+            cursor.execute(f"ALTER TABLE purge_runs ADD COLUMN owner_instance TEXT")
+
+        # Create the purge_policies table: recurring purges run by the scheduler (weekday NULL = every day, times in UTC)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS purge_policies (
+                policy_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id INTEGER,
+                weekday INTEGER,
+                hour INTEGER,
+                inactive_for TEXT,
+                ban BOOLEAN DEFAULT FALSE,
+                created_by TEXT,
+                created_by_id INTEGER,
+                last_run TIMESTAMP
+            )
+        ''')
+
+        # Create the purge_items table: the persisted plan of a purge, one row per user with its completion state
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS purge_items (
+                run_id INTEGER,
+                user_id INTEGER,
+                last_activity TIMESTAMP,
+                state TEXT DEFAULT 'pending',
+                PRIMARY KEY (run_id, user_id)
+            )
+        ''')
+
+        # Create the chat activity aggregate tables: per-chat counts of non-admin members, and a histogram of their last
+        # activity keyed by hour since the epoch. Hours older than 30 days are folded into whole days as they age.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_activity_stats (
+                chat_id INTEGER PRIMARY KEY,
+                members INTEGER DEFAULT 0,
+                never_posted INTEGER DEFAULT 0,
+                rolled_until INTEGER DEFAULT 0,
+                rebuilt_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_activity_hours (
+                chat_id INTEGER,
+                hour INTEGER,
+                members INTEGER DEFAULT 0,
+                PRIMARY KEY (chat_id, hour)
+            )
+        ''')
+
         conn.commit()
     return
 
@@ -276,6 +430,9 @@ def del_chats_from_db(chat_list):
             cursor.execute("DELETE FROM left_group WHERE chat_id = ?", (chat_id,))
             cursor.execute("DELETE FROM authorized_chats WHERE chat_id = ?", (chat_id,))
             cursor.execute("DELETE FROM kicked_users WHERE channel_id = ?", (chat_id,))
+            cursor.execute("DELETE FROM scan_checkpoints WHERE chat_id = ?", (chat_id,))
+            cursor.execute("DELETE FROM chat_activity_stats WHERE chat_id = ?", (chat_id,))
+            cursor.execute("DELETE FROM chat_activity_hours WHERE chat_id = ?", (chat_id,))
         conn.commit()
     return
 
@@ -311,6 +468,7 @@ def update_user_activity(user_id, channel_id, date):
         )
         row = cursor.fetchone()
         
+        date_string = date.strftime("%Y-%m-%d %H:%M:%S.%f")
         if row:
             last_activity = datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=utc_timezone) if row[0] else None
             if last_activity is None or date.timestamp() > last_activity.timestamp():
@@ -319,8 +477,9 @@ def update_user_activity(user_id, channel_id, date):
                     INSERT OR REPLACE INTO user_activity (user_id, channel_id, last_activity)
                     VALUES (?, ?, ?)
                     """,
-                    (user_id, channel_id, date.strftime("%Y-%m-%d %H:%M:%S.%f")),
+                    (user_id, channel_id, date_string),
                 )
+                move_member_activity(cursor, channel_id, user_id, row[0], date_string)
                 conn.commit()
         else:
             # The combination doesn't exist, so insert it with the provided date
@@ -329,12 +488,170 @@ def update_user_activity(user_id, channel_id, date):
                 INSERT INTO user_activity (user_id, channel_id, last_activity)
                 VALUES (?, ?, ?)
                 """,
-                (user_id, channel_id, date.strftime("%Y-%m-%d %H:%M:%S.%f")),
+                (user_id, channel_id, date_string),
             )
+            move_member_activity(cursor, channel_id, user_id, None, date_string)
             conn.commit()
     return
 
 
+# ********* CHAT ACTIVITY AGGREGATES *********
+
+ACTIVITY_HOURS_KEPT = 30 * 24
+
+
+def activity_hour(last_activity):
+    # Hours since the epoch of a stored last_activity string
+    return int(datetime.strptime(last_activity, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=utc_timezone).timestamp()) // 3600
+
+
+def activity_rollover_boundary(now_hour):
+    # Hours before this (always a whole UTC day) are counted per day instead of per hour
+    boundary = now_hour - ACTIVITY_HOURS_KEPT
+    return boundary - boundary % 24
+
+
+def activity_bucket(hour, rolled_until):
+    return hour - hour % 24 if hour < rolled_until else hour
+
+
+def adjust_chat_activity_stats(cursor, chat_id, changes):
+    # Add (delta=1) or remove (delta=-1) non-admin members to the chat's aggregates, given (last_activity, delta) pairs.
+    # Chats whose aggregates have not been built yet are skipped; their first read builds them from scratch.
+    cursor.execute("SELECT rolled_until FROM chat_activity_stats WHERE chat_id = ?", (chat_id,))
+    row = cursor.fetchone()
+    if not row or not changes:
+        return
+    members = never_posted = 0
+    buckets = Counter()
+    for last_activity, delta in changes:
+        members += delta
+        if last_activity is None:
+            never_posted += delta
+        else:
+            buckets[activity_bucket(activity_hour(last_activity), row[0])] += delta
+    cursor.execute('''
+        UPDATE chat_activity_stats SET members = members + ?, never_posted = never_posted + ? WHERE chat_id = ?
+    ''', (members, never_posted, chat_id))
+    buckets = [(chat_id, bucket, delta) for bucket, delta in buckets.items() if delta]
+    cursor.executemany('''
+        INSERT INTO chat_activity_hours (chat_id, hour, members) VALUES (?, ?, ?)
+        ON CONFLICT (chat_id, hour) DO UPDATE SET members = members + excluded.members
+    ''', buckets)
+    cursor.executemany("DELETE FROM chat_activity_hours WHERE chat_id = ? AND hour = ? AND members <= 0", [bucket[:2] for bucket in buckets])
+
+
+def chat_member_activity(cursor, chat_id, user_ids):
+    # {user_id: last_activity or None} for those of user_ids who are non-admin members of the chat
+    user_ids = list(user_ids)
+    activity = {}
+    for i in range(0, len(user_ids), 500):
+        chunk = user_ids[i:i + 500]
+        cursor.execute(f'''
+            SELECT gm.user_id, ua.last_activity FROM group_member gm
+            LEFT JOIN user_activity ua ON ua.channel_id = gm.chat_id AND ua.user_id = gm.user_id
+            WHERE gm.chat_id = ? AND gm.status = 'Member' AND gm.user_id IN ({','.join('?' * len(chunk))})
+        ''', [chat_id] + chunk)
+        activity.update(cursor.fetchall())
+    return activity
+
+
+@contextmanager
+def member_activity_tracked(cursor, chat_id, user_ids):
+    # Wraps a batch write to group_member or user_activity for user_ids. Users who join or leave the chat's non-admin
+    # members, or whose activity changes while they are one, are moved in the aggregates by the difference.
+    cursor.execute("SELECT 1 FROM chat_activity_stats WHERE chat_id = ?", (chat_id,))
+    if not cursor.fetchone():
+        yield
+        return
+    before = chat_member_activity(cursor, chat_id, user_ids)
+    yield
+    after = chat_member_activity(cursor, chat_id, user_ids)
+    changes = [(last_activity, -1) for user_id, last_activity in before.items() if after.get(user_id, 0) != last_activity]
+    changes += [(last_activity, 1) for user_id, last_activity in after.items() if before.get(user_id, 0) != last_activity]
+    adjust_chat_activity_stats(cursor, chat_id, changes)
+
+
+def move_member_activity(cursor, chat_id, user_id, old_activity, new_activity):
+    # A member posted: move them from their old activity bucket (or never-posted) to the new one
+    cursor.execute("SELECT 1 FROM group_member WHERE user_id = ? AND chat_id = ? AND status = 'Member'", (user_id, chat_id))
+    if cursor.fetchone():
+        adjust_chat_activity_stats(cursor, chat_id, [(old_activity, -1), (new_activity, 1)])
+
+
+def rebuild_chat_activity_stats(chat_id, cursor=None):
+    # Recount a chat's aggregates from group_member and user_activity. Scans, purges and realtime updates keep them
+    # current with deltas, so this runs on first read, or by hand to repair them.
+    if cursor is None:
+        with sqlite3.connect(DATABASE_PATH) as conn:
+            rebuild_chat_activity_stats(chat_id, conn.cursor())
+            conn.commit()
+        return
+    rolled_until = activity_rollover_boundary(int(datetime.now(timezone.utc).timestamp()) // 3600)
+    cursor.execute("DELETE FROM chat_activity_hours WHERE chat_id = ?", (chat_id,))
+    cursor.execute('''
+        INSERT INTO chat_activity_hours (chat_id, hour, members)
+        SELECT ?, CASE WHEN hour < ? THEN hour - hour % 24 ELSE hour END AS bucket, COUNT(*) FROM (
+            SELECT CAST(strftime('%s', ua.last_activity) AS INTEGER) / 3600 AS hour FROM group_member gm
+            JOIN user_activity ua ON ua.channel_id = gm.chat_id AND ua.user_id = gm.user_id
+            WHERE gm.chat_id = ? AND gm.status = 'Member' AND ua.last_activity IS NOT NULL
+        ) GROUP BY bucket
+    ''', (chat_id, rolled_until, chat_id))
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(ua.last_activity IS NULL), 0) FROM group_member gm
+        LEFT JOIN user_activity ua ON ua.channel_id = gm.chat_id AND ua.user_id = gm.user_id
+        WHERE gm.chat_id = ? AND gm.status = 'Member'
+    ''', (chat_id,))
+    members, never_posted = cursor.fetchone()
+    cursor.execute('''
+        INSERT OR REPLACE INTO chat_activity_stats (chat_id, members, never_posted, rolled_until, rebuilt_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (chat_id, members, never_posted, rolled_until, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")))
+
+
+def get_chat_activity_stats(chat_id, cutoffs=()):
+    # Member, poster and never-posted counts of a chat's non-admin members, and for each cutoff date how many have not
+    # posted since (to the hour; to the day for cutoffs more than 30 days back). Reads a few hundred rows at most.
+    now_hour = int(datetime.now(timezone.utc).timestamp()) // 3600
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT members, never_posted, rolled_until FROM chat_activity_stats WHERE chat_id = ?", (chat_id,))
+        row = cursor.fetchone()
+        if not row:
+            rebuild_chat_activity_stats(chat_id, cursor)
+            conn.commit()
+            cursor.execute("SELECT members, never_posted, rolled_until FROM chat_activity_stats WHERE chat_id = ?", (chat_id,))
+            row = cursor.fetchone()
+        members, never_posted, rolled_until = row
+
+        # Lazy rollover: hours that have aged past the last 30 days are merged into their day
+        boundary = activity_rollover_boundary(now_hour)
+        if boundary > rolled_until:
+            cursor.execute('''
+                INSERT INTO chat_activity_hours (chat_id, hour, members)
+                SELECT chat_id, hour - hour % 24, SUM(members) FROM chat_activity_hours
+                WHERE chat_id = ? AND hour < ? AND hour % 24 != 0
+                GROUP BY hour - hour % 24
+                ON CONFLICT (chat_id, hour) DO UPDATE SET members = members + excluded.members
+            ''', (chat_id, boundary))
+            cursor.execute("DELETE FROM chat_activity_hours WHERE chat_id = ? AND hour < ? AND hour % 24 != 0", (chat_id, boundary))
+            cursor.execute("UPDATE chat_activity_stats SET rolled_until = ? WHERE chat_id = ?", (boundary, chat_id))
+            conn.commit()
+            rolled_until = boundary
+
+        inactive = []
+        for cutoff in cutoffs:
+            cutoff_hour = activity_bucket(int(cutoff.replace(tzinfo=cutoff.tzinfo or utc_timezone).timestamp()) // 3600, rolled_until)
+            cursor.execute("SELECT COALESCE(SUM(members), 0) FROM chat_activity_hours WHERE chat_id = ? AND hour >= ?", (chat_id, cutoff_hour))
+            inactive.append(max(members - cursor.fetchone()[0], 0))
+    return {
+        'members': members,
+        'posters': members - never_posted,
+        'never_posted': never_posted,
+        'inactive': inactive,
+    }
+
+
 def deleted_kicks_from_user_activity(delete_params):
  # Construct the SQL query with placeholders
     delete_query = """
@@ -345,7 +662,11 @@ def deleted_kicks_from_user_activity(delete_params):
     # Connect to the database and execute the delete query
     with sqlite3.connect(DATABASE_PATH) as conn:
         cursor = conn.cursor()
-        cursor.executemany(delete_query, delete_params)
+        # Anyone still a member when their activity goes drops back to never-posted in the aggregates
+        for chat_id in {chat_id for user_id, chat_id in delete_params}:
+            user_ids = [user_id for user_id, delete_chat_id in delete_params if delete_chat_id == chat_id]
+            with member_activity_tracked(cursor, chat_id, user_ids):
+                cursor.executemany(delete_query, [(user_id, chat_id) for user_id in user_ids])
         conn.commit()
     return
 
@@ -453,6 +774,44 @@ def insert_kicked_user_in_kick_db(user_id, chat_id, last_activity_str):
     return
 
 
+def get_kick_counts(chat_id):
+    # Every user's kick count in the chat, as {user_id: kick_count}. Loaded once at the start of a purge.
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, kick_count FROM kicked_users WHERE channel_id = ?", (chat_id,))
+        kick_counts = {row[0]: row[1] for row in cursor}
+    return kick_counts
+
+
+def batch_insert_kicked_users(kick_records, chat_id, run_id=None):
+    # kick_records is a list of (user_id, last_activity_str, kicked_at_str). One transaction for the whole chunk.
+    # With a run_id, the chunk's purge_items are marked done in the same transaction and users already done in that run
+    # are skipped, so a chunk written twice (e.g. re-kicked after a restart) counts each kick once.
+    # Returns the user_ids whose kick was recorded.
+    if not kick_records:
+        return []
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        if run_id is not None:
+            user_ids = [record[0] for record in kick_records]
+            cursor.execute(
+                f"SELECT user_id FROM purge_items WHERE run_id = ? AND state = 'done' AND user_id IN ({','.join('?' * len(user_ids))})",
+                [run_id] + user_ids
+            )
+            already_done = {row[0] for row in cursor.fetchall()}
+            kick_records = [record for record in kick_records if record[0] not in already_done]
+            cursor.executemany(
+                "UPDATE purge_items SET state = 'done' WHERE run_id = ? AND user_id = ?",
+                [(run_id, record[0]) for record in kick_records]
+            )
+        cursor.executemany("""
+            INSERT OR REPLACE INTO kicked_users (user_id, channel_id, kick_count, last_posted, last_kicked)
+            VALUES (?, ?, COALESCE((SELECT kick_count FROM kicked_users WHERE user_id = ? AND channel_id = ?) + 1, 1), ?, ?)
+        """, [(user_id, chat_id, user_id, chat_id, last_activity_str, kicked_at) for user_id, last_activity_str, kicked_at in kick_records])
+        conn.commit()
+    return [record[0] for record in kick_records]
+
+
 def lookup_most_recent_kick_timestamp(chat_id):
     with sqlite3.connect(DATABASE_PATH) as conn:
         cursor = conn.cursor()
@@ -470,6 +829,43 @@ def lookup_most_recent_kick_timestamp(chat_id):
 
 # ********* WHITELIST COMMANDS *********
 
+# Purge candidates from the last scan snapshot: members (not admins) with no activity since the cutoff,
+# minus the whitelist, the given exempt ids and the bot owner's accounts. Mirrors assemble_banned_list().
+PURGE_CANDIDATES_QUERY = '''
+    SELECT gm.user_id, ua.last_activity, gm.user_name FROM group_member gm
+    LEFT JOIN user_activity ua ON ua.channel_id = gm.chat_id AND ua.user_id = gm.user_id
+    WHERE gm.chat_id = ? AND gm.status = 'Member'
+    AND (ua.last_activity IS NULL OR ua.last_activity <= ?)
+    AND (gm.user_username IS NULL OR gm.user_username NOT LIKE '%shinanygans%')
+    AND NOT EXISTS (SELECT 1 FROM whitelist wl WHERE wl.user_id = gm.user_id AND wl.channel_id = gm.chat_id)
+    AND gm.user_id NOT IN (SELECT value FROM json_each(?))
+'''
+
+
+def plan_purge(chat_id, cutoff_date, exempt_ids=(), sample_size=10):
+    # Counts and a sample of the purge a cutoff would produce, without touching Telegram. 'members' counts non-admin
+    # members only, from the activity aggregates. The sample lists never-posted users first, then the longest inactive.
+    params = (chat_id, cutoff_date.strftime("%Y-%m-%d %H:%M:%S.%f"), json.dumps(list(exempt_ids)))
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT COUNT(*), COALESCE(SUM(last_activity IS NULL), 0) FROM ({PURGE_CANDIDATES_QUERY})
+        ''', params)
+        candidates, never_posted = cursor.fetchone()
+        cursor.execute(f'''
+            {PURGE_CANDIDATES_QUERY}
+            ORDER BY ua.last_activity IS NOT NULL, ua.last_activity
+            LIMIT ?
+        ''', params + (sample_size,))
+        sample = cursor.fetchall()
+    return {
+        'members': get_chat_activity_stats(chat_id)['members'],
+        'candidates': candidates,
+        'never_posted': never_posted,
+        'sample': sample,
+    }
+
+
 def get_whitelist(chat_id):
 
     query = f"SELECT user_id, channel_id FROM whitelist WHERE channel_id = {chat_id}"
@@ -664,27 +1060,31 @@ def lookup_admin_ids(chat_id=None):
 
 
 def list_member_ids_in_db(chat_id):
+    # Returned sorted as a compact array('q'), ready to be wrapped in an IdSet without another sort
     with sqlite3.connect(DATABASE_PATH) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT user_id FROM group_member
             WHERE chat_id = ? AND (status = 'Member' OR status = 'Admin' OR status = 'Creator')
+            ORDER BY user_id
         ''', (chat_id,))
 
-        user_ids = [row[0] for row in cursor.fetchall()]
+        user_ids = array('q', (row[0] for row in cursor))
 
     return user_ids
 
 
 def list_unkonwn_status_in_db(chat_id):
+    # Returned sorted as a compact array('q'), ready to be wrapped in an IdSet without another sort
     with sqlite3.connect(DATABASE_PATH) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT user_id FROM group_member
             WHERE chat_id = ? AND (status = 'Not Available')
+            ORDER BY user_id
         ''', (chat_id,))
 
-        user_ids = [row[0] for row in cursor.fetchall()]
+        user_ids = array('q', (row[0] for row in cursor))
 
     return user_ids
 
@@ -703,14 +1103,16 @@ def list_kicked_users_in_db(chat_id):
 
 
 def list_banned_users_in_db(chat_id):
+    # Returned sorted as a compact array('q'), ready to be wrapped in an IdSet without another sort
     with sqlite3.connect(DATABASE_PATH) as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT user_id FROM group_member
             WHERE chat_id = ? AND status = 'Banned'
+            ORDER BY user_id
         ''', (chat_id,))
 
-        user_ids = [row[0] for row in cursor.fetchall()]
+        user_ids = array('q', (row[0] for row in cursor))
 
     return user_ids
 
@@ -738,6 +1140,8 @@ def keyword_search_from_db(keyword):
 
 
 def batch_insert_or_update_chat_member(params):
+    if not params:
+        return
     with sqlite3.connect(DATABASE_PATH) as conn:
         cursor = conn.cursor()
 
@@ -783,7 +1187,8 @@ def batch_insert_or_update_chat_member(params):
             )
 
         '''
-        cursor.executemany(update_query, params)
+        with member_activity_tracked(cursor, params[0][1], [param[0] for param in params]):
+            cursor.executemany(update_query, params)
         conn.commit()
     return
 
@@ -828,7 +1233,8 @@ def batch_update_left(user_ids, chat_id):
             (datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"), user_id, chat_id, user_id, chat_id)
             for user_id in user_ids
         ]            
-        cursor.executemany(update_query, update_params)
+        with member_activity_tracked(cursor, chat_id, user_ids):
+            cursor.executemany(update_query, update_params)
         conn.commit()
     conn.close
     return
@@ -850,7 +1256,8 @@ def batch_update_kicked(user_ids, chat_id):
             (datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"), user_id, chat_id, user_id, chat_id)
             for user_id in user_ids
         ]            
-        cursor.executemany(update_query, update_params)
+        with member_activity_tracked(cursor, chat_id, user_ids):
+            cursor.executemany(update_query, update_params)
         conn.commit()
     conn.close
     return
@@ -881,7 +1288,8 @@ def batch_update_banned(user_ids, chat_id):
             (user_id, chat_id, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"), user_id, chat_id, user_id, chat_id, user_id, chat_id)
             for user_id in user_ids
         ]                      
-        cursor.executemany(update_query, update_params)
+        with member_activity_tracked(cursor, chat_id, user_ids):
+            cursor.executemany(update_query, update_params)
         conn.commit()
     conn.close
     return
@@ -1231,6 +1639,340 @@ def lookup_last_admin_update(chat_id):
     return last_admin_update_datetime
 
 
+# ********* SCAN METRICS COMMANDS *********
+
+SCAN_METRICS_COLUMNS = (
+    'chat_id',
+    'scanned_at',
+    'iter_seconds',
+    'db_update_seconds',
+    'ban_leavers_seconds',
+    'banned_list_seconds',
+    'total_seconds',
+    'participant_count',
+    'joined_count',
+    'left_count',
+    'api_calls',
+    'coverage_shortfall',
+)
+
+
+def insert_scan_metrics(metrics):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            INSERT INTO scan_metrics ({", ".join(SCAN_METRICS_COLUMNS)})
+            VALUES ({", ".join("?" for _ in SCAN_METRICS_COLUMNS)})
+        ''', tuple(metrics.get(column) for column in SCAN_METRICS_COLUMNS))
+        conn.commit()
+    return
+
+
+def get_scan_metrics(since):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {", ".join(SCAN_METRICS_COLUMNS)} FROM scan_metrics
+            WHERE scanned_at > ?
+            ORDER BY scanned_at
+        ''', (since.strftime("%Y-%m-%d %H:%M:%S.%f"),))
+        rows = [dict(row) for row in cursor.fetchall()]
+    return rows
+
+
+def prune_scan_metrics(older_than):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM scan_metrics WHERE scanned_at < ?", (older_than.strftime("%Y-%m-%d %H:%M:%S.%f"),))
+        conn.commit()
+    return
+
+
+# ********* SCAN CHECKPOINT COMMANDS *********
+
+def save_scan_checkpoint(chat_id, checkpoint):
+    # user_ids is an array('q'); it is stored as raw bytes (8 bytes per user)
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO scan_checkpoints (chat_id, participant_offset, participant_count, user_ids, started_at, updated_at, done_partitions, expected_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            chat_id,
+            checkpoint['offset'],
+            checkpoint['participant_count'],
+            checkpoint['user_ids'].tobytes(),
+            checkpoint['started_at'].strftime("%Y-%m-%d %H:%M:%S.%f"),
+            datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"),
+            json.dumps(checkpoint['done_partitions']) if checkpoint.get('done_partitions') is not None else None,
+            checkpoint.get('expected_count'),
+        ))
+        conn.commit()
+    return
+
+
+def load_scan_checkpoint(chat_id):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT participant_offset, participant_count, user_ids, started_at, done_partitions, expected_count
+            FROM scan_checkpoints
+            WHERE chat_id = ?
+        ''', (chat_id,))
+        row = cursor.fetchone()
+    if not row:
+        return None
+    user_ids = array('q')
+    user_ids.frombytes(row[2])
+    return {
+        'offset': row[0],
+        'participant_count': row[1],
+        'user_ids': user_ids,
+        'started_at': datetime.strptime(row[3], "%Y-%m-%d %H:%M:%S.%f"),
+        'done_partitions': json.loads(row[4]) if row[4] is not None else None,
+        'expected_count': row[5],
+    }
+
+
+def delete_scan_checkpoint(chat_id):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM scan_checkpoints WHERE chat_id = ?", (chat_id,))
+        conn.commit()
+    return
+
+
+def acquire_leader_lease(name, holder, ttl_seconds):
+    # Takes or renews the named lease for holder. Returns True if holder owns the lease afterwards.
+    # BEGIN IMMEDIATE takes the database write lock before the lease is read, so two instances can't both win.
+    now = datetime.utcnow()
+    now_string = now.strftime("%Y-%m-%d %H:%M:%S.%f")
+    expires_string = (now + timedelta(seconds=ttl_seconds)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    conn = sqlite3.connect(DATABASE_PATH, isolation_level=None, timeout=ttl_seconds)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT holder, expires_at FROM leader_lease WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        if row and row[0] != holder and row[1] > now_string:
+            cursor.execute("ROLLBACK")
+            return False
+        if row and row[0] == holder:
+            cursor.execute(
+                "UPDATE leader_lease SET heartbeat_at = ?, expires_at = ? WHERE name = ?",
+                (now_string, expires_string, name)
+            )
+        else:
+            cursor.execute(
+                "INSERT OR REPLACE INTO leader_lease (name, holder, acquired_at, heartbeat_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (name, holder, now_string, now_string, expires_string)
+            )
+        cursor.execute("COMMIT")
+        return True
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def release_leader_lease(name, holder):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM leader_lease WHERE name = ? AND holder = ?", (name, holder))
+        conn.commit()
+    return
+
+
+def get_leader_lease(name):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT holder, acquired_at, heartbeat_at, expires_at FROM leader_lease WHERE name = ?", (name,))
+        row = cursor.fetchone()
+    if not row:
+        return None
+    return {'holder': row[0], 'acquired_at': row[1], 'heartbeat_at': row[2], 'expires_at': row[3]}
+
+
+PURGE_ACTION_COLUMNS = ('run_id', 'user_id', 'action', 'last_activity', 'kick_number', 'attempts', 'latency_ms', 'acted_at')
+
+
+def insert_purge_run(chat_id, chat_name, issued_by, mode, cutoff_date, chat_type=None, quiet=False, deadline=None, owner_instance=None):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO purge_runs (chat_id, chat_name, issued_by, mode, cutoff_date, started_at, status, chat_type, quiet, deadline, owner_instance)
+            VALUES (?, ?, ?, ?, ?, ?, 'running', ?, ?, ?, ?)
+        ''', (
+            chat_id,
+            chat_name,
+            issued_by,
+            mode,
+            cutoff_date.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"),
+            str(chat_type) if chat_type else None,
+            quiet,
+            deadline.strftime("%Y-%m-%d %H:%M:%S.%f") if deadline else None,
+            owner_instance,
+        ))
+        conn.commit()
+        run_id = cursor.lastrowid
+    return run_id
+
+
+def claim_purge_run(run_id, previous_owner, owner_instance):
+    # Hands an unfinished run to owner_instance, unless another instance has claimed it since previous_owner was read.
+    # Returns True if the claim succeeded.
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE purge_runs SET owner_instance = ?
+            WHERE run_id = ? AND owner_instance IS ? AND status IN ('running', 'kicking')
+        ''', (owner_instance, run_id, previous_owner))
+        conn.commit()
+        claimed = cursor.rowcount == 1
+    return claimed
+
+
+def finish_purge_run(run_id, status, candidates=None, done=None, failed=None, flood_waits=None):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE purge_runs
+            SET finished_at = ?, status = ?, candidates = ?, done = ?, failed = ?, flood_waits = ?
+            WHERE run_id = ?
+        ''', (datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"), status, candidates, done, failed, flood_waits, run_id))
+        conn.commit()
+    return
+
+
+def update_purge_run_status(run_id, status, candidates=None):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE purge_runs SET status = ?, candidates = COALESCE(?, candidates) WHERE run_id = ?",
+            (status, candidates, run_id)
+        )
+        conn.commit()
+    return
+
+
+def get_unfinished_purge_runs():
+    # Runs that were still assembling ('running') or kicking ('kicking') when the process stopped
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT run_id, chat_id, chat_name, chat_type, mode, quiet, status, deadline, owner_instance FROM purge_runs
+            WHERE status IN ('running', 'kicking')
+            ORDER BY run_id
+        ''')
+        rows = [dict(row) for row in cursor.fetchall()]
+    return rows
+
+
+def insert_purge_items(run_id, users_to_ban):
+    # users_to_ban is a list of (user_id, last_activity) tuples; every item starts out pending
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO purge_items (run_id, user_id, last_activity) VALUES (?, ?, ?)",
+            [(run_id, user_id, last_activity) for user_id, last_activity in users_to_ban]
+        )
+        conn.commit()
+    return
+
+
+def get_pending_purge_items(run_id):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        # Never-posted users first, then the longest inactive, the same order the purge was started in
+        cursor.execute('''
+            SELECT user_id, last_activity FROM purge_items WHERE run_id = ? AND state = 'pending'
+            ORDER BY last_activity IS NOT NULL, last_activity
+        ''', (run_id,))
+        rows = [(row[0], row[1]) for row in cursor.fetchall()]
+    return rows
+
+
+def mark_purge_items(run_id, user_ids, state):
+    if not user_ids:
+        return
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE purge_items SET state = ? WHERE run_id = ? AND user_id = ?",
+            [(state, run_id, user_id) for user_id in user_ids]
+        )
+        conn.commit()
+    return
+
+
+def insert_purge_policy(chat_id, weekday, hour, inactive_for, ban, created_by, created_by_id):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO purge_policies (chat_id, weekday, hour, inactive_for, ban, created_by, created_by_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (chat_id, weekday, hour, inactive_for, ban, created_by, created_by_id))
+        conn.commit()
+        policy_id = cursor.lastrowid
+    return policy_id
+
+
+def get_purge_policies(chat_id=None):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        if chat_id:
+            cursor.execute("SELECT * FROM purge_policies WHERE chat_id = ? ORDER BY policy_id", (chat_id,))
+        else:
+            cursor.execute("SELECT * FROM purge_policies ORDER BY policy_id")
+        policies = [dict(row) for row in cursor.fetchall()]
+    return policies
+
+
+def delete_purge_policies(chat_id, policy_id=None):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        if policy_id:
+            cursor.execute("DELETE FROM purge_policies WHERE chat_id = ? AND policy_id = ?", (chat_id, policy_id))
+        else:
+            cursor.execute("DELETE FROM purge_policies WHERE chat_id = ?", (chat_id,))
+        conn.commit()
+        deleted = cursor.rowcount
+    return deleted
+
+
+def update_purge_policy_last_run(policy_id, last_run=None):
+    if last_run is None:
+        last_run = datetime.utcnow()
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE purge_policies SET last_run = ? WHERE policy_id = ?",
+            (last_run.strftime("%Y-%m-%d %H:%M:%S.%f"), policy_id)
+        )
+        conn.commit()
+    return
+
+
+def batch_insert_purge_actions(actions):
+    # actions is a list of dicts keyed by PURGE_ACTION_COLUMNS
+    if not actions:
+        return
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(f'''
+            INSERT INTO purge_actions ({", ".join(PURGE_ACTION_COLUMNS)})
+            VALUES ({", ".join("?" for _ in PURGE_ACTION_COLUMNS)})
+        ''', [tuple(action.get(column) for column in PURGE_ACTION_COLUMNS) for action in actions])
+        conn.commit()
+    return
+
+
 def import_blacklist_from_csv(csv_filename):
     try:
         with open(csv_filename, 'r', newline='') as csv_file:
@@ -1418,6 +2160,14 @@ def update_or_insert_group_member(chat_id, tg_object, event:EventType=None, join
                 (now_string, user_status, user_id, chat_id, user_id, chat_id)
             )    
 
+        # Joins and leaves move the user in or out of the chat's activity aggregates
+        old_status = row[0] if row else None
+        new_status = user_status if (event or not row) else old_status
+        if (old_status == 'Member') != (new_status == 'Member'):
+            cursor.execute("SELECT last_activity FROM user_activity WHERE user_id = ? AND channel_id = ?", (user_id, chat_id))
+            activity_row = cursor.fetchone()
+            adjust_chat_activity_stats(cursor, chat_id, [(activity_row[0] if activity_row else None, 1 if new_status == 'Member' else -1)])
+
         conn.commit()
     return
 
@@ -0,0 +1,687 @@
+"""
+KICK_UTILS.PY
+
+Rate limiting and concurrency helpers shared by the room scanner and the kick processing.
+Nothing in here talks to Telegram directly (clients are passed in), so these can be reused anywhere in the bot.
+"""
+import asyncio
+import logging
+import math
+import time
+from array import array
+from collections import deque
+from contextlib import asynccontextmanager
+from bisect import bisect_left
+from heapq import merge
+from itertools import groupby, islice
+
+
+# ********* RATE LIMITING *********
+
+class TokenBucket:
+    """Async token bucket. Tokens refill at `rate` per second, up to `capacity` (the allowed burst)."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens=1):
+        # Waiters are served in order, so one caller in a flood wait holds back everybody sharing the bucket
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def wait_time(self):
+        # Seconds until a token would be free, ignoring callers already queued for one
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now + 1 / self.rate
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def pause(self, seconds):
+        # Called on RetryAfter / flood waits. Every caller sharing this bucket backs off, not just the one that was told to.
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self._refill(now)
+        self.tokens = 0.0
+
+
+# ********* KICK EXECUTOR *********
+
+class RetryLater(Exception):
+    """
+    Raised by a KickExecutor handler to have the item retried after `seconds`. A flood wait also slows every worker down.
+    count_attempt=False (e.g. failing over to another bot) re-queues the item without using up one of its attempts.
+    """
+
+    def __init__(self, seconds, flood=True, count_attempt=True):
+        super().__init__(f"retry in {seconds} seconds")
+        self.seconds = seconds
+        self.flood = flood
+        self.count_attempt = count_attempt
+
+
+class KickExecutor:
+    """
+    Runs `handler(item)` over a work queue with adaptive concurrency, every call drawing from a shared TokenBucket
+    (limiter=None leaves the pacing to the handler, e.g. when it draws from a BotRouter).
+    Concurrency starts at `initial_workers` and grows by one after every `increase_every` consecutive successes, up to
+    `max_workers`. A flood wait halves it and pauses the bucket, so all workers back off together (AIMD).
+    Items that still fail after `max_retries` attempts end up in `failed`.
+    """
+
+    def __init__(self, handler, limiter, max_workers, initial_workers=None, max_retries=3, increase_every=20, rate_window=10):
+        self.handler = handler
+        self.limiter = limiter
+        self.max_workers = max(1, max_workers)
+        self.concurrency = min(self.max_workers, initial_workers or max(1, self.max_workers // 4))
+        self.max_retries = max_retries
+        self.increase_every = increase_every
+        self.rate_window = rate_window
+        self.results = []
+        self.failed = []
+        self.total = 0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0.0  # total time Telegram has asked us to wait
+        self.paused_until = 0.0
+        self.started = None
+        self.finished = None
+        self.streak = 0
+        self.completions = deque()  # monotonic times of recent completions, for the live rate
+        self.cancelled = False
+
+    async def run(self, items):
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait((item, 0))
+        self.total = queue.qsize()
+        self.started = time.monotonic()
+        workers = [asyncio.create_task(self._worker(i, queue)) for i in range(self.max_workers)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.finished = time.monotonic()
+        return self.results
+
+    def cancel(self):
+        # Workers finish the call they are in, and nothing new is started
+        self.cancelled = True
+
+    async def _worker(self, index, queue):
+        while True:
+            # Workers above the current concurrency limit sit out until it grows again, without holding an item
+            while index >= self.concurrency and not self.cancelled:
+                await asyncio.sleep(0.5)
+            item, attempt = await queue.get()
+            try:
+                if self.cancelled:
+                    continue
+                if self.limiter is not None:
+                    await self.limiter.acquire()
+                try:
+                    result = await self.handler(item)
+                except RetryLater as e:
+                    self.streak = 0
+                    if e.flood:
+                        self.flood_waits += 1
+                        self.flood_wait_seconds += e.seconds
+                        self.paused_until = max(self.paused_until, time.monotonic() + e.seconds)
+                        if self.limiter is not None:
+                            self.limiter.pause(e.seconds)
+                        self.concurrency = max(1, self.concurrency // 2)
+                    else:
+                        await asyncio.sleep(e.seconds)
+                    next_attempt = attempt + 1 if e.count_attempt else attempt
+                    if next_attempt < self.max_retries:
+                        queue.put_nowait((item, next_attempt))
+                    else:
+                        self.failed.append(item)
+                except Exception:
+                    self.streak = 0
+                    self.failed.append(item)
+                else:
+                    self.results.append(result)
+                    self.completions.append(time.monotonic())
+                    self.streak += 1
+                    if self.streak >= self.increase_every and self.concurrency < self.max_workers:
+                        self.concurrency += 1
+                        self.streak = 0
+            finally:
+                queue.task_done()
+
+    @property
+    def done(self):
+        return len(self.results)
+
+    def rate(self):
+        # Completions per second over the last `rate_window` seconds
+        now = time.monotonic()
+        while self.completions and now - self.completions[0] > self.rate_window:
+            self.completions.popleft()
+        if not self.completions or self.started is None:
+            return 0.0
+        return len(self.completions) / min(self.rate_window, max(now - self.started, 1e-6))
+
+    def paused_for(self):
+        # Seconds left in the current flood wait, 0 if none
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def eta(self):
+        # Seconds to finish at the recent rate, None while there is no rate to go by
+        rate = self.rate() or self.overall_rate()
+        if not rate:
+            return None
+        return (self.total - self.done - len(self.failed)) / rate + self.paused_for()
+
+    def overall_rate(self):
+        if self.started is None:
+            return 0.0
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+
+# ********* BUFFERED WRITER *********
+
+class BufferedWriter:
+    """
+    Collects records in memory and hands them to the blocking `write(records)` in a worker thread, whenever
+    `flush_size` records are waiting or every `flush_interval` seconds, so callers never wait on the disk.
+    Call close() to write whatever is left: it returns once every write has landed, and logs any that failed.
+    """
+
+    def __init__(self, write, flush_size=200, flush_interval=2.0, name='records'):
+        self.write = write
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self.records = []
+        self.lock = asyncio.Lock()  # One write in flight at a time, in order
+        self.task = None
+        self.stopping = asyncio.Event()
+        self.pending = set()  # flushes started by add(), kept referenced until they finish
+        self.errors = []
+
+    def add(self, record):
+        if self.task is None:
+            self.task = asyncio.create_task(self._flush_periodically())
+        self.records.append(record)
+        if len(self.records) >= self.flush_size:
+            task = asyncio.create_task(self.flush())
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+
+    async def flush(self):
+        async with self.lock:
+            records, self.records = self.records, []
+            if records:
+                try:
+                    await asyncio.to_thread(self.write, records)
+                except Exception as e:
+                    self.errors.append(e)
+
+    async def _flush_periodically(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def close(self):
+        # Not cancelled: a write already handed to its thread would carry on alongside the final flush
+        self.stopping.set()
+        if self.task is not None:
+            await self.task
+            self.task = None
+        if self.pending:
+            await asyncio.gather(*self.pending)
+        await self.flush()
+        for error in self.errors:
+            logging.error(f"Failed to write buffered {self.name}: {error}")
+        return self.errors
+
+
+# ********* PURGE SESSIONS *********
+
+class PurgeSession:
+    """
+    One chat's purge, registered by chat_id while it runs. Only one session can exist per chat, and other chats are
+    unaffected: scans, realtime tracking and purges elsewhere carry on. The status is for reporting.
+    """
+
+    def __init__(self, chat_id, pretend=False, ban=False):
+        self.chat_id = chat_id
+        self.pretend = pretend
+        self.ban = ban
+        self.status = 'starting'
+        self.started = time.monotonic()
+        self.executor = None  # KickExecutor, once kicking has begun
+        self.context = None  # PurgeContext, once the purge has been planned
+        self.run_id = None  # purge_runs row for this purge
+        self.journal = None  # BufferedWriter of purge_actions rows
+        self.cancelled = False
+        self.handed_off = False  # stopped because this instance lost the leader lease; the run is left for the new leader
+        self.progress_message = None  # status message kept up to date in the chat while kicking
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def cancel(self):
+        # Stops the purge: before kicking starts it never does, and once it has the executor stops taking new users
+        self.cancelled = True
+        if self.executor is not None:
+            self.executor.cancel()
+
+
+class PurgeContext:
+    """
+    Per-chat state a purge needs for every user, loaded once when the purge starts: the three-strikes flag and every
+    user's kick count. Kicks are buffered and handed to `write_kicks(records, chat_id)` in chunks of `flush_size`,
+    so the database sees one transaction per chunk instead of one per kicked user. Chunks are written one at a time
+    in a worker thread, keeping SQLite off the event loop. A chunk that fails to write is put back at the front of
+    the buffer and the error re-raised, so the next flush retries it.
+    """
+
+    def __init__(self, chat_id, three_strikes_mode, kick_counts, write_kicks, flush_size=500):
+        self.chat_id = chat_id
+        self.three_strikes_mode = three_strikes_mode
+        self.kick_counts = kick_counts
+        self.write_kicks = write_kicks
+        self.flush_size = flush_size
+        self.pending_kicks = []
+        self.flush_lock = asyncio.Lock()
+        self.attempts = {}  # user_id -> calls made for the user so far
+        self.reported_errors = set()  # user_ids whose unexpected error has already gone to the debug chats
+
+    def kick_count(self, user_id):
+        return self.kick_counts.get(user_id, 0)
+
+    def three_strikes_ban(self, user_id):
+        # Third kick in this chat turns into a ban when three-strikes mode is on
+        return self.three_strikes_mode and self.kick_count(user_id) >= 2
+
+    async def record_kick(self, user_id, last_activity_str, kicked_at):
+        self.kick_counts[user_id] = self.kick_count(user_id) + 1
+        self.pending_kicks.append((user_id, last_activity_str, kicked_at))
+        if len(self.pending_kicks) >= self.flush_size and not self.flush_lock.locked():
+            await self.flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            records, self.pending_kicks = self.pending_kicks, []
+            if records:
+                try:
+                    await asyncio.to_thread(self.write_kicks, records, self.chat_id)
+                except Exception:
+                    self.pending_kicks[:0] = records
+                    raise
+
+
+# ********* CLIENT POOL *********
+
+class ClientPool:
+    """
+    Small pool of long-lived client connections, split into named groups (e.g. 'scan' and 'interactive') so one kind of
+    work can't queue up behind another. Each slot counts its calls in flight and its consecutive connection failures.
+    client() hands out the healthy slot of the group with the fewest calls in flight, reconnecting a slot if none is healthy.
+    """
+
+    def __init__(self, connect, groups, is_connected=None, disconnect=None, failure_threshold=3):
+        self.connect = connect  # async callable(slot_name) -> connected client
+        self.is_connected = is_connected or (lambda client: True)
+        self.disconnect = disconnect  # async callable(client), optional
+        self.failure_threshold = failure_threshold
+        self.slots = {
+            group: [
+                {'name': f"{group}_{i}", 'client': None, 'in_flight': 0, 'calls': 0, 'failures': 0, 'lock': asyncio.Lock()}
+                for i in range(max(1, size))
+            ]
+            for group, size in groups.items()
+        }
+        self.reconnects = set()  # background reconnects started by client(), kept referenced until they finish
+
+    async def start(self):
+        # Connects every slot. A slot that fails to connect is retried the next time its group is used.
+        errors = []
+        for slots in self.slots.values():
+            for slot in slots:
+                try:
+                    await self._reconnect(slot)
+                except Exception as e:
+                    errors.append((slot['name'], e))
+        return errors
+
+    def _healthy(self, slot):
+        return slot['client'] is not None and slot['failures'] < self.failure_threshold and self.is_connected(slot['client'])
+
+    async def _reconnect(self, slot):
+        # Only one caller rebuilds a slot; the rest wait for it and then use the new client
+        async with slot['lock']:
+            if self._healthy(slot):
+                return
+            if slot['client'] is not None and self.disconnect:
+                try:
+                    await self.disconnect(slot['client'])
+                except Exception:
+                    pass
+            slot['client'] = None
+            slot['client'] = await self.connect(slot['name'])
+            slot['failures'] = 0
+
+    async def _reconnect_quietly(self, slot):
+        try:
+            await self._reconnect(slot)
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def client(self, group='interactive'):
+        slots = self.slots[group]
+        healthy = [slot for slot in slots if self._healthy(slot)]
+        if healthy:
+            slot = min(healthy, key=lambda s: s['in_flight'])
+            # Rebuild broken slots in the background while the healthy ones carry the load
+            for broken in slots:
+                if broken not in healthy and not broken['lock'].locked():
+                    task = asyncio.create_task(self._reconnect_quietly(broken))
+                    self.reconnects.add(task)
+                    task.add_done_callback(self.reconnects.discard)
+        else:
+            slot = min(slots, key=lambda s: s['in_flight'])
+            await self._reconnect(slot)
+        slot['in_flight'] += 1
+        slot['calls'] += 1
+        try:
+            yield slot['client']
+        except (ConnectionError, OSError, asyncio.TimeoutError):
+            slot['failures'] += 1
+            raise
+        else:
+            slot['failures'] = 0
+        finally:
+            slot['in_flight'] -= 1
+
+    def clients(self):
+        return [slot['client'] for slots in self.slots.values() for slot in slots if slot['client'] is not None]
+
+    def stats(self):
+        return [
+            {'name': slot['name'], 'connected': self._healthy(slot), 'in_flight': slot['in_flight'], 'calls': slot['calls'], 'failures': slot['failures']}
+            for slots in self.slots.values() for slot in slots
+        ]
+
+
+# ********* BOT ROUTER *********
+
+class BotRouter:
+    """
+    Spreads Bot API calls over the main bot and any helper bots that are admins in the same chats, each paced by its own
+    TokenBucket, so throughput grows with the number of tokens. acquire() hands out the bot whose bucket frees up first,
+    skipping helpers that have been marked unable to act in that chat. A flood wait pauses only the bot it was sent to.
+    """
+
+    def __init__(self, lanes, disable_seconds=3600):
+        # lanes: (name, bot, limiter) tuples. The first is the main bot, which is never skipped.
+        self.disable_seconds = disable_seconds
+        self.lanes = [
+            {'name': name, 'bot': bot, 'limiter': limiter, 'in_flight': 0, 'calls': 0, 'disabled': {}}
+            for name, bot, limiter in lanes
+        ]
+
+    def __len__(self):
+        return len(self.lanes)
+
+    def usable(self, chat_id):
+        now = time.monotonic()
+        return [lane for i, lane in enumerate(self.lanes) if i == 0 or lane['disabled'].get(chat_id, 0) <= now]
+
+    async def acquire(self, chat_id):
+        lane = min(self.usable(chat_id), key=lambda lane: (lane['limiter'].wait_time(), lane['in_flight']))
+        lane['in_flight'] += 1
+        try:
+            await lane['limiter'].acquire()
+        except BaseException:
+            lane['in_flight'] -= 1
+            raise
+        lane['calls'] += 1
+        return lane
+
+    def release(self, lane):
+        lane['in_flight'] -= 1
+
+    @asynccontextmanager
+    async def lane(self, chat_id):
+        lane = await self.acquire(chat_id)
+        try:
+            yield lane
+        finally:
+            self.release(lane)
+
+    def disable(self, lane, chat_id):
+        # A helper that can't act in a chat (not an admin there, or removed) is skipped in that chat for a while
+        if lane is not self.lanes[0]:
+            lane['disabled'][chat_id] = time.monotonic() + self.disable_seconds
+
+    def is_helper(self, lane):
+        return lane is not self.lanes[0]
+
+    def stats(self):
+        return [{'name': lane['name'], 'in_flight': lane['in_flight'], 'calls': lane['calls']} for lane in self.lanes]
+
+
+# ********* CHAT LIVENESS *********
+
+class ChatCircuitBreaker:
+    """
+    Per-chat circuit breaker for chats the bot may no longer be able to reach.
+    Chats with no recorded trouble are called normally. After `failure_threshold` consecutive failures (or one fatal
+    failure, like the bot being removed) a chat is opened: calls are suppressed until its cooldown has passed, then
+    one caller may claim a single probe with start_probe(). A success closes the chat again; another failure doubles
+    the cooldown. allow() and probe_due() only look, so checking a chat never uses up its probe.
+    """
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, cooldown=300, max_cooldown=6 * 3600):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.chats = {}  # chat_id -> {'state', 'failures', 'cooldown', 'retry_at'}
+
+    def allow(self, chat_id):
+        # True while the chat is closed (no trouble recorded)
+        entry = self.chats.get(chat_id)
+        return entry is None or entry['state'] is None
+
+    def probe_due(self, chat_id):
+        entry = self.chats.get(chat_id)
+        return entry is not None and entry['state'] is not None and time.monotonic() >= entry['retry_at']
+
+    def start_probe(self, chat_id):
+        # Claims the probe of a chat whose cooldown is over, holding everything else back for another cooldown.
+        # Returns False if there is no probe to claim.
+        if not self.probe_due(chat_id):
+            return False
+        entry = self.chats[chat_id]
+        entry['state'] = self.HALF_OPEN
+        entry['retry_at'] = time.monotonic() + entry['cooldown']
+        return True
+
+    def is_open(self, chat_id):
+        entry = self.chats.get(chat_id)
+        return entry is not None and entry['state'] is not None
+
+    def record_success(self, chat_id):
+        self.chats.pop(chat_id, None)
+
+    def record_failure(self, chat_id, fatal=False):
+        entry = self.chats.setdefault(chat_id, {'state': None, 'failures': 0, 'cooldown': 0, 'retry_at': 0.0})
+        entry['failures'] += 1
+        if not fatal and entry['state'] is None and entry['failures'] < self.failure_threshold:
+            return
+        if entry['state'] is None:
+            entry['cooldown'] = self.cooldown
+        else:
+            entry['cooldown'] = min(self.max_cooldown, entry['cooldown'] * 2)
+        entry['state'] = self.OPEN
+        entry['retry_at'] = time.monotonic() + entry['cooldown']
+
+    def mark_dead(self, chat_id):
+        # Definitive news (e.g. the bot was removed): suppress for the longest cooldown straight away
+        self.chats[chat_id] = {'state': self.OPEN, 'failures': 1, 'cooldown': self.max_cooldown, 'retry_at': time.monotonic() + self.max_cooldown}
+
+    def mark_alive(self, chat_id):
+        self.record_success(chat_id)
+
+    def open_chats(self):
+        return [chat_id for chat_id, entry in self.chats.items() if entry['state'] is not None]
+
+
+# ********* STATISTICS *********
+
+def percentile(values, pct):
+    # Nearest-rank percentile. Returns None for an empty sample.
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+# ********* COMPACT ID SETS *********
+
+class IdSet:
+    """
+    Read-only set of Telegram IDs backed by a sorted array('q').
+    Costs 8 bytes per ID instead of the ~60 a Python set of ints needs, which matters when scanning
+    dozens of 100k-member chats. Union, difference and intersection work on whole arrays at once.
+    """
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=()):
+        if isinstance(ids, IdSet):
+            self.ids = ids.ids
+            return
+        if not (isinstance(ids, array) and ids.typecode == 'q'):
+            ids = array('q', ids)
+        if not _is_strictly_sorted(ids):
+            ids = array('q', (key for key, _ in groupby(sorted(ids))))
+        self.ids = ids
+
+    @classmethod
+    def frombytes(cls, data):
+        ids = array('q')
+        ids.frombytes(data)
+        return cls(ids)
+
+    def tobytes(self):
+        return self.ids.tobytes()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, user_id):
+        i = bisect_left(self.ids, user_id)
+        return i < len(self.ids) and self.ids[i] == user_id
+
+    def __eq__(self, other):
+        return isinstance(other, IdSet) and self.ids == other.ids
+
+    def __repr__(self):
+        return f"IdSet({len(self.ids)} ids)"
+
+    def union(self, other):
+        other = _as_id_set(other)
+        return IdSet(array('q', (key for key, _ in groupby(merge(self.ids, other.ids)))))
+
+    def difference(self, other):
+        other = _as_id_set(other)
+        if not other.ids:
+            return self
+        return IdSet(array('q', _walk_sorted(self.ids, other.ids, common=False)))
+
+    def intersection(self, other):
+        other = _as_id_set(other)
+        return IdSet(array('q', _walk_sorted(self.ids, other.ids, common=True)))
+
+    __or__ = union
+    __sub__ = difference
+    __and__ = intersection
+
+
+class GrowingIdSet:
+    """
+    IdSet that IDs can be added to, for de-duplicating a member list while it is fetched. New IDs wait in a small set
+    and are merged into the sorted array once they reach a quarter of its size, so memory stays close to IdSet's
+    8 bytes per ID and adding stays amortized O(log n).
+    """
+    __slots__ = ('merged', 'recent')
+
+    def __init__(self, ids=()):
+        self.merged = _as_id_set(ids)
+        self.recent = set()
+
+    def __len__(self):
+        return len(self.merged) + len(self.recent)
+
+    def __contains__(self, user_id):
+        return user_id in self.recent or user_id in self.merged
+
+    def add(self, user_id):
+        # Returns True if the ID was new
+        if user_id in self:
+            return False
+        self.recent.add(user_id)
+        if len(self.recent) >= max(1024, len(self.merged) // 4):
+            self._merge()
+        return True
+
+    def _merge(self):
+        self.merged = self.merged | IdSet(self.recent)
+        self.recent = set()
+
+    def freeze(self):
+        self._merge()
+        return self.merged
+
+
+def _as_id_set(ids):
+    return ids if isinstance(ids, IdSet) else IdSet(ids)
+
+
+def _walk_sorted(ids, other_ids, common):
+    # Two-pointer walk over two sorted arrays in O(n + m). Yields the IDs of ids that are (common=True) or are not
+    # (common=False) also in other_ids.
+    j, other_len = 0, len(other_ids)
+    for user_id in ids:
+        while j < other_len and other_ids[j] < user_id:
+            j += 1
+        if (j < other_len and other_ids[j] == user_id) == common:
+            yield user_id
+
+
+def _is_strictly_sorted(ids):
+    return all(a < b for a, b in zip(ids, islice(ids, 1, None)))
@@ -16,6 +16,10 @@ import asyncio
 import pytz
 import time
 import traceback 
+import socket
+import uuid
+from array import array
+from collections import deque
 
 
 from config import (
@@ -28,6 +32,7 @@ from config import (
     AUTHORIZED_ADMINS,
     NUM_BATCHES,
 )
+import config
 from db_utils import (
     initialize_db,
     insert_user_in_db,
@@ -41,9 +46,21 @@ from db_utils import (
     lookup_group_member,
     lookup_active_group_member,
     lookup_user_in_kick_db,
-    lookup_kick_count_in_kick_db,
-    insert_kicked_user_in_kick_db,
-    lookup_most_recent_kick_timestamp,
+    get_kick_counts,
+    batch_insert_kicked_users,
+    insert_purge_run,
+    claim_purge_run,
+    finish_purge_run,
+    batch_insert_purge_actions,
+    update_purge_run_status,
+    get_unfinished_purge_runs,
+    insert_purge_items,
+    get_pending_purge_items,
+    mark_purge_items,
+    insert_purge_policy,
+    get_purge_policies,
+    delete_purge_policies,
+    update_purge_policy_last_run,
     get_whitelist,
     get_whitelist_from_private,
     is_chat_authorized,
@@ -75,19 +92,33 @@ from db_utils import (
     delete_obligation_chat,
     lookup_obligation_chat,
     lookup_last_scan,
+    plan_purge,
+    get_chat_activity_stats,
     insert_last_scan,
     import_blacklist_from_csv,
     update_or_insert_group_member,
     insert_last_admin_update,
     lookup_last_admin_update,
+    insert_scan_metrics,
+    get_scan_metrics,
+    prune_scan_metrics,
+    save_scan_checkpoint,
+    load_scan_checkpoint,
+    delete_scan_checkpoint,
+    acquire_leader_lease,
+    release_leader_lease,
+    get_leader_lease,
     EventType
 )
+from kick_utils import TokenBucket, IdSet, GrowingIdSet, ChatCircuitBreaker, ClientPool, KickExecutor, RetryLater, PurgeSession, PurgeContext, BufferedWriter, BotRouter, percentile
 from datetime import datetime, timedelta, timezone
 from random import choice
 from functools import wraps
 from tqdm import tqdm
 import aioschedule as schedule
 from telethon.sync import TelegramClient
+from telethon.utils import get_peer_id
+from telethon.tl.functions.channels import GetParticipantsRequest
 from telethon.errors import ChannelPrivateError, BadRequestError, UserAdminInvalidError, TimedOutError, UserDeletedError, UsernameInvalidError
 from telethon.tl.types import (
     ChannelParticipantAdmin, 
@@ -97,9 +128,10 @@ from telethon.tl.types import (
     ChatParticipantAdmin, 
     ChatParticipantCreator,
     ChannelParticipantsKicked,
+    ChannelParticipantsSearch,
     ChannelParticipantBanned,
 )
-from telegram import Update, ChatMember, Message, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Bot, Update, ChatMember, Message, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ChatType, ParseMode
 from telegram.error import RetryAfter, Forbidden, TimedOut, BadRequest, NetworkError
 from telegram.ext import (
@@ -137,7 +169,6 @@ console_handler.setFormatter(console_formatter)
 # Attach the console handler to the root logger
 logging.getLogger().addHandler(console_handler)
 
-telethon = None
 kickbot = None
 app = None
 kickbot_path = os.path.abspath(__file__)
@@ -145,11 +176,82 @@ tracking_chat_members = True
 max_retries = 3
 authorized_chats = set()
 utc_timezone = pytz.utc
-kick_started = False
 scanning_underway = []
 let_leave_without_banning = set()
 admin_participant_types = (ChannelParticipantAdmin, ChannelParticipantCreator, ChatParticipantAdmin, ChatParticipantCreator)
-attempting_telethon_restart = False
+TELETHON_PAGE_SIZE = 200  # Participants returned per GetParticipants request
+PARTITION_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'  # A search partition too big for one query is split by one more of these
+PARTITION_RESULT_CAP = 10000  # Most participants one search query can page through
+PARTITION_MAX_DEPTH = 3  # Longest search query a partitioned scan refines down to
+SCAN_PHASES = (
+    ('iter_seconds', 'Member enumeration'),
+    ('db_update_seconds', 'Leaver verification + DB update'),
+    ('ban_leavers_seconds', 'Ban leavers'),
+    ('banned_list_seconds', 'Banned list update'),
+    ('total_seconds', 'Total'),
+)
+
+# Optional settings. Older config.py files may not define these, so fall back to defaults.
+SCAN_CHUNK_SIZE = getattr(config, 'SCAN_CHUNK_SIZE', 1000)
+BOT_API_RATE_LIMIT = getattr(config, 'BOT_API_RATE_LIMIT', 25)
+VERIFY_CONCURRENCY = getattr(config, 'VERIFY_CONCURRENCY', 8)
+
+SCAN_METRICS_BUFFER = getattr(config, 'SCAN_METRICS_BUFFER', 500)
+SCAN_CHECKPOINT_TTL_MINUTES = getattr(config, 'SCAN_CHECKPOINT_TTL_MINUTES', 30)
+LIVENESS_SWEEP_HOURS = getattr(config, 'LIVENESS_SWEEP_HOURS', 6)
+LIVENESS_SWEEP_CONCURRENCY = getattr(config, 'LIVENESS_SWEEP_CONCURRENCY', 5)
+BANNED_SYNC_MINUTES = getattr(config, 'BANNED_SYNC_MINUTES', 60)
+LEADER_LEASE_SECONDS = getattr(config, 'LEADER_LEASE_SECONDS', 60)
+PARTITIONED_SCAN_THRESHOLD = getattr(config, 'PARTITIONED_SCAN_THRESHOLD', 10000)
+PARTITION_WORKERS = getattr(config, 'PARTITION_WORKERS', 4)
+TELETHON_SCAN_CLIENTS = getattr(config, 'TELETHON_SCAN_CLIENTS', 2)
+TELETHON_INTERACTIVE_CLIENTS = getattr(config, 'TELETHON_INTERACTIVE_CLIENTS', 1)
+KICK_MAX_WORKERS = getattr(config, 'KICK_MAX_WORKERS', NUM_BATCHES)
+KICK_REPORT_SECONDS = getattr(config, 'KICK_REPORT_SECONDS', 10)
+KICK_FLUSH_SIZE = getattr(config, 'KICK_FLUSH_SIZE', 500)
+KICK_FLUSH_SECONDS = getattr(config, 'KICK_FLUSH_SECONDS', 5)
+PURGE_PROGRESS_SECONDS = getattr(config, 'PURGE_PROGRESS_SECONDS', 15)
+AUTO_PURGE_CHECK_MINUTES = getattr(config, 'AUTO_PURGE_CHECK_MINUTES', 10)
+AUTO_PURGE_STAGGER_SECONDS = getattr(config, 'AUTO_PURGE_STAGGER_SECONDS', 300)
+HELPER_BOT_TOKENS = getattr(config, 'HELPER_BOT_TOKENS', [])
+HELPER_BOT_RATE_LIMIT = getattr(config, 'HELPER_BOT_RATE_LIMIT', BOT_API_RATE_LIMIT)
+
+# Shared Bot API budget for background work (scans, verification lookups)
+bot_api_limiter = TokenBucket(BOT_API_RATE_LIMIT)
+
+# Kicks and bans are spread over the main bot and any helper bots, each with its own budget. Created in post_init().
+bot_router = None
+
+# Telethon (MTProto) connections. Scans and purges use the 'scan' clients, commands and realtime handling use the
+# 'interactive' ones, so a long room scan never holds up a lookup. Created and connected in post_init().
+telethon_pool = None
+
+# Most recent per-chat scan metrics, newest last (also persisted to the scan_metrics table)
+scan_metrics_buffer = deque(maxlen=SCAN_METRICS_BUFFER)
+
+# Per-chat circuit breaker; suppresses calls to chats the bot has been removed from or keeps failing to reach
+chat_liveness = ChatCircuitBreaker()
+
+# Leader election between kickbot processes sharing DATABASE_PATH. Only the leader runs scans, purges and scheduled jobs.
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+LEADER_LEASE_NAME = 'scanner'
+is_leader = False
+
+# Purges underway, keyed by chat_id. A chat being purged is left out of scans and its leaves are not tracked in real time.
+purge_sessions = {}
+
+# Scheduled purges started by run_due_purge_policies() and not yet finished, keyed by policy_id
+policy_purge_tasks = {}
+
+# Progress of interrupted supergroup scans, keyed by chat_id (also saved to the scan_checkpoints table on failure)
+scan_checkpoints = {}
+
+# Members of partition-scanned chats that no search query reaches but verification found still present, keyed by chat_id.
+# Later scans don't verify them again; their leaves are still picked up in real time.
+uncovered_members = {}
+
+# Chats with a "/gcstats <time> --live" member enumeration underway. Repeats meanwhile are answered from the snapshot.
+live_status_chats = set()
 
 # Initialize the SQLite database
 initialize_db()
@@ -169,9 +271,9 @@ async def update_chat_admins_cache(chat_id):
             insert_last_admin_update(chat_id)
             break
         except (BadRequest, Forbidden) as e:
-            # Expecting deleted chats to get this error
-            logging.warning(f"update_chat_admins_cache() - Error occurred for chat {chat_id}: {e}. Deleting from database.")
-            del_chats_from_db([chat_id])
+            # Expecting deleted chats to get this error. The next liveness sweep removes the chat from the database if it is gone.
+            logging.warning(f"update_chat_admins_cache() - Error occurred for chat {chat_id}: {e}.")
+            record_chat_error(chat_id, e)
             break
         except (RetryAfter, TimedOut, NetworkError) as e:
             exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -224,15 +326,8 @@ async def check_chat_admins_against_named_users(update, chat_title, chat_id) ->
             admins = await update.effective_chat.get_administrators()
         
         except (BadRequest, BadRequestError, Forbidden, ChannelPrivateError) as e:
-            logging.error(f"An access error occured in authorized_chat_check() for {chat_id} - {chat_title}. Cleaning databases.")
-            active_chats, inactive_chats, active_str, inactive_str = await find_inactive_chats()
-            if len(inactive_chats) > 0:
-                logging.warning("Found inactive chats. Cleaning database.\n")
-                logging.warning(inactive_str)
-                del_chats_from_db(inactive_chats)
-                logging.warning("Purging...\n")
-                logging.warning("Inactive channels deleted.\n")
-                logging.warning(active_str)  
+            logging.error(f"An access error occured in authorized_chat_check() for {chat_id} - {chat_title}.")
+            record_chat_error(chat_id, e)
             return False
         except Exception:
             return False
@@ -373,8 +468,8 @@ def is_admin_of_authorized_chat_check(handler_function):
                 # Runs get_chat_administrators()...if named bot admin is also chat admin, insert into cache and insert into DB as necessary
                 if await authorize_chat_and_update_cache(chat_id, chat_title) and await is_user_admin(user_id, chat_id): #Reauthorize success and user is admin
                     return await handler_function(update, context, *args, **kwargs)
-            except (BadRequest, BadRequestError, Forbidden, ChannelPrivateError):
-                await handle_inactive_chats()
+            except (BadRequest, BadRequestError, Forbidden, ChannelPrivateError) as e:
+                record_chat_error(chat_id, e)
             except Exception as e:
                 logging.error(f"An unexpected error occurred: {e}")
             return
@@ -396,6 +491,8 @@ def is_admin_of_authorized_chat_check(handler_function):
 
 # ********* UTILITIES *********
 
+# Full liveness sweep. Runs every LIVENESS_SWEEP_HOURS from the scheduler; between sweeps, liveness is tracked from
+# my_chat_member updates and from errors seen on any call (see record_chat_error()).
 async def handle_inactive_chats():
     active_chats, inactive_chats, active_str, inactive_str = await find_inactive_chats()
     if len(inactive_chats) > 0:
@@ -408,36 +505,63 @@ async def handle_inactive_chats():
     return
 
 
-async def check_telethon_connection() -> bool:
-    global telethon
-    global attempting_telethon_restart
-    if attempting_telethon_restart:
-        return
-    if telethon.is_connected():
-        #logging.warning(f"Error in telethon_restart. Client registers as connected.")
+# BadRequest texts that are about the chat (or the bot's rights in it), as opposed to one user in it
+CHAT_LEVEL_ERRORS = (
+    'chat not found', 'not enough rights', 'have no rights', 'need administrator rights', 'bot was kicked',
+    'bot is not a member', 'chat_admin_required', 'channel_invalid', 'channel_private', 'chat_id_invalid', 'chat_write_forbidden',
+)
+
+
+def is_chat_level_error(e):
+    # True for errors that say the bot can't act in the chat at all. Per-user errors (USER_ADMIN_INVALID,
+    # PARTICIPANT_ID_INVALID, user not found) are False.
+    if isinstance(e, (Forbidden, ChannelPrivateError)):
+        return True
+    return isinstance(e, (BadRequest, BadRequestError)) and any(text in str(e).lower() for text in CHAT_LEVEL_ERRORS)
+
+
+def record_chat_error(chat_id, e):
+    # Feed an error from any Telegram call into the chat's circuit breaker.
+    # Forbidden means the bot is no longer in the chat; other chat-level errors take several in a row. Errors about a
+    # single user say nothing about the chat and are not counted.
+    if chat_id is None or not is_chat_level_error(e):
         return
+    chat_liveness.record_failure(chat_id, fatal=isinstance(e, (Forbidden, ChannelPrivateError)))
+    return
+
+
+async def handle_my_chat_member(update: Update, context: CallbackContext):
+    # The bot's own membership changed. Track liveness from this instead of polling every chat.
     try:
-        # Attempt to gracefully disconnect
-        attempting_telethon_restart = True
-        await telethon.disconnect()
-    except Exception as disconnect_exception:
-        logging.warning(f"Error disconnecting Telethon prior to restart. {disconnect_exception} - Attempting reconnection anyway.")
-    try:
-        # Reinitialize and reconnect the client
-        telethon = TelegramClient('session_name', API_ID, API_HASH)
-        await telethon.start(bot_token=BOT_TOKEN)
-    except Exception as reconnect_exception:
-        logging.warning(f"Error reestablishing Telethon client. {reconnect_exception} - Abandoning.")
-        attempting_telethon_restart = False
-        return False
-    attempting_telethon_restart = False
-    return telethon.is_connected
+        chat_id = update.effective_chat.id
+        new_status = update.my_chat_member.new_chat_member.status
+        if new_status in ["left", "kicked"]:
+            logging.warning(f"Bot removed from {update.effective_chat.title} ({chat_id}). Suppressing further calls to this chat.")
+            chat_liveness.mark_dead(chat_id)
+            chat_admins_cache.pop(chat_id, None)
+        elif new_status in ["member", "administrator", "restricted"]:
+            chat_liveness.mark_alive(chat_id)
+            chat_admins_cache.pop(chat_id, None)  # Re-read the admin list on next use
+    except Exception as e:
+        logging.error(f"Error in handle_my_chat_member(): {e}")
+    return
+
+
+async def connect_telethon_client(slot_name):
+    # interactive_0 keeps the original session file, so its entity cache survives the move to a pool
+    session_name = 'memberlist_bot' if slot_name == 'interactive_0' else f'memberlist_bot_{slot_name}'
+    client = TelegramClient(session_name, API_ID, API_HASH)
+    await client.start(bot_token=BOT_TOKEN)
+    logging.warning(f"Telethon client {slot_name} connected.")
+    return client
 
 
 # Registered error handler for the app
 async def error(update, context):
     err = f"Update: {update}\nError: {context.error}"
     logging.error(err, exc_info=context.error)
+    if isinstance(update, Update) and update.effective_chat:
+        record_chat_error(update.effective_chat.id, context.error)
     return
 
 
@@ -478,24 +602,25 @@ async def debug_to_chat(exc_type, exc_value, exc_traceback, update=None):
     # Send error to all debug chats
     try:
         max_message_length = 4096  # Adjust this based on your needs
-        for debug_chat_id in DEBUG_CHATS:
-            await telethon.send_message(debug_chat_id, f"DEBUG: Error from {bot_name} in {chat_title}\n")
-            await telethon.send_message(debug_chat_id, f"{header}")
-            if len(output_str)> 12288:
-                await telethon.send_message(debug_chat_id, "Too much local variable data to return.")
-                return
-
-            # Split the long message into chunks
-            message_chunks = [output_str[i:i + max_message_length] for i in range(0, len(output_str), max_message_length)]
-            for chunk in message_chunks:
-                await telethon.send_message(debug_chat_id, chunk)
-
-            # Upload app.log file
-            log_file_path = "app.log"  # Adjust the path accordingly
-            if os.path.exists(log_file_path):
-                with open(log_file_path, "rb") as log_file:
-                    #await context.bot.send_document(chat_id=debug_chat_id, document=log_file)
-                    await telethon.send_message(debug_chat_id, file=log_file)
+        async with telethon_pool.client('interactive') as telethon:
+            for debug_chat_id in DEBUG_CHATS:
+                await telethon.send_message(debug_chat_id, f"DEBUG: Error from {bot_name} in {chat_title}\n")
+                await telethon.send_message(debug_chat_id, f"{header}")
+                if len(output_str)> 12288:
+                    await telethon.send_message(debug_chat_id, "Too much local variable data to return.")
+                    return
+
+                # Split the long message into chunks
+                message_chunks = [output_str[i:i + max_message_length] for i in range(0, len(output_str), max_message_length)]
+                for chunk in message_chunks:
+                    await telethon.send_message(debug_chat_id, chunk)
+
+                # Upload app.log file
+                log_file_path = "app.log"  # Adjust the path accordingly
+                if os.path.exists(log_file_path):
+                    with open(log_file_path, "rb") as log_file:
+                        #await context.bot.send_document(chat_id=debug_chat_id, document=log_file)
+                        await telethon.send_message(debug_chat_id, file=log_file)
 
 
     except Exception as e:
@@ -510,7 +635,7 @@ async def delete_message_after_delay(context: CallbackContext, message:Message):
         logging.warning("Error deleting message.")
     return
 
-def calculate_cutoff_date(arg):
+def parse_duration(arg):
     # Define a mapping of units to timedelta arguments
     unit_to_timedelta = {
         's': 'seconds',
@@ -530,11 +655,17 @@ def calculate_cutoff_date(arg):
         raise ValueError("Invalid unit")
 
     timedelta_arg = {unit_to_timedelta[unit]: duration}
-    cutoff_date = datetime.utcnow() - timedelta(**timedelta_arg)
     readable_string_of_duration = f"{duration} {unit_to_timedelta[unit]}"
     if duration == 1:
         readable_string_of_duration = readable_string_of_duration[:-1]
 
+    return timedelta(**timedelta_arg), readable_string_of_duration
+
+
+def calculate_cutoff_date(arg):
+    duration, readable_string_of_duration = parse_duration(arg)
+    cutoff_date = datetime.utcnow() - duration
+
     logging.warning(f"Requested duration is {readable_string_of_duration}. Cutoff date is {cutoff_date}.\n")
 
     return cutoff_date, readable_string_of_duration
@@ -543,6 +674,9 @@ def calculate_cutoff_date(arg):
 # ********* BANNING AND UNBANNING UTILITIES *********
 
 async def uniban_from_list(user_id_list, add_to_bl = True, reason = ''):
+    # Every (chat, user) ban goes through one KickExecutor, spread over the main and helper bots
+    bans = []
+    chat_titles = {}
     chat_ids_in_database = list_chats_in_db()
     for chat_id in chat_ids_in_database:
         try:
@@ -558,15 +692,13 @@ async def uniban_from_list(user_id_list, add_to_bl = True, reason = ''):
             if chat.type == ChatType.PRIVATE:
                 logging.warning(f"Can't ban from {chat_title} - PRIVATE")
                 continue     
+            chat_titles[chat_id] = chat_title
             for banning_user_id in user_id_list:
                 group_member_dict =  lookup_group_member(banning_user_id, chat_id)
                 group_member_dict = group_member_dict[0] if group_member_dict else None
                 if group_member_dict:
                     logging.warning(f"Banning {group_member_dict.get('user_name')} ({banning_user_id} - @{group_member_dict.get('username')} from {chat_title} --- {reason}")
-                try:
-                    await kickbot.ban_chat_member(chat_id, banning_user_id)
-                except Exception as e:
-                    logging.warning(f"Ban error for {banning_user_id} in {chat_title} - {e}")
+                bans.append((chat_id, banning_user_id))
 
         except (BadRequest, BadRequestError, Forbidden, ChannelPrivateError) as e:
             logging.warning(f"Can't ban from {chat_title} - Bad request or private channel error")
@@ -574,6 +706,21 @@ async def uniban_from_list(user_id_list, add_to_bl = True, reason = ''):
         except Exception as e:
             logging.warning(f"Uniban error: {e}")
             continue
+
+    async def ban_one(ban):
+        chat_id, banning_user_id = ban
+        try:
+            return await routed_call(chat_id, lambda bot: bot.ban_chat_member(chat_id, banning_user_id))
+        except RetryLater:
+            raise
+        except Exception as e:
+            logging.warning(f"Ban error for {banning_user_id} in {chat_titles.get(chat_id)} - {e}")
+
+    if bans:
+        executor = KickExecutor(ban_one, None, KICK_MAX_WORKERS * len(bot_router), max_retries=max_retries)
+        await executor.run(bans)
+        for chat_id, banning_user_id in executor.failed:
+            logging.warning(f"Max retry limit reached. {banning_user_id} not banned in {chat_titles.get(chat_id)}.")
     return
 
 
@@ -584,13 +731,14 @@ async def unban(update: Update=None, context: CallbackContext=None):
         for chat_id in chat_ids_in_database:
             try:
                 # remove_unbanned_user_from_blacklist(unban_user_list, chat_id)
-                chat = await telethon.get_entity(chat_id)
-                if hasattr(chat, 'username') and chat.username:
-                    logging.warning(f"Can't unban from {chat.title} - PRIVATE")
-                else:
-                    logging.warning(f"Unbanning left users from {chat.title}")
-                    await telethon.edit_permissions(chat_id, unban_user_id)
-                    batch_update_left(unban_user_list, chat_id)
+                async with telethon_pool.client('interactive') as telethon:
+                    chat = await telethon.get_entity(chat_id)
+                    if hasattr(chat, 'username') and chat.username:
+                        logging.warning(f"Can't unban from {chat.title} - PRIVATE")
+                    else:
+                        logging.warning(f"Unbanning left users from {chat.title}")
+                        await telethon.edit_permissions(chat_id, unban_user_id)
+                        batch_update_left(unban_user_list, chat_id)
             except ChannelPrivateError as e:
                 logging.warning(f"Can't unban from {chat.title} - PRIVATE ERROR - Chat may no longer be active")
             except Exception as e:
@@ -598,13 +746,14 @@ async def unban(update: Update=None, context: CallbackContext=None):
     async def unban_from_current_chat():
         try:
             # remove_unbanned_user_from_blacklist(unban_user_list, issuer_chat_id)
-            chat = await telethon.get_entity(issuer_chat_id)
-            if hasattr(chat, 'username') and chat.username:
-                logging.warning(f"Can't unban from {chat.title} - PRIVATE")
-            else:
-                logging.warning(f"Unbanning left users from {chat.title}")
-                await telethon.edit_permissions(issuer_chat_id, unban_user_id)
-                batch_update_left(unban_user_list, issuer_chat_id)
+            async with telethon_pool.client('interactive') as telethon:
+                chat = await telethon.get_entity(issuer_chat_id)
+                if hasattr(chat, 'username') and chat.username:
+                    logging.warning(f"Can't unban from {chat.title} - PRIVATE")
+                else:
+                    logging.warning(f"Unbanning left users from {chat.title}")
+                    await telethon.edit_permissions(issuer_chat_id, unban_user_id)
+                    batch_update_left(unban_user_list, issuer_chat_id)
         except ChannelPrivateError as e:
             logging.warning(f"Can't unban from {chat.title} - PRIVATE ERROR in unban() - May may no longer be active")
         except Exception as e:
@@ -631,9 +780,8 @@ async def unban(update: Update=None, context: CallbackContext=None):
         pass
 
     try:
-        global telethon
-        await check_telethon_connection()
-        unban_user_entity = await telethon.get_entity(id_or_username)
+        async with telethon_pool.client('interactive') as telethon:
+            unban_user_entity = await telethon.get_entity(id_or_username)
         unban_user_id = unban_user_entity.id
         unban_user_list.append(unban_user_id)
     except ValueError as e:
@@ -687,13 +835,16 @@ async def update_chat_members(update: Update=None, context: CallbackContext=None
     global let_leave_without_banning
     global scanning_underway
     try:
-        # First, clean all the inactive chats out of the database
-        await handle_inactive_chats()
-
         # Assemble a list of active chats in which the kickbot is an admin
+        # Chats whose circuit breaker is open (bot removed, repeated access errors) are skipped until their cooldown passes
         i_am_admin = []
         outdated_admin_lookups = []
-        active_ids = list_chats_in_db()     
+        # Chats with a purge underway are skipped; the purge does its own bookkeeping.
+        # The scan is what probes chats whose cooldown has passed; other callers wait for it to close them again.
+        active_ids = [
+            active_id for active_id in list_chats_in_db()
+            if not is_purging(active_id) and (chat_liveness.allow(active_id) or chat_liveness.start_probe(active_id))
+        ]
         chat_id = None
         
         for active_id in active_ids:
@@ -745,6 +896,9 @@ async def update_chat_members(update: Update=None, context: CallbackContext=None
             # Update the left_groups table with those users who have recently left a chat
             update_left_groups()
 
+            # Keep a week of scan metrics
+            prune_scan_metrics(datetime.utcnow() - timedelta(days=7))
+
         # Clear the lat_leave_without_banning list, in case any old values have not been properly erased
         # This list is expected to be empty because values should be cleared in real time as the user exits the group
         let_leave_without_banning.clear()
@@ -765,15 +919,18 @@ async def update_chat_members(update: Update=None, context: CallbackContext=None
 
 async def process_chat_member_updates(chat_id, update: Update=None, context: CallbackContext=None):  
     start_time = time.time()  # Start timer at the very beginning of the function
+    metrics = {'chat_id': chat_id, 'api_calls': 0}
     try:
-        await check_telethon_connection()
         global scanning_underway
-        global kick_started
         scanning_underway.append(chat_id)
         try:
+            metrics['api_calls'] += 1
             chat = await kickbot.get_chat(chat_id)
+            chat_liveness.record_success(chat_id)
         except Exception as e:
             logging.error(f"Error in process_chat_member_updates() - {e}")
+            record_chat_error(chat_id, e)
+            scanning_underway.remove(chat_id)
             return {}
 
         admin_ids = chat_admins_cache.get(chat_id, set())
@@ -784,9 +941,11 @@ async def process_chat_member_updates(chat_id, update: Update=None, context: Cal
         whitelist_set = {entry[0] for entry in whitelist_data}
 
         # Step 1: Fetch the list of user_ids from the chat_member table for the given chat_id
-        member_ids_in_db = set(list_member_ids_in_db(chat_id)) # Users who are currently 'Member' or 'Admin' of 'Creator' status
-        unknown_status_in_db = set(list_unkonwn_status_in_db(chat_id))
-        banned_ids_in_db = set(list_banned_users_in_db(chat_id)) # Users who are currently 'Banned' status
+        # All the large ID collections in the scan diff are compact IdSets rather than Python sets of ints
+        member_ids_in_db = IdSet(list_member_ids_in_db(chat_id)) # Users who are currently 'Member' or 'Admin' of 'Creator' status
+        unknown_status_in_db = IdSet(list_unkonwn_status_in_db(chat_id))
+        banned_ids_in_db = IdSet(list_banned_users_in_db(chat_id)) # Users who are currently 'Banned' status
+        tracked_ids_in_db = member_ids_in_db | unknown_status_in_db
         is_supergroup = True if chat.type == ChatType.SUPERGROUP or chat.type == ChatType.CHANNEL else False
 
 
@@ -794,39 +953,68 @@ async def process_chat_member_updates(chat_id, update: Update=None, context: Cal
         logging.warning(f"Cataloging members of {chat_id}")
 
 
+        # The banned list of a supergroup is not enumerated here. It is reconciled on its own schedule by sync_banned_lists().
         if is_supergroup:
-            participants, banned_users = await asyncio.gather(
-                iterate_chat_participants(chat_id),
-                iterate_banned_chat_participants(chat_id)
-            )
-            if participants is None or banned_users is None:
-                error_message = "banned user scan" if banned_users is None else "room scan"
-                logging.warning(f"{error_message} of {chat_id} returned a severe exception. Abandoning scan.")
+            # Very large chats are enumerated in concurrent search-query partitions instead of one long offset walk
+            metrics['api_calls'] += 1
+            try:
+                await bot_api_limiter.acquire()
+                member_count = await kickbot.get_chat_member_count(chat_id)
+            except Exception as e:
+                # Without a member count the chat is walked by offset
+                logging.warning(f"SCAN: Could not get member count of {chat_id} - {e}")
+                if isinstance(e, RetryAfter):
+                    bot_api_limiter.pause(e.retry_after)
+                record_chat_error(chat_id, e)
+                member_count = 0
+            if member_count >= PARTITIONED_SCAN_THRESHOLD:
+                iterate_participants = iterate_partitioned_participants
+            else:
+                iterate_participants = iterate_supergroup_participants
+            participants, resumable = await iterate_participants(chat_id, metrics)
+            if participants is None and resumable:
+                # The member list was interrupted after some progress. Carry on from the checkpoint once before giving up.
+                participants, _ = await iterate_participants(chat_id, metrics)
+            if participants is None:
+                logging.warning(f"Room scan of {chat_id} returned a severe exception. Abandoning scan.")
                 return {}
-            batch_insert_parameters, participant_user_ids = participants
-            banned_user_ids = banned_users
+            participant_count, participant_user_ids = participants
         else:
-            results = await iterate_chat_participants(chat_id)
+            results = await iterate_chat_participants(chat_id, metrics)
             if results is None:
                 logging.warning(f"Room scan of {chat_id} returned a severe exception. Abandoning scan.")
                 return {}
-            batch_insert_parameters, participant_user_ids = results
+            participant_count, participant_user_ids = results
 
 
         # Mark end of iter_participants section and log duration if TIMER_CHAT
+        # (participant rows have already been written in chunks during the iteration)
         end_iter_time = time.time()
-            
-        batch_insert_or_update_chat_member(batch_insert_parameters)
 
 
         # Step 3: Identify users that have left or joined, or who were previously banned
-        user_ids_not_in_iter_participants = member_ids_in_db.union(unknown_status_in_db) - participant_user_ids # Members, Admins or 'Not Available's in DB minus current chat occupants = Left since last scan 
-        
-        left_user_ids = await verify_user_left_chat(user_ids_not_in_iter_participants, chat_id)
+        user_ids_not_in_iter_participants = tracked_ids_in_db - participant_user_ids # Members, Admins or 'Not Available's in DB minus current chat occupants = Left since last scan 
+
+        # A partitioned scan that could not reach every member can't tell those members from leavers. Each of them is
+        # verified once; after that they are remembered as present and left to the realtime leave tracking.
+        shortfall = metrics.get('coverage_shortfall', 0)
+        if shortfall:
+            known_uncovered = uncovered_members.get(chat_id, IdSet()) & user_ids_not_in_iter_participants
+            user_ids_not_in_iter_participants = user_ids_not_in_iter_participants - known_uncovered
+            logging.warning(f"SCAN: {chat_id} coverage short by {shortfall}. Verifying {len(user_ids_not_in_iter_participants)} missing members, "
+                f"skipping {len(known_uncovered)} already confirmed present.")
+        else:
+            known_uncovered = None
+            uncovered_members.pop(chat_id, None)
+
+        left_user_ids = await verify_user_left_chat(user_ids_not_in_iter_participants, chat_id, metrics)
+        if known_uncovered is not None:
+            uncovered_members[chat_id] = known_uncovered | (user_ids_not_in_iter_participants - left_user_ids)
 
-        joined_user_ids = participant_user_ids - member_ids_in_db.union(unknown_status_in_db) # Current chat occupants minus Members/Admins/Not Available in DB = Net new + rejoins and unbanned
-        unbanned_user_ids = joined_user_ids.intersection(banned_ids_in_db) # Currently banned in the DB but rejoined the group
-        user_ids_to_ban = left_user_ids - admin_ids - let_leave_without_banning - shin_ids - whitelist_set
+        joined_user_ids = participant_user_ids - tracked_ids_in_db # Current chat occupants minus Members/Admins/Not Available in DB = Net new + rejoins and unbanned
+        unbanned_user_ids = joined_user_ids & banned_ids_in_db # Currently banned in the DB but rejoined the group
+        excused_user_ids = {user_id for user_id, excused_chat_id in let_leave_without_banning if excused_chat_id == chat_id}
+        user_ids_to_ban = left_user_ids - admin_ids - excused_user_ids - shin_ids - whitelist_set
         results = {'chat_id': chat_id, 'joined_user_ids': joined_user_ids}
     
 
@@ -841,6 +1029,7 @@ async def process_chat_member_updates(chat_id, update: Update=None, context: Cal
             
 
         # Step 5: If ban_leavers_mode is on, ban anyone with a status of "left"
+        bans_issued = IdSet()
         ban_leavers_mode = get_ban_leavers_status(chat_id)
         if ban_leavers_mode and ban_leavers_mode[0]==1:
             last_scan = lookup_last_scan(chat_id)
@@ -851,6 +1040,7 @@ async def process_chat_member_updates(chat_id, update: Update=None, context: Cal
                     logging.warning(f"BAN-LEAVERS MODE ON FOR {chat_id} - THE FOLLOWING {len(user_ids_to_ban)} USERS WILL BE BANNED:")
                     logging.warning(user_ids_to_ban)
                     await uniban_from_list(user_ids_to_ban, reason = f'SCAN - LEFT {chat.title} WHILE NO-LEAVERS MODE ON')
+                    bans_issued = user_ids_to_ban
                 else:
                     logging.warning(f"BAN-LEAVERS MODE ON FOR {chat_id} - NO SCAN IN LAST 10 MINUTES - BANNING SUSPENDED.")
 
@@ -863,19 +1053,11 @@ async def process_chat_member_updates(chat_id, update: Update=None, context: Cal
         end_ban_leavers_time = time.time()
             
 
-        # Step 6: Get total list of banned users, including any that were just banned by activating banned_leavers mode.
-        if is_supergroup:           
-
-            # Remove the users already banned in the database, so as to only update those who were not banned before the scan.
-            update_ban_status = banned_user_ids - banned_ids_in_db
-
-            # Set status, last_banned, and times_banned fields for those just banned
-            batch_update_banned(update_ban_status, chat_id)
-
-            # Arrive at a list of manually-unbanned users by subtracting currently banned users from those marked as banned in the DB.
-            manually_unbanned =  banned_ids_in_db - banned_user_ids
-            # remove_unbanned_user_from_blacklist(manually_unbanned, chat_id)
-            batch_update_left(manually_unbanned, chat_id)
+        # Step 6: Record the users just banned by banned_leavers mode.
+        if is_supergroup:
+            # Set status, last_banned, and times_banned fields for those just banned.
+            # Bans and unbans made by admins are picked up in real time, and by sync_banned_lists() as a backstop.
+            batch_update_banned(bans_issued, chat_id)
 
         else:
             if ban_leavers_mode[0]==1 and context and len(left_user_ids) > 0:
@@ -889,21 +1071,27 @@ async def process_chat_member_updates(chat_id, update: Update=None, context: Cal
 
         scanning_underway.remove(chat_id)
 
-        # If no one has been kicked from this chat in the last 10 minutes, make sure the kick_started boolean is false
-        # This variable is expected to be set back to false when a kick ends, but the following block will periodically make sure it is reset
-        most_recent_kick = lookup_most_recent_kick_timestamp(chat_id)
-        no_kick_in_last_ten = (not most_recent_kick ) or (most_recent_kick  and (datetime.now(timezone.utc) - most_recent_kick ) > timedelta(minutes=10))
-        if no_kick_in_last_ten:
-            kick_started == False
-
         # Final logging for the last part of the function if TIMER_CHAT
         end_time = time.time()
-            
+
+        metrics.update({
+            'scanned_at': datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"),
+            'iter_seconds': end_iter_time - start_time,
+            'db_update_seconds': end_db_update_time - end_iter_time,
+            'ban_leavers_seconds': end_ban_leavers_time - end_db_update_time,
+            'banned_list_seconds': end_get_banned_list_time - end_ban_leavers_time,
+            'total_seconds': end_time - start_time,
+            'participant_count': participant_count,
+            'joined_count': len(joined_user_ids),
+            'left_count': len(left_user_ids),
+        })
+        record_scan_metrics(metrics)
 
         print(f"SCAN: Update of {chat_id} ({chat.title}) completed. Scan found {len(joined_user_ids)} new users and {len(left_user_ids)} users who left. Scan time: {end_time - start_time:.2f} sec.")
     
     except (BadRequest, BadRequestError, Forbidden, ChannelPrivateError, NetworkError, RetryAfter, TimedOutError) as e:
         logging.warning(f"Bot does not seem to have Admin rights in {chat.title} Chat processessing not completed.\n")
+        record_chat_error(chat_id, e)
         scanning_underway.remove(chat_id)
         return {}
     
@@ -921,96 +1109,352 @@ async def process_chat_member_updates(chat_id, update: Update=None, context: Cal
     return results
 
 
-async def iterate_chat_participants(chat_id):
+def get_participant_user_id(participant):
+    # Most participant types carry user_id; banned/left participants carry a peer instead
+    if hasattr(participant, 'user_id'):
+        return participant.user_id
+    return get_peer_id(participant.peer, add_mark=False)
+
+
+def participant_status(participant):
+    if not hasattr(participant, 'participant'):
+        return 'Not Available'
+    elif isinstance(participant.participant, ChannelParticipantAdmin):
+        return 'Admin'
+    elif isinstance(participant.participant, ChannelParticipantCreator):
+        return 'Creator'
+    elif isinstance(participant.participant, ChannelParticipant):
+        return 'Member'
+    elif isinstance(participant.participant, ChatParticipantAdmin):
+        return 'Admin'
+    elif isinstance(participant.participant, ChatParticipantCreator):
+        return 'Creator'
+    elif isinstance(participant.participant, ChatParticipant):
+        return 'Member'
+    elif isinstance(participant.participant, ChannelParticipantBanned):
+        return 'Banned'
+    return 'Not Available'
+
+
+def participant_insert_parameters(participant, chat_id, user_status):
+    # Parameter tuple for batch_insert_or_update_chat_member()
+    user_id = participant.id
+    join_date = participant.participant.date.strftime("%Y-%m-%d %H:%M:%S.%f") if hasattr(participant, 'participant') and hasattr(participant.participant, 'date') else None
+    return (
+        user_id,
+        chat_id,
+        " ".join(filter(None, [participant.first_name, participant.last_name])),
+        participant.username,
+        participant.premium,
+        participant.verified,
+        participant.bot,
+        participant.fake,
+        participant.scam,
+        participant.restricted,
+        participant.restriction_reason if participant.restriction_reason else None,
+        user_status,
+        user_id,
+        chat_id,
+        join_date,
+        join_date,
+        #last_left
+        user_id,
+        chat_id,
+        #last_kicked
+        user_id,
+        chat_id,
+        #last_posted
+        user_id,
+        chat_id,
+        #last_banned
+        user_id,
+        chat_id,
+        #times_joined
+        user_id,
+        chat_id,
+        #times_posted
+        user_id,
+        chat_id, 
+        #times_left
+        user_id,
+        chat_id, 
+        #times_kicked
+        user_id,
+        chat_id,
+        #times_banned
+        user_id,
+        chat_id
+    )
+
+
+async def iterate_chat_participants(chat_id, metrics=None):
+    # Participants are written to the DB in chunks of SCAN_CHUNK_SIZE as they are enumerated, so memory stays bounded
+    # and each transaction is short. Only the compact set of non-banned user IDs is kept for the joined/left diff.
     try:
-        participant_user_ids = set()
+        participant_count = 0
+        participant_user_ids = array('q')
         batch_insert_parameters = []
 
-        async for participant in telethon.iter_participants(chat_id):
-            user_id = participant.id
-            member_record_dict = lookup_group_member(user_id, chat_id)
-            member_record_dict = member_record_dict[0] if len(member_record_dict) > 0 else None
-            if not hasattr(participant, 'participant'):
-                user_status = 'Not Available'
-            elif isinstance(participant.participant, ChannelParticipantAdmin):
-                user_status = 'Admin'
-            elif isinstance(participant.participant, ChannelParticipantCreator):
-                user_status = 'Creator'
-            elif isinstance(participant.participant, ChannelParticipant):
-                user_status = 'Member'
-            elif isinstance(participant.participant, ChatParticipantAdmin):
-                user_status = 'Admin'
-            elif isinstance(participant.participant, ChatParticipantCreator):
-                user_status = 'Creator'
-            elif isinstance(participant.participant, ChatParticipant):
-                user_status = 'Member'
-            elif isinstance(participant.participant, ChannelParticipantBanned):
-                user_status = 'Banned'      
-            else:
-                user_status = 'Not Available'
-
-            batch_insert_parameters.append((
-                user_id,
-                chat_id,
-                " ".join(filter(None, [participant.first_name, participant.last_name])),
-                participant.username,
-                participant.premium,
-                participant.verified,
-                participant.bot,
-                participant.fake,
-                participant.scam,
-                participant.restricted,
-                participant.restriction_reason if participant.restriction_reason else None,
-                user_status,
-                user_id,
-                chat_id,
-                participant.participant.date.strftime("%Y-%m-%d %H:%M:%S.%f") if hasattr(participant.participant, 'date') else None,
-                participant.participant.date.strftime("%Y-%m-%d %H:%M:%S.%f") if hasattr(participant.participant, 'date') else None,
-                #last_left
-                user_id,
-                chat_id,
-                #last_kicked
-                user_id,
-                chat_id,
-                #last_posted
-                user_id,
-                chat_id,
-                #last_banned
-                user_id,
-                chat_id,
-                #times_joined
-                user_id,
-                chat_id,
-                #times_posted
-                user_id,
-                chat_id, 
-                #times_left
-                user_id,
-                chat_id, 
-                #times_kicked
-                user_id,
-                chat_id,
-                #times_banned
-                user_id,
-                chat_id
-            ))
-            if user_status != 'Banned':
-                participant_user_ids.add(user_id)
-        return batch_insert_parameters, participant_user_ids
+        async with telethon_pool.client('scan') as telethon:
+            async for participant in telethon.iter_participants(chat_id):
+                user_status = participant_status(participant)
+                batch_insert_parameters.append(participant_insert_parameters(participant, chat_id, user_status))
+                participant_count += 1
+                if user_status != 'Banned':
+                    participant_user_ids.append(participant.id)
+                if len(batch_insert_parameters) >= SCAN_CHUNK_SIZE:
+                    batch_insert_or_update_chat_member(batch_insert_parameters)
+                    batch_insert_parameters = []
+                    await asyncio.sleep(0)  # Let realtime handlers run between chunks
+
+        batch_insert_or_update_chat_member(batch_insert_parameters)
+        if metrics is not None:
+            metrics['api_calls'] += participant_count // TELETHON_PAGE_SIZE + 1
+        return participant_count, IdSet(participant_user_ids)
     except Exception as e:
         logging.error(f" Error getting participant information during lookup: {e}")
         return None
 
 
-async def iterate_banned_chat_participants(chat_id):
-    banned_user_ids = set()
+def get_scan_checkpoint(chat_id):
+    # Only resume from a checkpoint while the snapshot it holds is fresh; an old partial member list is worse than a new scan
+    checkpoint = scan_checkpoints.get(chat_id)
+    if checkpoint is None:
+        try:
+            checkpoint = load_scan_checkpoint(chat_id)
+        except Exception as e:
+            logging.warning(f"SCAN: Could not load scan checkpoint for {chat_id} - {e}")
+            checkpoint = None
+    if checkpoint and datetime.utcnow() - checkpoint['started_at'] > timedelta(minutes=SCAN_CHECKPOINT_TTL_MINUTES):
+        logging.warning(f"SCAN: Discarding stale scan checkpoint for {chat_id} (started {checkpoint['started_at']}).")
+        clear_scan_checkpoint(chat_id)
+        checkpoint = None
+    return checkpoint
+
+
+def clear_scan_checkpoint(chat_id):
+    scan_checkpoints.pop(chat_id, None)
+    try:
+        delete_scan_checkpoint(chat_id)
+    except Exception as e:
+        logging.warning(f"SCAN: Could not delete scan checkpoint for {chat_id} - {e}")
+    return
+
+
+async def iterate_supergroup_participants(chat_id, metrics=None):
+    # Pages through the member list with explicit offsets so an interrupted scan can pick up where it stopped.
+    # After every chunk is written to the DB, the offset and the IDs seen so far are kept as this chat's checkpoint.
+    # If the connection drops, the checkpoint is saved to the DB and the next scan resumes from it.
+    # Returns (participants, resumable): participants is None on failure, and resumable says whether the
+    # checkpoint moved past where this call started, so another attempt would not repeat the same pages.
+    checkpoint = get_scan_checkpoint(chat_id)
+    if checkpoint and checkpoint.get('done_partitions') is not None:
+        logging.warning(f"SCAN: Discarding partitioned scan checkpoint for {chat_id}; chat is now scanned by offset.")
+        checkpoint = None
+    if checkpoint:
+        logging.warning(f"SCAN: Resuming scan of {chat_id} at participant {checkpoint['offset']}.")
+    else:
+        checkpoint = {'offset': 0, 'participant_count': 0, 'user_ids': array('q'), 'started_at': datetime.utcnow(), 'done_partitions': None}
+    scan_checkpoints[chat_id] = checkpoint
+    start_offset = checkpoint['offset']
+
+    try:
+        async with telethon_pool.client('scan') as telethon:
+            channel = await telethon.get_input_entity(chat_id)
+            batch_insert_parameters = []
+            pending_user_ids = array('q')  # IDs from pages that have not been written to the DB yet
+            offset = checkpoint['offset']
+            while True:
+                result = await telethon(GetParticipantsRequest(channel, ChannelParticipantsSearch(''), offset, TELETHON_PAGE_SIZE, hash=0))
+                if metrics is not None:
+                    metrics['api_calls'] += 1
+                if not result.participants:
+                    break
+
+                users = {user.id: user for user in result.users}
+                for participant in result.participants:
+                    user = users.get(get_participant_user_id(participant))
+                    if user is None:
+                        continue
+                    user.participant = participant
+                    user_status = participant_status(user)
+                    batch_insert_parameters.append(participant_insert_parameters(user, chat_id, user_status))
+                    if user_status != 'Banned':
+                        pending_user_ids.append(user.id)
+                offset += len(result.participants)
+
+                if len(batch_insert_parameters) >= SCAN_CHUNK_SIZE:
+                    batch_insert_or_update_chat_member(batch_insert_parameters)
+                    batch_insert_parameters = []
+                    checkpoint['user_ids'].extend(pending_user_ids)
+                    pending_user_ids = array('q')
+                    checkpoint['offset'] = offset
+                    checkpoint['participant_count'] = offset
+                    await asyncio.sleep(0)  # Let realtime handlers run between chunks
+
+                if offset >= result.count:
+                    break
+
+        batch_insert_or_update_chat_member(batch_insert_parameters)
+        checkpoint['user_ids'].extend(pending_user_ids)
+        clear_scan_checkpoint(chat_id)
+        return (offset, IdSet(checkpoint['user_ids'])), False
+
+    except Exception as e:
+        logging.error(f" Error getting participant information during lookup of {chat_id}: {e}. Saving checkpoint at participant {checkpoint['offset']}.")
+        try:
+            save_scan_checkpoint(chat_id, checkpoint)
+        except Exception as save_exception:
+            logging.warning(f"SCAN: Could not save scan checkpoint for {chat_id} - {save_exception}")
+        return None, checkpoint['offset'] > start_offset
+
+
+async def iterate_partitioned_participants(chat_id, metrics=None):
+    # For chats of PARTITIONED_SCAN_THRESHOLD members or more. One search query can only page through PARTITION_RESULT_CAP
+    # participants, so the member list is fetched as search-query partitions, at most PARTITION_WORKERS at a time.
+    # Partitions start from '' and any whose match count is over the cap is refined by one more letter or digit
+    # ('a' -> 'aa'...'a9'), down to PARTITION_MAX_DEPTH characters. Users found by more than one query are written once.
+    # Members no query can reach (names in other scripts, emoji) are reported in metrics['coverage_shortfall'].
+    # The checkpoint records completed partitions, and refined ones with a '*' suffix, so an interrupted scan only
+    # re-runs the rest. Returns (participants, resumable) like iterate_supergroup_participants().
+    checkpoint = get_scan_checkpoint(chat_id)
+    if checkpoint and checkpoint.get('done_partitions') is None:
+        logging.warning(f"SCAN: Discarding offset scan checkpoint for {chat_id}; chat is now scanned by partition.")
+        checkpoint = None
+    if checkpoint:
+        logging.warning(f"SCAN: Resuming partitioned scan of {chat_id}, {len(checkpoint['done_partitions'])} partitions already done.")
+    else:
+        checkpoint = {'offset': 0, 'participant_count': 0, 'user_ids': array('q'), 'started_at': datetime.utcnow(), 'done_partitions': []}
+    scan_checkpoints[chat_id] = checkpoint
+
+    done_partitions = set(checkpoint['done_partitions'])
+    start_done = len(checkpoint['done_partitions'])
+    seen_user_ids = GrowingIdSet(checkpoint['user_ids'])
+    expected_count = None  # Match count of the '' query: every member search can see
+    batch_insert_parameters = []
+    pending_user_ids = array('q')  # IDs from rows that have not been written to the DB yet
+
+    def flush():
+        nonlocal batch_insert_parameters, pending_user_ids
+        batch_insert_or_update_chat_member(batch_insert_parameters)
+        batch_insert_parameters = []
+        checkpoint['user_ids'].extend(pending_user_ids)
+        pending_user_ids = array('q')
+        checkpoint['participant_count'] = len(seen_user_ids)
+
+    def record(result):
+        users = {user.id: user for user in result.users}
+        for participant in result.participants:
+            user = users.get(get_participant_user_id(participant))
+            if user is None or not seen_user_ids.add(user.id):
+                continue
+            user.participant = participant
+            user_status = participant_status(user)
+            batch_insert_parameters.append(participant_insert_parameters(user, chat_id, user_status))
+            if user_status != 'Banned':
+                pending_user_ids.append(user.id)
+
+    async def fetch_partition(channel, query, queue):
+        nonlocal expected_count
+        if query + '*' in done_partitions:
+            # Refined before the interruption: only its sub-partitions are left
+            for char in PARTITION_ALPHABET:
+                queue.put_nowait(query + char)
+            return
+        if query in done_partitions:
+            return
+        async with telethon_pool.client('scan') as telethon:
+            offset = 0
+            while True:
+                result = await telethon(GetParticipantsRequest(channel, ChannelParticipantsSearch(query), offset, TELETHON_PAGE_SIZE, hash=0))
+                if metrics is not None:
+                    metrics['api_calls'] += 1
+                if query == '' and offset == 0:
+                    expected_count = result.count
+                    checkpoint['expected_count'] = result.count
+                if not result.participants:
+                    break
+                record(result)
+                offset += len(result.participants)
+
+                if offset == len(result.participants) and result.count > PARTITION_RESULT_CAP and len(query) < PARTITION_MAX_DEPTH:
+                    # Too many matches to page through: split it instead, keeping the first page
+                    flush()
+                    checkpoint['done_partitions'].append(query + '*')
+                    for char in PARTITION_ALPHABET:
+                        queue.put_nowait(query + char)
+                    return
+
+                if len(batch_insert_parameters) >= SCAN_CHUNK_SIZE:
+                    flush()
+                    await asyncio.sleep(0)  # Let realtime handlers run between chunks
+
+                if offset >= min(result.count, PARTITION_RESULT_CAP):
+                    break
+
+        # Everything this partition found is written before it is marked done
+        flush()
+        checkpoint['done_partitions'].append(query)
+
+    async def partition_worker(channel, queue, errors):
+        while True:
+            query = await queue.get()
+            try:
+                if not errors:
+                    await fetch_partition(channel, query, queue)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                queue.task_done()
+
+    try:
+        async with telethon_pool.client('scan') as telethon:
+            channel = await telethon.get_input_entity(chat_id)
+        queue = asyncio.Queue()
+        queue.put_nowait('')
+        errors = []
+        workers = [asyncio.create_task(partition_worker(channel, queue, errors)) for _ in range(PARTITION_WORKERS)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        if errors:
+            raise errors[0]
+
+        participant_count = len(seen_user_ids)
+        expected_count = expected_count or checkpoint.get('expected_count') or 0
+        shortfall = max(0, expected_count - participant_count)
+        if metrics is not None:
+            metrics['coverage_shortfall'] = shortfall
+        if shortfall:
+            logging.warning(f"SCAN: Partitioned scan of {chat_id} found {participant_count} of {expected_count} members. "
+                f"{shortfall} could not be reached by any search query (e.g. names in other scripts or emoji).")
+        participant_user_ids = IdSet(checkpoint['user_ids'])
+        clear_scan_checkpoint(chat_id)
+        return (participant_count, participant_user_ids), False
+
+    except Exception as e:
+        logging.error(f" Error getting participant information during partitioned lookup of {chat_id}: {e}. Saving checkpoint after {len(checkpoint['done_partitions'])} partitions.")
+        try:
+            flush()
+            save_scan_checkpoint(chat_id, checkpoint)
+        except Exception as save_exception:
+            logging.warning(f"SCAN: Could not save scan checkpoint for {chat_id} - {save_exception}")
+        return None, len(checkpoint['done_partitions']) > start_done
+
+
+async def iterate_banned_chat_participants(chat_id, metrics=None):
+    banned_user_ids = array('q')
     if chat_id == -1002100074918:
         pass
     try:
-        async for participant in telethon.iter_participants(chat_id, filter = ChannelParticipantsKicked):     
-            participant_id = getattr(participant, 'id', None)
-            if participant_id and isinstance(participant_id, int):
-                banned_user_ids.add(participant_id)
+        async with telethon_pool.client('scan') as telethon:
+            async for participant in telethon.iter_participants(chat_id, filter = ChannelParticipantsKicked):     
+                participant_id = getattr(participant, 'id', None)
+                if participant_id and isinstance(participant_id, int):
+                    banned_user_ids.append(participant_id)
     except (AttributeError, ValueError) as e:
         logging.error(f"Error getting banned participant information during lookup: {e}")
         # Capture the exception and the traceback
@@ -1019,29 +1463,91 @@ async def iterate_banned_chat_participants(chat_id):
         traceback_details = traceback.format_exception(exc_type, exc_value, exc_traceback)
         # Log the detailed traceback
         print("Error occurred:\n" + "".join(traceback_details))
-        return set()
+        return IdSet()
     except Exception as e:
         logging.error(f"Severe error getting banned participant information during lookup: {e}")
         return None
 
-    return banned_user_ids
+    if metrics is not None:
+        metrics['api_calls'] += len(banned_user_ids) // TELETHON_PAGE_SIZE + 1
+    return IdSet(banned_user_ids)
+
+
+async def sync_banned_lists():
+    # Reconciles the banned list of every supergroup with the database.
+    # Bans change rarely and admin bans are recorded in real time by handle_new_member(), so this runs every
+    # BANNED_SYNC_MINUTES instead of with every room scan.
+    try:
+        for chat_id in list_chats_in_db():
+            # Kicks during a purge are a ban followed by an unban, so a chat being purged is synced next time
+            if not chat_liveness.allow(chat_id) or is_purging(chat_id):
+                continue
+            try:
+                await bot_api_limiter.acquire()
+                chat = await kickbot.get_chat(chat_id)
+                if chat.type not in [ChatType.SUPERGROUP, ChatType.CHANNEL] or not await is_user_admin(kickbot.id, chat_id):
+                    continue
+            except Exception as e:
+                logging.warning(f"BAN SYNC: Could not look up {chat_id} - {e}")
+                record_chat_error(chat_id, e)
+                continue
+
+            banned_user_ids = await iterate_banned_chat_participants(chat_id)
+            if banned_user_ids is None:
+                logging.warning(f"BAN SYNC: Banned user scan of {chat.title} ({chat_id}) returned a severe exception. Skipping.")
+                continue
+
+            banned_ids_in_db = IdSet(list_banned_users_in_db(chat_id))
+
+            # Set status, last_banned, and times_banned fields for users banned since the last sync.
+            newly_banned = banned_user_ids - banned_ids_in_db
+            batch_update_banned(newly_banned, chat_id)
 
+            # Arrive at a list of manually-unbanned users by subtracting currently banned users from those marked as banned in the DB.
+            manually_unbanned = banned_ids_in_db - banned_user_ids
+            batch_update_left(manually_unbanned, chat_id)
+
+            logging.warning(f"BAN SYNC: {chat.title} ({chat_id}) - {len(banned_user_ids)} banned, {len(newly_banned)} newly recorded, {len(manually_unbanned)} unbanned.")
+    except Exception as e:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        await debug_to_chat(exc_type, exc_value, exc_traceback)
+        logging.error(f"Error in sync_banned_lists(): {e}")
+    return
 
-async def verify_user_left_chat(user_list, chat_id):
+
+async def verify_user_left_chat(user_list, chat_id, metrics=None):
     # Under the right conditions, users who leave the chat may be subject to ban.
     # If the user is not found by telethon's iter_participants(), this function will veryify they have a chat status if 'left'
+    # Lookups run concurrently (at most VERIFY_CONCURRENCY at a time) under the shared Bot API rate limiter.
     left_user_ids = set()
-    for user_id_to_be_verified in user_list:
-        try:
-            result = None
-            result_user_id = None
-            result = await kickbot.get_chat_member(chat_id, user_id_to_be_verified)
-            result_user_id = result.user.id
-        except Exception as e:
-            logging.warning(f"SCAN: Error verifying {user_id_to_be_verified} left {chat_id} - {e}")
-            batch_update_left([user_id_to_be_verified], chat_id)# UPDATE IN DB DIRECTLY WITHOUT FLAGGING AS A LEFT USER FOR BANNING PURPOSES
+    unverified_user_ids = []
+    banned_user_ids = []
+    semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+    async def get_member_status(user_id_to_be_verified):
+        async with semaphore:
+            rt = 0
+            while rt < max_retries:
+                await bot_api_limiter.acquire()
+                if metrics is not None:
+                    metrics['api_calls'] += 1
+                try:
+                    return await kickbot.get_chat_member(chat_id, user_id_to_be_verified)
+                except RetryAfter as e:
+                    bot_api_limiter.pause(e.retry_after)
+                    rt += 1
+                except Exception as e:
+                    logging.warning(f"SCAN: Error verifying {user_id_to_be_verified} left {chat_id} - {e}")
+                    break
+            unverified_user_ids.append(user_id_to_be_verified)
+            return None
+
+    results = await asyncio.gather(*(get_member_status(user_id) for user_id in user_list))
+
+    for result in results:
         if not result:
             continue # If the user is not found in the chat, it is unclear what is wrong but they shouldn't be banned
+        result_user_id = result.user.id
         if result.status in ["administrator", "creator"]:
             logging.warning(f"SCAN: {result_user_id} ({result.user.full_name}) left the chat {chat_id} but was an administrator.")
             pass
@@ -1049,11 +1555,13 @@ async def verify_user_left_chat(user_list, chat_id):
             logging.warning(f"SCAN: {result_user_id} ({result.user.full_name}) is verified to have left {chat_id}.")
             left_user_ids.add(result_user_id)
         elif result.status == 'kicked': # In telethon vocabulary, 'kicked' means banned (i.e. on the 'removed' list).
-            batch_update_banned([result_user_id], chat_id)
+            banned_user_ids.append(result_user_id)
         else:
             logging.warning(f"SCAN: {result_user_id} ({result.user.full_name}) has a status of {result.status} in {chat_id}, and was therefore not considered a leaver.")
             pass
 
+    batch_update_left(unverified_user_ids, chat_id) # UPDATE IN DB DIRECTLY WITHOUT FLAGGING AS A LEFT USER FOR BANNING PURPOSES
+    batch_update_banned(banned_user_ids, chat_id)
     return left_user_ids
 
 
@@ -1120,7 +1628,8 @@ async def process_scanner_obligation_kicks(results):
 
                         logging.warning(f"SCAN: {results_chat_id} OBLIGATION KICK: {joined_user_name} ({joined_user_id} - @{joined_user_member_dict.get('username') }) kicked from {chat_name_dict.get('results_chat_id')} for not belonging to {chat_name_dict.get(obligation_chat_id)}.")
 
-                        joined_user_telethon = await telethon.get_entity(joined_user_id)
+                        async with telethon_pool.client('scan') as telethon:
+                            joined_user_telethon = await telethon.get_entity(joined_user_id)
                         await obligation_kick(joined_user_id, results_chat_id, results_chat_type, joined_user_name, chat_name_dict.get(obligation_chat_id))
 
                         #Insert or update this group member in the satabase, with a status of "kicked"
@@ -1136,33 +1645,116 @@ async def process_scanner_obligation_kicks(results):
     return
 
 
-async def suspend_scanning():
-    if not tracking_chat_members:
-        return
-    global scanning_underway
-    logging.warning("Suspending timed chat tracking.")
-    schedule.clear()
-    while kick_started:
-        await asyncio.sleep(1)
-    schedule.every(3).minutes.do(update_chat_members)
+# ********* SCAN METRICS *********
+
+def record_scan_metrics(metrics):
+    scan_metrics_buffer.append(metrics)
+    try:
+        insert_scan_metrics(metrics)
+    except Exception as e:
+        logging.warning(f"Could not save scan metrics for {metrics.get('chat_id')} - {e}")
+    return
 
-    logging.warning("Timed chat tracking re-started.")
 
+def summarize_scan_metrics(samples):
+    # p50/p95 per scan phase, plus the slowest chats by their worst scan in the sample
+    chat_names = get_chat_ids_and_names()
+    summary = f"SCAN METRICS ({len(samples)} scans)\n\n"
+    for phase, label in SCAN_PHASES:
+        values = [sample[phase] for sample in samples if sample.get(phase) is not None]
+        p50 = percentile(values, 50)
+        p95 = percentile(values, 95)
+        if p50 is None:
+            continue
+        summary += f"{label}: p50 {p50:.2f}s / p95 {p95:.2f}s\n"
+
+    api_calls = [sample['api_calls'] for sample in samples if sample.get('api_calls') is not None]
+    if api_calls:
+        summary += f"API calls per scan: p50 {percentile(api_calls, 50)} / p95 {percentile(api_calls, 95)}\n"
+
+    short = {}
+    for sample in samples:
+        if sample.get('coverage_shortfall'):
+            short[sample['chat_id']] = sample
+    if short:
+        summary += "\nINCOMPLETE COVERAGE (members no search query reaches)\n"
+        for sample in sorted(short.values(), key=lambda x: x['coverage_shortfall'], reverse=True)[:5]:
+            chat_name = chat_names.get(sample['chat_id']) or sample['chat_id']
+            summary += f"{chat_name}: {sample['coverage_shortfall']} of {sample['participant_count'] + sample['coverage_shortfall']} members\n"
+
+    slowest = {}
+    for sample in samples:
+        chat_id = sample['chat_id']
+        if chat_id not in slowest or sample['total_seconds'] > slowest[chat_id]['total_seconds']:
+            slowest[chat_id] = sample
+    summary += "\nSLOWEST CHATS\n"
+    for sample in sorted(slowest.values(), key=lambda x: x['total_seconds'], reverse=True)[:5]:
+        chat_name = chat_names.get(sample['chat_id']) or sample['chat_id']
+        summary += f"{chat_name}: {sample['total_seconds']:.2f}s ({sample['participant_count']} members, {sample['api_calls']} API calls)\n"
+    return summary
+
+
+async def scan_stats(update: Update, context: CallbackContext):
+    chat_id = update.effective_chat.id
+    chat_type = update.effective_chat.type
+    if chat_type != ChatType.PRIVATE:
+        await context.bot.send_message(chat_id=chat_id, text="This command only works in a private chat with the bot")
+        return
+    try:
+        # The ring buffer only covers this process's lifetime, so fall back to the table after a restart
+        samples = list(scan_metrics_buffer)
+        if not samples:
+            samples = get_scan_metrics(datetime.utcnow() - timedelta(days=1))
+        if not samples:
+            await context.bot.send_message(chat_id=chat_id, text="No scan metrics recorded yet.")
+            return
+        await context.bot.send_message(chat_id=chat_id, text=summarize_scan_metrics(samples))
+    except Exception as e:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
+        logging.error(f"Error in the scan_stats() function: {e}")
     return
 
 
 # Function to run the scheduled tasks
 async def run_scheduled_tasks():
     while tracking_chat_members:
-        await schedule.run_pending()
+        # Standby instances keep their schedule but don't run it. Jobs that came due meanwhile run once on takeover.
+        if is_leader:
+            await schedule.run_pending()
         await asyncio.sleep(1)
 
 
+# ********* LEADER ELECTION *********
+
+async def leader_heartbeat():
+    # Takes the lease if it is free or has lapsed, and renews it while this instance holds it.
+    # Renewing at a third of the lease length leaves room for two missed heartbeats before another instance takes over.
+    global is_leader
+    while True:
+        try:
+            leader_now = acquire_leader_lease(LEADER_LEASE_NAME, INSTANCE_ID, LEADER_LEASE_SECONDS)
+        except Exception as e:
+            logging.error(f"Error renewing leader lease: {e}")
+            leader_now = False
+        if leader_now and not is_leader:
+            logging.warning(f"LEADER: {INSTANCE_ID} is now the leader. Running scans and scheduled jobs.")
+            asyncio.create_task(handle_inactive_chats())  # Liveness sweep on takeover; after that it runs every LIVENESS_SWEEP_HOURS
+            asyncio.create_task(resume_purges())  # Purges the previous leader (or this process, before a restart) left unfinished
+        elif is_leader and not leader_now:
+            logging.warning(f"LEADER: {INSTANCE_ID} lost the leader lease. Standing by.")
+        is_leader = leader_now
+        await asyncio.sleep(LEADER_LEASE_SECONDS / 3)
+
+
 # ********* COMMAND HANDLING *********
 
 
 async def start_chat_member_tracking(update: Update=None, context: CallbackContext=None):
-    schedule.every(3).minutes.do(update_chat_members, update, context)
+    schedule.every(3).minutes.do(update_chat_members, update, context).tag('scan')
+    schedule.every(LIVENESS_SWEEP_HOURS).hours.do(handle_inactive_chats).tag('maintenance')
+    schedule.every(BANNED_SYNC_MINUTES).minutes.do(sync_banned_lists).tag('maintenance')
+    schedule.every(AUTO_PURGE_CHECK_MINUTES).minutes.do(run_due_purge_policies).tag('maintenance')
     global tracking_chat_members
     tracking_chat_members= True  
     print("Timed chat tracking started.")
@@ -1309,15 +1901,14 @@ async def chat_status(update: Update, context: CallbackContext):
     issuer_user_id = update.effective_user.id
     chat_type = update.effective_chat.type
 
-    total_members = 0
-    posted_in_last_12_hours = 0
-    not_posted = 0
-
     if not context.args:
         # No arguments passed
-        update.message.reply_text("No arguments provided.")
+        await update.message.reply_text("No arguments provided.")
         return
 
+    # Stats come from the last scan snapshot; "--live" enumerates the member list again, one enumeration per chat at a time
+    live = any(arg.lstrip('-').lower() == 'live' for arg in context.args[1:])
+
     if not is_user_admin(context.bot.id, chat_id):
         return
     
@@ -1339,54 +1930,64 @@ async def chat_status(update: Update, context: CallbackContext):
         asyncio.create_task(delete_message_after_delay(context, message))
     try:
         cutoff_date, readable_string_of_duration = calculate_cutoff_date(context.args[0])
-        user_data = get_user_activity(chat_id)
-        
-        # Convert user_data and admin_ids into sets for faster lookups
-        user_data_set = {entry['user_id'] for entry in user_data}
+        now = datetime.utcnow()
+        windows = [('1h', timedelta(hours=1)), ('1d', timedelta(days=1)), ('7d', timedelta(days=7)), ('30d', timedelta(days=30))]
+        counts = get_chat_activity_stats(chat_id, [cutoff_date] + [now - window for _, window in windows])
+        total_members = counts['members']
+        lurkers = counts['inactive'][0]
+        not_posted = counts['never_posted']
 
         three_strikes_mode = get_three_strikes(chat_id)
         ban_leavers_mode = get_ban_leavers_status(chat_id)
         obligation_chat = lookup_obligation_chat(chat_id)
 
-        if API_ID and API_HASH:
-            await check_telethon_connection()
-            async for user in telethon.iter_participants(chat_id):
-                user_id = user.id
-                is_member = isinstance(user.participant, ChannelParticipant) or isinstance(user.participant, ChatParticipant)
-                if is_member:
-                    total_members += 1
-                # Check if the user exists in the user_data set or has no last_activity
-                if user_id in user_data_set:
-                    matching_entry = next(entry for entry in user_data if entry['user_id'] == user_id)
-                    last_activity = matching_entry['last_activity']
-                else:
-                    last_activity = None
-
-                # Convert last_activity to datetime if it's not None
-                last_activity_datetime = datetime.strptime(last_activity, '%Y-%m-%d %H:%M:%S.%f') if last_activity else None
-
-                # If the user has a last_activity, and it is after the cutoff date, they are immune from kick
-                if is_member and (last_activity_datetime is not None and cutoff_date < last_activity_datetime):
-                    posted_in_last_12_hours += 1
+        if live and API_ID and API_HASH and chat_id not in live_status_chats:
+            live_status_chats.add(chat_id)
+            try:
+                activity_by_user = {entry['user_id']: entry['last_activity'] for entry in get_user_activity(chat_id)}
+                total_members = lurkers = not_posted = 0
+                async with telethon_pool.client('interactive') as telethon:
+                    async for user in telethon.iter_participants(chat_id):
+                        if not isinstance(user.participant, (ChannelParticipant, ChatParticipant)):
+                            continue
+                        total_members += 1
+                        last_activity = activity_by_user.get(user.id)
+                        # If the user has a last_activity, and it is after the cutoff date, they are immune from kick
+                        if not last_activity or datetime.fromisoformat(last_activity) <= cutoff_date:
+                            lurkers += 1
+                        if not last_activity:
+                            not_posted += 1
+            finally:
+                live_status_chats.discard(chat_id)
+            source = "live member list"
+        else:
+            last_scan = lookup_last_scan(chat_id)
+            source = f"scan snapshot, {format_timedelta(datetime.now(timezone.utc) - last_scan)} old" if last_scan else "scan snapshot, no scan yet"
+            if live:
+                source += " (live count unavailable)"
 
-                if is_member and last_activity_datetime is None:
-                    not_posted +=1
-        time_window_lurk_rate = round((total_members - posted_in_last_12_hours) / total_members * 100, 1) if total_members > 0 else "N/A"
+        time_window_lurk_rate = round(lurkers / total_members * 100, 1) if total_members > 0 else "N/A"
         total_lurk_rate = round((not_posted) / total_members * 100, 1) if total_members > 0 else "N/A"
         lurker_message = f"KICKBOT GROUP CHAT STATS FOR {chat_name}.\n\n"
         lurker_message += f"❌ 3 STRIKES MODE is {'on' if three_strikes_mode[0]==1 else 'off'}.\n\n"
         lurker_message += f"🚫 BAN LEAVERS MODE is {'on' if ban_leavers_mode[0]==1 else 'off'}.\n\n"
         lurker_message += f"🚫 OBLIGATION BACKUP SET TO {obligation_chat if obligation_chat else 'NONE'}.\n\n"
         lurker_message += f"👤 There are {total_members} non-admin members in the group.\n\n"
-        lurker_message += f"⏱ {total_members - posted_in_last_12_hours} have NOT posted in the last {readable_string_of_duration} ({time_window_lurk_rate}% recent lurker).\n\n"
+        lurker_message += f"⏱ {lurkers} have NOT posted in the last {readable_string_of_duration} ({time_window_lurk_rate}% recent lurker).\n\n"
         lurker_message += f"💥 {not_posted} users have not posted at all. ({total_lurk_rate}% total lurker)"
+
+        # Inactivity at fixed windows, from the chat's activity aggregates
+        lurker_message += f"\n\n📊 Of {counts['members']} members in the snapshot ({counts['posters']} have posted), inactive for "
+        lurker_message += ", ".join(f"{label}: {count}" for (label, _), count in zip(windows, counts['inactive'][1:]))
+        lurker_message += f", never posted: {counts['never_posted']}."
+        lurker_message += f"\n\n🗂 Source: {source}."
         if chat_id in DEBUG_CHATS:
             await context.bot.send_message(chat_id=chat_id, text=f"DEBUG: {lurker_message}")
         await context.bot.send_message(chat_id=issuer_user_id, text=lurker_message)
     except (IndexError, ValueError) as e:
         exc_type, exc_value, exc_traceback = sys.exc_info()
         await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
-        await context.bot.send_message(chat_id=chat_id, text="Invalid command format. Use /gcstats <time> (e.g., /gcstats 1d).")
+        await context.bot.send_message(chat_id=chat_id, text="Invalid command format. Use /gcstats <time> [--live] (e.g., /gcstats 1d).")
         logging.error(f"An error occurred in kick_inactive_users(), probably due to an invalid time argument.")
     except Exception as e:
         exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -1412,8 +2013,8 @@ async def lookup(update: Update, context: CallbackContext):
     except:
         pass   
     try:
-        await check_telethon_connection()
-        kicked_user = await telethon.get_entity(id_or_username)
+        async with telethon_pool.client('interactive') as telethon:
+            kicked_user = await telethon.get_entity(id_or_username)
         kicked_user_id = kicked_user.id
 
     except UsernameInvalidError as e:
@@ -1475,7 +2076,8 @@ async def lookup(update: Update, context: CallbackContext):
 
         for i_am_admin_row in i_am_admin:
             kicked_user_chat_id = i_am_admin_row['chat_id']
-            chat = await telethon.get_entity(kicked_user_chat_id)       
+            async with telethon_pool.client('interactive') as telethon:
+                chat = await telethon.get_entity(kicked_user_chat_id)       
             chat_name = chat.title
             kicked_user_row = next((row for row in kicked_user_data if row[1] == chat_id), None)
             # blacklist_row = next((row for row in blacklist_data if row[1] == chat_id), None)
@@ -1567,49 +2169,62 @@ async def clean_database(update, context):
     return
 
 
+async def classify_chat_liveness(chat_id, semaphore):
+    # Returns (chat_id, chat, is_active). is_active is None if the chat could not be classified.
+    async with semaphore:
+        rt = 0
+        while rt < max_retries:
+            await bot_api_limiter.acquire()
+            try:
+                chat = await kickbot.get_chat(chat_id)
+                # A private chat is a bot chat, not a group to track
+                return chat_id, chat, chat.type != ChatType.PRIVATE
+            except (BadRequest, Forbidden) as e:
+                # Expecting deleted chats to get this error
+                logging.warning(f"Bad Request occurred in chat {chat_id}: Possible that chat has nuked.")
+                return chat_id, None, False
+            except (RetryAfter, TimedOut, NetworkError) as e:
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                wait_seconds = e.retry_after if hasattr(e, 'retry_after') else 3
+                logging.warning(f"Error in find_inactive_chats() - {e}.  Line: {exc_traceback.tb_lineno} - Type: {exc_type}. Waiting for {wait_seconds} seconds...")
+                if hasattr(e, 'retry_after'):
+                    bot_api_limiter.pause(wait_seconds)
+                else:
+                    await asyncio.sleep(wait_seconds)
+                rt += 1
+            except Exception as e:
+                # Unknown exception, being conservative and not labeling as inactive.
+                logging.warning(f"Unhandled exception occurred in chat {chat_id}: {e}")
+                return chat_id, None, True
+        logging.warning(f"Max retry limit reached. Chat {chat_id} not classified.")
+        return chat_id, None, None
+
+
 async def find_inactive_chats():
+    # Looks up every chat in the DB concurrently (at most LIVENESS_SWEEP_CONCURRENCY at a time, under the shared
+    # Bot API rate limit) and feeds the results into the chat liveness circuit breaker.
     active_chats = []
     inactive_chats = []
+    active_str = "CURRENT ACTIVE CHATS\n"
+    inactive_str = "INACTIVE CHATS IN DATABASE\n"
     try:
         chat_ids_in_database = list_chats_in_db()
-        chat=None
-        active_str = "CURRENT ACTIVE CHATS\n"
-        inactive_str = "INACTIVE CHATS IN DATABASE\n"
-        for chat_id in chat_ids_in_database:
-            rt = 0
-            while rt < max_retries:
-                try:
-                    chat = await kickbot.get_chat(chat_id)
-                    if chat.type == ChatType.PRIVATE:
-                        # if not a private bot chat:
-                        inactive_chats.append(chat_id)
-                        inactive_str = inactive_str + f"{chat_id}\n"
-                        break
-                    else:
-                        active_chats.append([chat.id, chat.title])
-                        active_str = active_str + f"{chat.id} - {chat.title}\n"
-                        break
-                except (BadRequest, Forbidden) as e:
-                    # Expecting deleted chats to get this error
-                    inactive_chats.append(chat_id)
-                    inactive_str = inactive_str + f"{chat_id}\n"
-                    logging.warning(f"Bad Request occurred in chat {chat_id}: Possible that {chat.title if chat else 'chat'} has nuked.")
-                    break
-                except (RetryAfter, TimedOut, NetworkError) as e:
-                    exc_type, exc_value, exc_traceback = sys.exc_info()
-                    wait_seconds = e.retry_after if hasattr(e, 'retry_after') else 3
-                    logging.warning(f"Error in find_inactive_chats() - {e}.  Line: {exc_traceback.tb_lineno} - Type: {exc_type}. Waiting for {wait_seconds} seconds...")
-                    await asyncio.sleep(wait_seconds)
-                    rt += 1
-                    if rt == max_retries:
-                        logging.warning(f"Max retry limit reached. Chat {chat.title if chat else 'chat'} not classified.")
-                        break
-                except Exception as e:
-                    # Unknown exception, being conservative and not labeling as inactive.
-                    active_chats.append(chat_id)
-                    active_str = active_str + f"{chat_id}\n"
-                    logging.warning(f"Unhandled exception occurred in chat {chat_id}: {e}")
-                    break
+        semaphore = asyncio.Semaphore(LIVENESS_SWEEP_CONCURRENCY)
+        results = await asyncio.gather(*(classify_chat_liveness(chat_id, semaphore) for chat_id in chat_ids_in_database))
+        for chat_id, chat, is_active in results:
+            if is_active is None:
+                continue
+            elif not is_active:
+                inactive_chats.append(chat_id)
+                inactive_str = inactive_str + f"{chat_id}\n"
+                chat_liveness.mark_dead(chat_id)
+            elif chat:
+                active_chats.append([chat.id, chat.title])
+                active_str = active_str + f"{chat.id} - {chat.title}\n"
+                chat_liveness.mark_alive(chat_id)
+            else:
+                active_chats.append(chat_id)
+                active_str = active_str + f"{chat_id}\n"
 
     except Exception as e:
         exc_type, exc_value, exc_traceback = sys.exc_info()
@@ -1645,7 +2260,6 @@ async def show_wholeft(update: Update, context: CallbackContext):
             users_by_channel[channel_id].append((user_id, user_name, time_in_group))
 
         # Print the results
-        await check_telethon_connection()
 
         csv_filename = "leavers.csv"
 
@@ -1654,7 +2268,8 @@ async def show_wholeft(update: Update, context: CallbackContext):
             csv_writer.writerow(["CHAT ID", "CHAT NAME", "USER ID", "USER NAME", "TIMES LEFT", "AVG TIME IN GROUP"])
 
         for channel_id, user_data in users_by_channel.items():
-            chat_entity = await telethon.get_entity(channel_id)
+            async with telethon_pool.client('interactive') as telethon:
+                chat_entity = await telethon.get_entity(channel_id)
             title = chat_entity.title
             # wholeft_message += f"{title.upper()}\n"
             users_to_report = []
@@ -1721,7 +2336,6 @@ async def set_backup(update, context):
     issuer_chat_type = update.effective_chat.type
     issuer_chat_name = update.effective_chat.title
     try:
-        await check_telethon_connection()
 
         if issuer_chat_type == ChatType.PRIVATE:
             message = await context.bot.send_message(
@@ -1860,18 +2474,18 @@ async def button_click(update, context):
 
 async def obligation_kick(user_id, chat_id, chat_type, user_name, obligation_chat_name): 
     global let_leave_without_banning
-    await check_telethon_connection()
     rt = 0
     while rt < max_retries:
         try:
             logging.warning(f"Kicking {user_name} from {chat_id} for not belonging to {obligation_chat_name}.")
-            greeting = await telethon.send_message(
-            entity=chat_id,
-            message=f"{user_name}, This group needs you to first join the group <strong>{obligation_chat_name}</strong> before coming here. After that, you'll be free to rejoin.",
-            parse_mode='html'
-        ) 
-            await asyncio.sleep(5)
-            await telethon.delete_messages(chat_id, greeting)
+            async with telethon_pool.client('interactive') as telethon:
+                greeting = await telethon.send_message(
+                entity=chat_id,
+                message=f"{user_name}, This group needs you to first join the group <strong>{obligation_chat_name}</strong> before coming here. After that, you'll be free to rejoin.",
+                parse_mode='html'
+            ) 
+                await asyncio.sleep(5)
+                await telethon.delete_messages(chat_id, greeting)
             
             if (chat_type == ChatType.SUPERGROUP or chat_type == ChatType.CHANNEL):
                 let_leave_without_banning.add((user_id, chat_id))
@@ -1994,6 +2608,17 @@ async def handle_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     was_member = old_status in ["member", "administrator", "creator"]
     is_member = new_status in ["member", "administrator", "creator"]
 
+    # An admin lifting a ban (kicked -> left) is not a join or leave, but the database should stop showing the user as banned.
+    # Kicks by the bot itself are a ban followed by an unban, and are recorded by the kick functionality.
+    if old_status == 'kicked' and new_status == 'left' and not is_purging(update.effective_chat.id):
+        chat_id = update.effective_chat.id
+        user_id = update.chat_member.new_chat_member.user.id
+        member = lookup_group_member(user_id, chat_id)
+        if member and member[0]['status'] == 'Banned':
+            logging.warning(f"REALTIME: {chat_id} -- {user_id} unbanned.")
+            batch_update_left([user_id], chat_id)
+        return
+
     # If the status change is not someone joining or leaving the chat, return early
     if not (not was_member and is_member) and not (not is_member and was_member):
         return
@@ -2044,14 +2669,15 @@ async def handle_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Proceed with this block if there has been a transition to no longer being a member (left group)
         elif (not is_member and was_member): 
 
-            # If a kick is started, ignore. The kick functionality will do the database updates
-            if user_id == context.bot.id or kick_started:
+            # If a kick is underway in this chat, ignore. The kick functionality will do the database updates
+            if user_id == context.bot.id or is_purging(chat_id):
                 return
             
             if new_status == 'kicked':  #User was banned manually by an admin
-                logging.warning(f"REALTIME: {chat_id} -- {user_name} (@{username}, {user_id}) removed from {chat_name}."
+                logging.warning(f"REALTIME: {chat_id} -- {user_name} (@{username}, {user_id}) banned from {chat_name}."
             )
-                # Because we're not sure if the user was kicked or banned, we will rely on the next room scan to set the database status
+                # Record the ban now. If it was really a kick, the unban that follows sets the status back to 'Left'.
+                update_or_insert_group_member(chat_id, new_chat_member, EventType.BANNED)
                 return 
 
             #  No matter the admin status, log the leaving of the group 
@@ -2090,7 +2716,6 @@ async def handle_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def handle_message(update: Update, context: CallbackContext): 
     rt = 0
-    await check_telethon_connection()
     if not update.effective_chat or not update.effective_message or not update.effective_user:
         return
     while rt < max_retries:
@@ -2132,6 +2757,7 @@ async def handle_message(update: Update, context: CallbackContext):
 
         except (BadRequest, BadRequestError, Forbidden, ChannelPrivateError) as e:
             logging.warning(f"PRIVATE ERROR - {chat_name} may no longer be active")
+            record_chat_error(update.effective_chat.id, e)
             break
 
         except (RetryAfter, TimedOut, TimeoutError, NetworkError) as e:
@@ -2178,13 +2804,13 @@ async def whitelist_user(update: Update, context: CallbackContext):
         )
         # Schedule a task to delete the message after 5 seconds
         asyncio.create_task(delete_message_after_delay(context, message))
-        await check_telethon_connection()
         try:
             lookup_id = int(context.args[0])
         except:
             lookup_id = context.args[0]
 
-        user = await telethon.get_entity(lookup_id)
+        async with telethon_pool.client('interactive') as telethon:
+            user = await telethon.get_entity(lookup_id)
         user_id = user.id
         user_name = " ".join(filter(None, [user.first_name, user.last_name]))
         insert_user_in_db(user_id, chat_id, "whitelist")
@@ -2228,12 +2854,12 @@ async def dewhitelist_user(update: Update, context: CallbackContext):
         )
         # Schedule a task to delete the message after 5 seconds
         asyncio.create_task(delete_message_after_delay(context, message))
-        await check_telethon_connection()
         try:
             lookup_id = int(context.args[0])
         except:
             lookup_id = context.args[0]
-        user = await telethon.get_entity(lookup_id)
+        async with telethon_pool.client('interactive') as telethon:
+            user = await telethon.get_entity(lookup_id)
         user_id = user.id
         user_name = " ".join(filter(None, [user.first_name, user.last_name]))
         delete_user_from_db(user_id, chat_id, "whitelist")
@@ -2284,7 +2910,6 @@ async def show_whitelist(update: Update, context: CallbackContext):
             users_by_channel[channel_id].append(user_id)
 
         # Print the results
-        await check_telethon_connection()
         for channel_id, user_ids in users_by_channel.items():
             try:
                 chat_entity = await context.bot.get_chat(channel_id)
@@ -2297,7 +2922,8 @@ async def show_whitelist(update: Update, context: CallbackContext):
             title=chat_entity.title
             whitelist_message += f"{title.upper()}\n"
             for user_id in user_ids:
-                user_entity = await telethon.get_entity(user_id)
+                async with telethon_pool.client('interactive') as telethon:
+                    user_entity = await telethon.get_entity(user_id)
                 user_name = " ".join(filter(None, [user_entity.first_name, user_entity.last_name]))
                 whitelist_message += f"{user_name} ({user_id})\n"
             whitelist_message += "\n"
@@ -2314,75 +2940,356 @@ async def show_whitelist(update: Update, context: CallbackContext):
 # ********* KICK PROCESSING *********
 
 
-# Function to accept a batch of users and kick them. Used with asyncio.gather() in kick_inactive_users()
-async def process_user_batch(batch, context, issuer_chat_id, issuer_chat_type, issuer_chat_name, pretend, ban, pbar):
-    
-    # Kick the inactive users and count the number of users kicked
-    banned_count = 0
-    banned_uids = []
-    for user_info in batch:
-        user_id = user_info[0]
-        last_activity_str = user_info[1]
-        last_activity_readable = datetime.strptime(last_activity_str, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=utc_timezone).strftime('%d %B, %Y - %H:%M:%S') if last_activity_str else None
-        rt = 0
-        while rt < max_retries:
-            try:
-                # Decide whether to ban or kick based on the kick count
-                kick_count = lookup_kick_count_in_kick_db(user_id, issuer_chat_id)
-                three_strikes = False if kick_count < 2 else True
-                three_strikes_mode = get_three_strikes(issuer_chat_id)
-                three_strikes_ban = three_strikes_mode[0]==1 and three_strikes
-                action = 'ALLOWED TO REMAIN'
-                if not pretend:
-                    # Increment the user's kick count in the database
-                    insert_kicked_user_in_kick_db(user_id, issuer_chat_id, last_activity_str)
-                
-                    # If supergroup, use 'unban' for kick. Otherwise just ban.               
-                    if (issuer_chat_type == ChatType.SUPERGROUP or issuer_chat_type == ChatType.CHANNEL) and not ban and not three_strikes_ban:
-                        await context.bot.unban_chat_member(issuer_chat_id, user_id)
-                        action = 'KICKED'
-                    else:
-                        await context.bot.ban_chat_member(issuer_chat_id, user_id)
-                        # insert_kicked_user_in_blacklist(user_id, issuer_chat_id)
-                        banned_uids.append(user_id)
-                        if three_strikes_ban:
-                            action = 'BANNED (THIRD STRIKE)'
-                        elif ban:
-                            action = 'BANNED (BAN PURGE)'
-                        else:
-                            action = 'BANNED (GROUP NOT SUPERGROUP OR CHANNEL)'
+# Function to kick one user. Run by the KickExecutor in run_purge(), which paces calls, retries on RetryLater
+# and adapts concurrency. Kick counts and the three-strikes flag come from the session's purge context, and each
+# action is recorded in the session's purge journal; nothing is read from or written to the DB per user.
+async def process_user_kick(user_info, session, issuer_chat_id, issuer_chat_type, issuer_chat_name, pretend, ban, pbar, banned_uids):
+    purge_context = session.context
+    user_id = user_info[0]
+    last_activity_str = user_info[1]
+    purge_context.attempts[user_id] = purge_context.attempts.get(user_id, 0) + 1
+    call_start = time.monotonic()
+    try:
+        # Decide whether to ban or kick based on the kick count
+        kick_count = purge_context.kick_count(user_id)
+        three_strikes_ban = purge_context.three_strikes_ban(user_id)
+        action = 'ALLOWED TO REMAIN'
+        if not pretend:
+            # If supergroup, use 'unban' for kick. Otherwise just ban.               
+            if (issuer_chat_type == ChatType.SUPERGROUP or issuer_chat_type == ChatType.CHANNEL) and not ban and not three_strikes_ban:
+                await routed_call(issuer_chat_id, lambda bot: bot.unban_chat_member(issuer_chat_id, user_id))
+                action = 'KICKED'
+            else:
+                await routed_call(issuer_chat_id, lambda bot: bot.ban_chat_member(issuer_chat_id, user_id))
+                # insert_kicked_user_in_blacklist(user_id, issuer_chat_id)
+                banned_uids.add(user_id)
+                if three_strikes_ban:
+                    action = 'BANNED (THIRD STRIKE)'
+                elif ban:
+                    action = 'BANNED (BAN PURGE)'
                 else:
-                    action = 'PRETEND-KICKED'
-                    
-                banned_count += 1
-                
-                # Update the progress bar
-                pbar.update(1)    
+                    action = 'BANNED (GROUP NOT SUPERGROUP OR CHANNEL)'
 
-                logging.warning(f"User ID {user_id} {action} from {issuer_chat_id} '{issuer_chat_name}' (kick # {kick_count+1}).")
-                
-                with open('kick.log', 'a') as log_file:
-                    log_file.write(f"User ID: {user_id}, Last Activity: {last_activity_readable}, Kick # {kick_count+1}{' (BANNED)' if three_strikes_ban else ''}.\n")
-                break
-            except (RetryAfter, TimedOut, NetworkError) as e:
-                wait_seconds = e.retry_after if hasattr(e, 'retry_after') else 3
-                logging.warning(f"Got a RetryAfter error. Waiting for {wait_seconds} seconds...")
-                await asyncio.sleep(wait_seconds)
-                rt += 1
-                if rt == max_retries:
-                    logging.warning(f"Max retry limit reached. Error: {e}. User {user_id} not kicked.")
-                    break
+            # Increment the user's kick count (written to the database in chunks). The user is already out, so a failed
+            # write is logged here instead of being retried as a Telegram error; the chunk stays buffered for the next flush.
+            try:
+                await purge_context.record_kick(user_id, last_activity_str, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"))
             except Exception as e:
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                await debug_to_chat(exc_type, exc_value, exc_traceback)
-                logging.warning(f"Got an error while processing: {e}. Retrying in 5 seconds...")
-                await asyncio.sleep(5)
-                rt += 1
-                if rt == max_retries:
-                    logging.warning(f"Max retry limit reached. Error: {e}. User {user_id} not kicked.")
-                    break
-    batch_update_banned(banned_uids, issuer_chat_id)
-    return banned_count
+                logging.error(f"KICK: Could not record kicks in {issuer_chat_name} ({issuer_chat_id}) - {e}. Will retry with the next flush.")
+        else:
+            action = 'PRETEND-KICKED'
+
+        # Update the progress bar
+        pbar.update(1)    
+
+        logging.warning(f"User ID {user_id} {action} from {issuer_chat_id} '{issuer_chat_name}' (kick # {kick_count+1}).")
+
+        session.journal.add({
+            'run_id': session.run_id,
+            'user_id': user_id,
+            'action': action,
+            'last_activity': last_activity_str,
+            'kick_number': kick_count + 1,
+            'attempts': purge_context.attempts[user_id],
+            'latency_ms': (time.monotonic() - call_start) * 1000,
+            'acted_at': datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"),
+        })
+        return user_id
+
+    except RetryLater:
+        raise
+    except (BadRequest, Forbidden) as e:
+        # Telegram refused: retrying won't change the answer, so the user fails straight away
+        if is_chat_level_error(e):
+            record_chat_error(issuer_chat_id, e)
+            if not session.cancelled:
+                # The bot can't act in the chat any more. Stop here instead of failing every remaining user in turn.
+                logging.warning(f"KICK: Bot can no longer act in {issuer_chat_name} ({issuer_chat_id}) - {e}. Stopping the purge.")
+                session.cancel()
+        else:
+            logging.warning(f"KICK: Could not remove {user_id} from {issuer_chat_name} - {e}. Not retrying.")
+        raise
+    except Exception as e:
+        # Unexpected errors go to the debug chats once per user, however many times the user is retried
+        if user_id not in purge_context.reported_errors:
+            purge_context.reported_errors.add(user_id)
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            await debug_to_chat(exc_type, exc_value, exc_traceback)
+        logging.warning(f"Got an error while processing {user_id}: {e}. Retrying in 5 seconds...")
+        raise RetryLater(5, flood=False)
+
+
+async def routed_call(chat_id, call):
+    # Runs call(bot) on whichever of the main and helper bots has budget to spare, for a KickExecutor handler.
+    # A flood wait pauses only that bot; a helper that can't act in the chat is skipped there and the call retried.
+    # Errors about the user (USER_ADMIN_INVALID, PARTICIPANT_ID_INVALID, user not found) are raised as they are.
+    lane = await bot_router.acquire(chat_id)
+    try:
+        return await call(lane['bot'])
+    except RetryAfter as e:
+        logging.warning(f"Got a RetryAfter error on {lane['name']}. Slowing it down for {e.retry_after} seconds...")
+        lane['limiter'].pause(e.retry_after)
+        raise RetryLater(e.retry_after)
+    except (BadRequest, Forbidden) as e:
+        if not bot_router.is_helper(lane) or not is_chat_level_error(e):
+            raise
+        logging.warning(f"Helper bot {lane['name']} can't act in {chat_id} - {e}. Failing over to another bot.")
+        bot_router.disable(lane, chat_id)
+        raise RetryLater(0, flood=False, count_attempt=False)
+    except (TimedOut, NetworkError) as e:
+        logging.warning(f"Got a {type(e).__name__} error on {lane['name']}. Retrying in 3 seconds...")
+        raise RetryLater(3, flood=False)
+    finally:
+        bot_router.release(lane)
+
+
+async def run_purge(session, issuer_chat_name, issuer_chat_type, users_to_ban, deadline=None, progress_chat_id=None):
+    # Kicks users_to_ban from the session's chat and closes its purge run. Needs no Update, so it serves both
+    # purge_inactive_users() and purges resumed after a restart. Returns the executor for its counts.
+    # With a deadline (trickle mode) the kicks are paced to finish around then instead of going as fast as the API allows.
+    # With a progress_chat_id, a status message there shows live progress until the purge ends.
+    issuer_chat_id = session.chat_id
+    pretend = session.pretend
+    ban = session.ban
+    pbar = tqdm(total=len(users_to_ban), desc="KICKBOT: Kicking Users", unit=" user")
+    banned_uids = set()
+    if session.journal is None:
+        session.journal = BufferedWriter(batch_insert_purge_actions, name="purge actions")
+
+    # Bookkeeping is applied chunk by chunk as kicks are flushed (every KICK_FLUSH_SIZE kicks or KICK_FLUSH_SECONDS),
+    # and each chunk marks its purge_items done with its kick counts, so a purge that stops partway leaves the DB
+    # consistent with what was actually kicked and a re-kicked user is not counted twice.
+    def write_kick_chunk(records, chat_id):
+        user_ids = batch_insert_kicked_users(records, chat_id, session.run_id)
+        deleted_kicks_from_user_activity([(user_id, chat_id) for user_id in user_ids])
+        batch_update_kicked([user_id for user_id in user_ids if user_id not in banned_uids], chat_id)
+        batch_update_banned([user_id for user_id in user_ids if user_id in banned_uids], chat_id)
+
+    # Kick from a shared work queue. The executor adds workers while calls succeed (up to KICK_MAX_WORKERS per bot)
+    # and halves them on a flood wait.
+    three_strikes_mode = get_three_strikes(issuer_chat_id)
+    purge_context = PurgeContext(
+        issuer_chat_id,
+        bool(three_strikes_mode and three_strikes_mode[0]==1),
+        get_kick_counts(issuer_chat_id),
+        write_kick_chunk,
+        flush_size=KICK_FLUSH_SIZE,
+    )
+    session.context = purge_context
+    # Each call draws from its bot's own budget through bot_router, so the executor itself only paces trickle purges
+    limiter = None
+    trickle_seconds = (deadline - datetime.utcnow()).total_seconds() if deadline else 0
+    if trickle_seconds > 0 and users_to_ban:
+        trickle_rate = len(users_to_ban) / trickle_seconds
+        limiter = TokenBucket(trickle_rate, capacity=1)
+        logging.warning(f"TRICKLE: {issuer_chat_name} - {len(users_to_ban)} users at {trickle_rate * 3600:.0f} per hour until {deadline} UTC.")
+    executor = KickExecutor(
+        lambda user_info: process_user_kick(user_info, session, issuer_chat_id, issuer_chat_type, issuer_chat_name, pretend, ban, pbar, banned_uids),
+        limiter,
+        KICK_MAX_WORKERS * len(bot_router),
+        max_retries=max_retries,
+    )
+    session.executor = executor
+    if session.cancelled:
+        executor.cancel()
+    session.status = 'kicking'
+    reporter = asyncio.create_task(report_purge_progress(session, issuer_chat_name, progress_chat_id))
+    flusher = asyncio.create_task(flush_kicks_periodically(purge_context))
+    watcher = None if pretend else asyncio.create_task(stop_purge_on_lost_lease(session, issuer_chat_name))
+    try:
+        await executor.run(users_to_ban)
+    finally:
+        reporter.cancel()
+        flusher.cancel()
+        if watcher:
+            watcher.cancel()
+        session.status = 'finishing'
+        try:
+            await purge_context.flush()
+        except Exception as e:
+            logging.error(f"KICK: Could not record the last {len(purge_context.pending_kicks)} kicks in {issuer_chat_name} ({issuer_chat_id}) - {e}")
+        failed_ids = [user_id for user_id, last_activity in executor.failed]
+        if not pretend:
+            mark_purge_items(session.run_id, failed_ids, 'failed')
+            if executor.cancelled and not session.handed_off:
+                processed = set(executor.results) | set(failed_ids)
+                mark_purge_items(session.run_id, [user_id for user_id, last_activity in users_to_ban if user_id not in processed], 'cancelled')
+        for user_id, last_activity in executor.failed:
+            session.journal.add({
+                'run_id': session.run_id,
+                'user_id': user_id,
+                'action': 'FAILED',
+                'last_activity': last_activity,
+                'attempts': purge_context.attempts.get(user_id, 0),
+                'acted_at': datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f"),
+            })
+        await session.journal.close()
+        # A handed-off run stays 'kicking' with its remaining items pending, for the new leader to resume
+        if not session.handed_off:
+            finish_purge_run(session.run_id, 'cancelled' if executor.cancelled else 'completed', len(users_to_ban), executor.done, len(executor.failed), executor.flood_waits)
+        tqdm.close(pbar)
+        await edit_progress_message(session, purge_progress_text(session, issuer_chat_name))
+
+    for user_id in failed_ids:
+        logging.warning(f"Max retry limit reached. User {user_id} not kicked.")
+    logging.warning(f"KICK: {issuer_chat_name} - {executor.done} of {len(users_to_ban)} users processed at {executor.overall_rate():.1f} kicks/s, "
+        f"{len(executor.failed)} failed, {executor.flood_waits} flood waits.")
+    return executor
+
+
+async def resume_purges():
+    # Picks up purges left unfinished by a restart, a crash or a leader that stood down. A run that stopped while kicking
+    # resumes from its pending purge_items; one that stopped before its plan was saved has nothing to resume and is
+    # closed as aborted. Runs this process is still running are left alone, as are runs whose owner holds the lease.
+    # Purges this instance stopped when it lost the lease (it may have got it back since) finish closing first.
+    while any(session.handed_off for session in purge_sessions.values()):
+        await asyncio.sleep(1)
+    try:
+        runs = get_unfinished_purge_runs()
+        lease = get_leader_lease(LEADER_LEASE_NAME)
+    except Exception as e:
+        logging.error(f"Could not load unfinished purges: {e}")
+        return
+    live_run_ids = {session.run_id for session in purge_sessions.values()}
+    for run in runs:
+        run_id = run['run_id']
+        chat_id = run['chat_id']
+        if not is_leader:
+            return
+        if run_id in live_run_ids:
+            continue
+        if run['owner_instance'] != INSTANCE_ID and lease and lease['holder'] == run['owner_instance']:
+            continue
+        if not claim_purge_run(run_id, run['owner_instance'], INSTANCE_ID):
+            continue
+        if run['status'] != 'kicking' or chat_id in purge_sessions:
+            finish_purge_run(run_id, 'aborted')
+            continue
+        users_to_ban = get_pending_purge_items(run_id)
+        logging.warning(f"RESUMING purge run {run_id} in {run['chat_name']} ({chat_id}) - {len(users_to_ban)} users left.")
+        session = PurgeSession(chat_id, ban=(run['mode'] == 'ban'))
+        session.run_id = run_id
+        purge_sessions[chat_id] = session
+        try:
+            while chat_id in scanning_underway:
+                await asyncio.sleep(1)
+            deadline = datetime.strptime(run['deadline'], "%Y-%m-%d %H:%M:%S.%f") if run['deadline'] else None
+            executor = await run_purge(session, run['chat_name'], run['chat_type'], users_to_ban, deadline, None if run['quiet'] else chat_id)
+            if not run['quiet']:
+                kicked_or_banned = "Banned" if session.ban else "Kicked"
+                await kickbot.send_message(chat_id=chat_id, text=f"Resumed an interrupted purge. {kicked_or_banned} {executor.done} more users for inactivity.")
+        except Exception as e:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            await debug_to_chat(exc_type, exc_value, exc_traceback)
+            logging.exception(f"An error occurred while resuming purge run {run_id}: {e}")
+        finally:
+            purge_sessions.pop(chat_id, None)
+    return
+
+
+async def stop_purge_on_lost_lease(session, issuer_chat_name):
+    # Only the leader kicks. An instance that loses the lease mid-purge stops and hands the run to whoever leads next.
+    while True:
+        await asyncio.sleep(1)
+        if not is_leader:
+            logging.warning(f"LEADER: {INSTANCE_ID} lost the leader lease. Handing off purge run {session.run_id} in {issuer_chat_name}.")
+            session.handed_off = True
+            session.cancel()
+            return
+
+
+async def flush_kicks_periodically(purge_context):
+    # Slow purges (trickle mode, long flood waits) can take hours to fill a chunk; this bounds how long a kick goes unrecorded.
+    # A failed write leaves its chunk buffered for the next round.
+    while True:
+        await asyncio.sleep(KICK_FLUSH_SECONDS)
+        try:
+            await purge_context.flush()
+        except Exception as e:
+            logging.error(f"KICK: Periodic flush of {len(purge_context.pending_kicks)} kicks in {purge_context.chat_id} failed - {e}. Retrying in {KICK_FLUSH_SECONDS} seconds.")
+
+
+async def report_purge_progress(session, issuer_chat_name, progress_chat_id=None):
+    # Logs purge throughput every KICK_REPORT_SECONDS until the executor finishes. With a progress_chat_id, it also posts
+    # one status message there and edits it at most every PURGE_PROGRESS_SECONDS, so operators can follow along.
+    executor = session.executor
+    if progress_chat_id:
+        try:
+            session.progress_message = await kickbot.send_message(chat_id=progress_chat_id, text=purge_progress_text(session, issuer_chat_name))
+        except (BadRequest, Forbidden) as e:
+            logging.warning(f"Could not post purge progress to {progress_chat_id}: {e}")
+    last_logged = last_edited = time.monotonic()
+    while executor.finished is None:
+        await asyncio.sleep(1)
+        if executor.started is None or executor.finished is not None:
+            continue
+        now = time.monotonic()
+        if now - last_logged >= KICK_REPORT_SECONDS:
+            last_logged = now
+            logging.warning(f"KICK: {issuer_chat_name} - {executor.done}/{executor.total} done, {executor.rate():.1f} kicks/s, "
+                f"{executor.concurrency} workers, {executor.flood_waits} flood waits.")
+        if session.progress_message and now - last_edited >= PURGE_PROGRESS_SECONDS:
+            last_edited = now
+            await edit_progress_message(session, purge_progress_text(session, issuer_chat_name))
+
+
+def purge_progress_text(session, issuer_chat_name):
+    executor = session.executor
+    kicking_or_banning = "BANNING" if session.ban else "KICKING"
+    percent = round(executor.done / executor.total * 100, 1) if executor.total else 100
+    if executor.finished is not None:
+        outcome = "CANCELLED" if executor.cancelled else "FINISHED"
+        text = f"{'PRETEND ' if session.pretend else ''}PURGE {outcome} in {issuer_chat_name}.\n\n"
+        text += f"✅ {executor.done}/{executor.total} done ({percent}%) in {format_timedelta(timedelta(seconds=executor.finished - executor.started))}"
+        text += f" at {executor.overall_rate():.1f}/s.\n"
+        if executor.failed:
+            text += f"⚠️ {len(executor.failed)} could not be removed.\n"
+    else:
+        eta = executor.eta()
+        text = f"{'PRETEND ' if session.pretend else ''}{kicking_or_banning} INACTIVE USERS in {issuer_chat_name}...\n\n"
+        text += f"✅ {executor.done}/{executor.total} done ({percent}%), {executor.rate():.1f}/s.\n"
+        text += f"⏱ ETA {format_timedelta(timedelta(seconds=eta)) if eta is not None else 'unknown'}.\n"
+    if executor.flood_waits:
+        text += f"🐢 {executor.flood_waits} flood waits, {format_timedelta(timedelta(seconds=executor.flood_wait_seconds))} in total"
+        paused_for = executor.paused_for() if executor.finished is None else 0
+        text += f" (paused for {paused_for:.0f}s now).\n" if paused_for else ".\n"
+    if executor.finished is None:
+        text += "\nStopping... already removed users are being recorded." if session.cancelled else "\nUse /cancelkick to stop."
+    return text
+
+
+async def edit_progress_message(session, text):
+    # Progress edits are best effort; a failed edit just waits for the next one
+    message = session.progress_message
+    if message is None or message.text == text:
+        return
+    try:
+        session.progress_message = await kickbot.edit_message_text(chat_id=message.chat_id, message_id=message.message_id, text=text)
+    except RetryAfter as e:
+        logging.warning(f"Purge progress edit throttled for {e.retry_after} seconds.")
+    except (BadRequest, Forbidden) as e:
+        logging.warning(f"Could not edit purge progress in {message.chat_id}: {e}")
+        session.progress_message = None
+    except (TimedOut, NetworkError) as e:
+        logging.warning(f"Purge progress edit failed - {e}")
+
+
+# Function to stop the purge underway in a chat. Users already removed stay removed, and their bookkeeping is flushed.
+async def cancel_kick(update: Update, context: CallbackContext):
+    if not update.message:
+        return
+    chat_id = update.message.chat_id
+    session = purge_sessions.get(chat_id)
+    if session is None:
+        await context.bot.send_message(chat_id=chat_id, text="There is no purge underway in this chat.")
+        return
+    if session.cancelled:
+        return
+    logging.warning(f"Purge in {update.effective_chat.title} ({chat_id}) cancelled by {update.effective_user.full_name} while {session.status}.")
+    session.cancel()
+    if session.progress_message is None:
+        await context.bot.send_message(chat_id=chat_id, text="Stopping the purge. Users already removed stay removed.")
+    return
 
 
 async def assemble_banned_list(chat_id, admin_ids, cutoff_date):
@@ -2392,60 +3299,49 @@ async def assemble_banned_list(chat_id, admin_ids, cutoff_date):
     while rt < max_retries:
         try:
             logging.warning(f"STARTING DB QUERIES.")
-            #with sqlite3.connect(DATABASE_PATH) as conn:
+            start_time = time.time()
+            users_to_ban = []
+            banned_name_lookup = {}
+            member_count = 0
 
             user_data = get_user_activity(chat_id)
 
-            # Convert user_data and admin_ids into sets for faster lookups
-            user_data_set = {entry['user_id'] for entry in user_data}
-            whitelist_data = get_whitelist(chat_id)
+            # Index the activity rows by user_id, with last_activity parsed once up front
+            activity_by_user = {
+                entry['user_id']: (entry['last_activity'], datetime.fromisoformat(entry['last_activity']) if entry['last_activity'] else None)
+                for entry in user_data
+            }
 
-            # Convert user_data and admin_ids into sets for faster lookups
-            whitelist_set = {entry[0] for entry in whitelist_data}
+            # Admins and whitelisted users are immune from kick
+            exempt_ids = {entry[0] for entry in get_whitelist(chat_id)} | set(admin_ids)
 
             if API_ID and API_HASH:
                 logging.warning(f"QUERYING ROOM MEMBERS.")
-                await check_telethon_connection()
-                async for user in telethon.iter_participants(chat_id):
-                    user_id = user.id
-                    user_name =  " ".join(filter(None, [user.first_name, user.last_name]))
-                    username = user.username
-                    is_member = isinstance(user.participant, ChannelParticipant) or isinstance(user.participant, ChatParticipant)
-
-                    # Check if the user exists in the user_data set or has no last_activity
-                    if user_id in user_data_set:
-                        matching_entry = next(entry for entry in user_data if entry['user_id'] == user_id)
-                        last_activity = matching_entry['last_activity']
-                    else:
-                        last_activity = None
-
-                    # Convert last_activity to datetime if it's not None
-                    last_activity_datetime = datetime.strptime(last_activity, '%Y-%m-%d %H:%M:%S.%f') if last_activity else None
-                    
-                    immune=False
-
-                    # If the user is not a member (e.g. they are an admin), they are immune from kick
-                    if not is_member:
-                        immune=True
-
-                    # If the user has a last_activity, and it is after the cutoff date, they are immune from kick
-                    if last_activity_datetime is not None and  cutoff_date < last_activity_datetime:
-                        immune = True    
+                async with telethon_pool.client('scan') as telethon:
+                    async for user in telethon.iter_participants(chat_id):
+                        member_count += 1
+                        user_id = user.id
+
+                        # If the user is not a member (e.g. they are an admin), whitelisted, or an admin, they are immune from kick
+                        if user_id in exempt_ids or not isinstance(user.participant, (ChannelParticipant, ChatParticipant)):
+                            continue
+                        if user.username and 'shinanygans' in user.username:
+                            continue
+
+                        # If the user has a last_activity, and it is after the cutoff date, they are immune from kick
+                        last_activity, last_activity_datetime = activity_by_user.get(user_id, (None, None))
+                        if last_activity_datetime is not None and cutoff_date < last_activity_datetime:
+                            continue
 
-                    if username and 'shinanygans' in username:
-                        immune = True
-
-                    # If whitelisted, immune from kick  
-                    if user_id in whitelist_set:
-                        immune=True  
-
-                    if not immune:
                         users_to_ban.append((user_id, last_activity)) 
-                        banned_name_lookup[user_id] = user_name
+                        banned_name_lookup[user_id] = " ".join(filter(None, [user.first_name, user.last_name]))
             else:
                 for user_id, last_activity in tqdm(user_data, desc="Assembling Banned List", unit=" user"):
+                    member_count += 1
                     if user_id not in admin_ids:
                         users_to_ban.append((user_id, last_activity)) 
+
+            logging.warning(f"Assembled {len(users_to_ban)} purge candidates from {member_count} members of {chat_id} in {time.time() - start_time:.2f} seconds.")
             return users_to_ban, banned_name_lookup
         
         except RetryAfter as e:
@@ -2463,15 +3359,94 @@ async def assemble_banned_list(chat_id, admin_ids, cutoff_date):
                 raise e
                 
 
+# Function to preview a purge from the last scan snapshot. No enumeration and no simulated kicks, so it answers
+# in milliseconds; "/pretendkick <time> live" still runs the full pretend purge against a live member list.
+async def preview_purge(update: Update, context: CallbackContext):
+    if not update.message:
+        return
+    chat_id = update.message.chat_id
+    chat_name = update.effective_chat.title
+    try:
+        cutoff_date, readable_string_of_duration = calculate_cutoff_date(context.args[0])
+    except (IndexError, ValueError):
+        await context.bot.send_message(chat_id=chat_id, text="Invalid command format. Use /pretendkick <time> [live] (e.g., /pretendkick 1d).")
+        return
+
+    try:
+        if chat_id not in chat_admins_cache:
+            await update_chat_admins_cache(chat_id)
+        start_time = time.time()
+        plan = plan_purge(chat_id, cutoff_date, chat_admins_cache.get(chat_id, set()))
+        logging.warning(f"Planned a {readable_string_of_duration} purge of {chat_name} ({chat_id}) in {(time.time() - start_time) * 1000:.1f} ms - {plan['candidates']} candidates.")
+
+        last_scan = lookup_last_scan(chat_id)
+        snapshot_age = format_timedelta(datetime.now(timezone.utc) - last_scan) + " old" if last_scan else "not yet taken"
+        text = (f"PRETEND: {plan['candidates']} of {plan['members']} non-admin members of {chat_name} have not posted media in the last {readable_string_of_duration} "
+            f"({plan['never_posted']} never posted).\nMember snapshot from the last scan: {snapshot_age}.\n")
+        if plan['sample']:
+            text += "\nLongest inactive:\n"
+            for user_id, last_activity, user_name in plan['sample']:
+                text += f"{user_name or user_id} - Last activity: {last_activity or 'never'}\n"
+        await context.bot.send_message(chat_id=chat_id, text=text)
+
+    except (BadRequest, Forbidden) as e:
+        record_chat_error(chat_id, e)
+        logging.warning(f"Bad Request/Forbidden in preview_purge() - {e}")
+    except Exception as e:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
+        logging.exception(f"An error occurred in preview_purge(): {e}")
+    return
+
+
+def order_purge_candidates(users_to_ban):
+    # Never-posted users go first, then the longest inactive, so a purge that is cut short has removed the worst lurkers
+    users_to_ban.sort(key=lambda user_info: (user_info[1] is not None, user_info[1] or ''))
+    return users_to_ban
+
+
+def close_purge_session(session):
+    purge_sessions.pop(session.chat_id, None)
+    # A purge that stopped before kicking (bad arguments, assembly error, cancelled) still closes its journal entry
+    if session.run_id is not None and session.executor is None:
+        try:
+            finish_purge_run(session.run_id, 'cancelled' if session.cancelled else 'aborted')
+        except Exception as e:
+            logging.error(f"Could not close purge run {session.run_id}: {e}")
+
+
+def is_purging(chat_id):
+    # True while a live (not pretend) purge is underway in the chat
+    session = purge_sessions.get(chat_id)
+    return session is not None and not session.pretend
+
+
 # Function to kick inactive users
-async def kick_inactive_users(update: Update, context: CallbackContext, pretend=False, ban=False, quiet=False):
-    global kick_started
+async def kick_inactive_users(update: Update, context: CallbackContext, pretend=False, ban=False, quiet=False, trickle=False):
+    if not update.message:
+        return
 
-    if not update.message or kick_started == True:
-        logging.warning("Kick already started. Abandoning.")
+    if not pretend and not is_leader:
+        logging.warning(f"Purge requested in {update.effective_chat.title} but {INSTANCE_ID} is not the leader. Abandoning.")
+        if not quiet:
+            await context.bot.send_message(chat_id=update.message.chat_id, text="This kickbot instance is on standby. Purges are run by the leader instance.")
         return
 
-    kick_started = True
+    # One purge per chat at a time. Purges in other chats run alongside, sharing the Bot API budget.
+    chat_id = update.message.chat_id
+    if chat_id in purge_sessions:
+        logging.warning(f"Kick already started in {chat_id} ({purge_sessions[chat_id].status}). Abandoning.")
+        return
+    session = PurgeSession(chat_id, pretend=pretend, ban=ban)
+    purge_sessions[chat_id] = session
+    try:
+        await purge_inactive_users(update, context, session, pretend, ban, quiet, trickle)
+    finally:
+        close_purge_session(session)
+    return
+
+
+async def purge_inactive_users(update: Update, context: CallbackContext, session, pretend=False, ban=False, quiet=False, trickle=False):
     try:
         issuer_user_id = update.effective_user.id
         issuer_user_name = update._effective_user.full_name
@@ -2490,7 +3465,6 @@ async def kick_inactive_users(update: Update, context: CallbackContext, pretend=
         #if issuer_user_id not in admin_ids:
         #    if not quiet:
         #        await context.bot.send_message(chat_id=issuer_chat_id, text="You are not an admin in this channel.")
-        #    kick_started = False
         #    return
 
         logging.warning(f"\n\nHEADS UP! A {pretend_str if pretend else 'LIVE '}inactivity purge has been started in {issuer_chat_name} ({issuer_chat_id})\n\n")
@@ -2498,38 +3472,52 @@ async def kick_inactive_users(update: Update, context: CallbackContext, pretend=
         cutoff_date, readable_string_of_duration = calculate_cutoff_date(context.args[0])
         #logging.warning(f"Requested duration is {readable_string_of_duration}. Cutoff date is {cutoff_date}.\n")
 
-        with open('kick.log', 'w') as log_file:
-            log_file.write(f"\n\nA {pretend_str}kick has been started in {issuer_chat_name} ({issuer_chat_id}) at {datetime.utcnow().strftime('%d %B, %Y - %H:%M:%S')} UTC by {issuer_user_name}.\n")
-            log_file.write(f"Requested duration is {readable_string_of_duration}. Cutoff date is {cutoff_date.strftime('%d %B, %Y - %H:%M:%S')}.\n\n")
-            prefix = "BANNED USERS:\n" if ban else "KICKED USERS:\n"
-            log_file.write(prefix)
+        # Trickle purges take a second duration: the window to spread the kicks over
+        deadline = None
+        if trickle:
+            trickle_window, readable_trickle_window = parse_duration(context.args[1])
+            deadline = datetime.utcnow() + trickle_window
+
+        # Every purge gets its own purge_runs row; the per-user actions are journaled against it
+        mode = 'pretend' if pretend else ('ban' if ban else ('trickle' if trickle else 'kick'))
+        session.run_id = insert_purge_run(issuer_chat_id, issuer_chat_name, issuer_user_name, mode, cutoff_date, issuer_chat_type, quiet, deadline, INSTANCE_ID)
+        session.journal = BufferedWriter(batch_insert_purge_actions, name="purge actions")
 
     except (IndexError, ValueError):
         if not quiet:
-            await context.bot.send_message(chat_id=issuer_chat_id, text="Invalid command format. Use /inactivekick <time> (e.g., /inactivekick 1d).")
+            if trickle:
+                await context.bot.send_message(chat_id=issuer_chat_id, text="Invalid command format. Use /tricklekick <time> <window> (e.g., /tricklekick 30d 6h).")
+            else:
+                await context.bot.send_message(chat_id=issuer_chat_id, text="Invalid command format. Use /inactivekick <time> (e.g., /inactivekick 1d).")
         logging.error(f"An error occurred in kick_inactive_users(), probably due to an invalid time argument.")
-        kick_started = False
         return
     
     except Exception as e:
         exc_type, exc_value, exc_traceback = sys.exc_info()
         await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
         logging.exception(f"An error occurred in kick_inactive_users() during the argument formatting process: {e}")
-        kick_started = False
         return
     
     try:
-        if len(scanning_underway) > 0 and not quiet:
+        # Only a scan of this chat has to finish first. Scans of other chats carry on, and new ones skip this chat.
+        session.status = 'waiting for scan'
+        if issuer_chat_id in scanning_underway and not quiet:
             await context.bot.send_message(chat_id=issuer_chat_id, text="Waiting for room scanning to complete...")
-        while len(scanning_underway) > 0:
+        while issuer_chat_id in scanning_underway:
             await asyncio.sleep(1)
-        asyncio.create_task(suspend_scanning()) 
         if not quiet:
             await context.bot.send_message(chat_id=issuer_chat_id, text=START_PURGE)
+        if session.cancelled:
+            await context.bot.send_message(chat_id=issuer_chat_id, text="Purge cancelled.")
+            return
+        session.status = 'assembling'
         users_to_ban, banned_name_lookup = await assemble_banned_list(issuer_chat_id, admin_ids, cutoff_date)
+        order_purge_candidates(users_to_ban)
         # Count the ban list, and announce to the group.
         count_of_users_to_ban = len(users_to_ban)
         admin_message = f" The KickBot is about to purge {count_of_users_to_ban} users from {issuer_chat_name} who have not posted media in the last {readable_string_of_duration}."
+        if trickle:
+            admin_message += f" They will be removed gradually over the next {readable_trickle_window}, longest inactive first."
         if not quiet:
             await context.bot.send_message(chat_id=issuer_chat_id, text=admin_message)
         else:
@@ -2542,59 +3530,29 @@ async def kick_inactive_users(update: Update, context: CallbackContext, pretend=
         exc_type, exc_value, exc_traceback = sys.exc_info()
         await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
         logging.error(f"An error occurred in kick_inactive_users(), while assembling the kick list. {e}")
-        kick_started = False
         return
     
-    # Define a shared variable to keep track of the total banned count
+    # Persist the plan before the first kick so a restart or crash can pick it up where it stopped
     total_banned_count = 0
-    pbar = tqdm(total=len(users_to_ban), desc="KICKBOT: Kicking Users", unit=" user")
-
-    # Split the lust of users to ban into sub-lists for asynchronous processing
     try:
-        # Calculate the number of sub-lists based on set number of lists
-        num_lists = NUM_BATCHES  # Specify the number of lists in the config.py file
-        total_users = len(users_to_ban)  # Get the total number of users
-        batch_size = max(1, total_users // num_lists)  # Calculate the batch size
-
-        # Initialize an empty list to store the user batches
-        user_batches = []
-
-        # Split the users into batches
-        for i in range(0, total_users, batch_size):
-            batch = users_to_ban[i:i + batch_size]
-            user_batches.append(batch)
-
-        # Create asyncio tasks for each batch
-        tasks = []
-        for i, user_batch in enumerate(user_batches):
-            task = process_user_batch(user_batch, context, issuer_chat_id, issuer_chat_type, issuer_chat_name, pretend, ban, pbar)
-            tasks.append(task)
-
-        # Execute tasks concurrently using asyncio.gather
-        banned_counts = await asyncio.gather(*tasks)
-
-        # Sum up banned counts from all batches
-        total_banned_count = sum(banned_counts)
-
-        # Extract user_ids from the users_to_ban list
-        user_ids = [user_info[0] for user_info in users_to_ban]
-
-        # Create a tuple of (user_id, chat_id) for each user to be deleted
-        delete_params = [(user_id, issuer_chat_id) for user_id in user_ids]
-
         if not pretend:
-            deleted_kicks_from_user_activity(delete_params)
-            batch_update_kicked(user_ids, issuer_chat_id)
+            insert_purge_items(session.run_id, users_to_ban)
+            update_purge_run_status(session.run_id, 'kicking', len(users_to_ban))
+        # Live progress goes to the chat, or privately to the issuer for quiet purges
+        progress_chat_id = issuer_user_id if quiet else issuer_chat_id
+        executor = await run_purge(session, issuer_chat_name, issuer_chat_type, users_to_ban, deadline, progress_chat_id)
+        total_banned_count = executor.done
 
     except Exception as e:
         exc_type, exc_value, exc_traceback = sys.exc_info()
         await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
         logging.exception(f"An error occurred in kick_inactive_users() during the ban process: {e}")
-        kick_started = False
 
     try:   
         kicked_or_banned = "Banned" if ban else "Kicked"
         final_message = f"{kicked_or_banned} {total_banned_count} users for inactivity."
+        if session.handed_off:
+            final_message += " The rest of the purge will carry on shortly."
         if not quiet:
             await context.bot.send_message(chat_id=issuer_chat_id, text=final_message)
 
@@ -2604,14 +3562,171 @@ async def kick_inactive_users(update: Update, context: CallbackContext, pretend=
             for user in users_to_ban:
                 text = text + f"{banned_name_lookup[user[0]]} - Last activity: {user[1]}\n"
             await context.bot.send_message(chat_id=issuer_chat_id, text=text)
-        tqdm.close(pbar)
-        kick_started = False
 
     except Exception as e:
         exc_type, exc_value, exc_traceback = sys.exc_info()
         await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
         logging.exception(f"An error occurred in kick_inactive_users() during the ban process: {e}")
-        kick_started = False
+    return
+
+
+# ********* SCHEDULED AUTO-PURGE *********
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def describe_purge_policy(policy):
+    day = 'Every day' if policy['weekday'] is None else f"Every {WEEKDAYS[policy['weekday']].capitalize()}"
+    action = 'ban' if policy['ban'] else 'kick'
+    return f"#{policy['policy_id']}: {day} at {policy['hour']:02}:00 UTC, {action} users inactive > {policy['inactive_for']}"
+
+
+def purge_policy_due(policy, now):
+    # Due once per scheduled slot: on the right day, from the scheduled hour on, if it hasn't run since that slot began
+    if policy['weekday'] is not None and now.weekday() != policy['weekday']:
+        return False
+    scheduled = now.replace(hour=policy['hour'], minute=0, second=0, microsecond=0)
+    if now < scheduled:
+        return False
+    last_run = datetime.strptime(policy['last_run'], "%Y-%m-%d %H:%M:%S.%f") if policy['last_run'] else None
+    return last_run is None or last_run < scheduled
+
+
+async def run_due_purge_policies():
+    # Scheduled on the leader every AUTO_PURGE_CHECK_MINUTES. Due purges are started AUTO_PURGE_STAGGER_SECONDS apart so
+    # chats don't all hit Telegram at once, and they all draw from the shared bot_api_limiter. They run as tasks so the
+    # scheduler (and the room scans it drives) never waits on a purge. last_run is only set once a purge actually starts,
+    # so one that is skipped is tried again at the next check; one still waiting out its stagger is not started twice.
+    now = datetime.utcnow()
+    due = [policy for policy in get_purge_policies() if policy['policy_id'] not in policy_purge_tasks and purge_policy_due(policy, now)]
+    for i, policy in enumerate(due):
+        task = asyncio.create_task(run_policy_purge(policy, i * AUTO_PURGE_STAGGER_SECONDS, now))
+        policy_purge_tasks[policy['policy_id']] = task
+        task.add_done_callback(lambda task, policy_id=policy['policy_id']: policy_purge_tasks.pop(policy_id, None))
+    if due:
+        logging.warning(f"AUTOPURGE: {len(due)} scheduled purges due, starting {AUTO_PURGE_STAGGER_SECONDS} seconds apart.")
+
+
+async def run_policy_purge(policy, delay=0, due_at=None):
+    # A quiet purge driven by a purge policy. Same steps as purge_inactive_users(), without an Update: the summary goes
+    # privately to whoever set the policy. The policy's last_run is set to due_at once the purge gets past the skip checks.
+    await asyncio.sleep(delay)
+    chat_id = policy['chat_id']
+    if not is_leader or chat_id in purge_sessions or not chat_liveness.allow(chat_id):
+        logging.warning(f"AUTOPURGE: Skipping policy #{policy['policy_id']} in {chat_id} - not leader, chat busy or unreachable. Will retry at the next check.")
+        return
+    try:
+        update_purge_policy_last_run(policy['policy_id'], due_at)
+    except Exception as e:
+        logging.error(f"AUTOPURGE: Could not record the run of policy #{policy['policy_id']} in {chat_id} - {e}. Will retry at the next check.")
+        return
+    session = PurgeSession(chat_id, ban=bool(policy['ban']))
+    purge_sessions[chat_id] = session
+    try:
+        chat = await kickbot.get_chat(chat_id)
+        admins = await kickbot.get_chat_administrators(chat_id)
+        admin_ids = [admin.user.id for admin in admins]
+        cutoff_date, readable_string_of_duration = calculate_cutoff_date(policy['inactive_for'])
+        logging.warning(f"AUTOPURGE: Policy #{policy['policy_id']} purge started in {chat.title} ({chat_id}).")
+
+        session.run_id = insert_purge_run(chat_id, chat.title, f"autopurge #{policy['policy_id']}", 'ban' if session.ban else 'kick', cutoff_date, chat.type, True, owner_instance=INSTANCE_ID)
+        session.journal = BufferedWriter(batch_insert_purge_actions, name="purge actions")
+
+        session.status = 'waiting for scan'
+        while chat_id in scanning_underway:
+            await asyncio.sleep(1)
+        session.status = 'assembling'
+        users_to_ban, banned_name_lookup = await assemble_banned_list(chat_id, admin_ids, cutoff_date)
+        order_purge_candidates(users_to_ban)
+        if session.cancelled:
+            return
+
+        insert_purge_items(session.run_id, users_to_ban)
+        update_purge_run_status(session.run_id, 'kicking', len(users_to_ban))
+        executor = await run_purge(session, chat.title, chat.type, users_to_ban)
+
+        kicked_or_banned = "Banned" if session.ban else "Kicked"
+        summary = f"AUTOPURGE: {kicked_or_banned} {executor.done} of {len(users_to_ban)} users from {chat.title} who have not posted media in the last {readable_string_of_duration}."
+        logging.warning(summary)
+        if policy['created_by_id']:
+            try:
+                await kickbot.send_message(chat_id=policy['created_by_id'], text=summary)
+            except Forbidden:
+                pass
+
+    except (BadRequest, Forbidden) as e:
+        record_chat_error(chat_id, e)
+        logging.warning(f"AUTOPURGE: Policy #{policy['policy_id']} could not run in {chat_id} - {e}")
+    except Exception as e:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        await debug_to_chat(exc_type, exc_value, exc_traceback)
+        logging.exception(f"AUTOPURGE: An error occurred running policy #{policy['policy_id']} in {chat_id}: {e}")
+    finally:
+        close_purge_session(session)
+    return
+
+
+# Function to show, add or remove a chat's recurring purges:
+#   /autopurge                          - list this chat's policies
+#   /autopurge <day|daily> <time> [hour] [ban]  - e.g. /autopurge mon 14d 3 (hour in UTC, default 3)
+#   /autopurge off [policy #]           - remove one policy, or all of them
+async def autopurge(update: Update, context: CallbackContext):
+    chat_id = update.message.chat_id
+    chat_name = update.effective_chat.title
+    issuer_user_id = update.effective_user.id
+    chat_type = update.effective_chat.type
+
+    if chat_type == ChatType.PRIVATE:
+        message = await context.bot.send_message(
+            chat_id=chat_id,
+            text="<i style='color:#808080;'> This command only works in the chat you want to purge automatically. Status updates will come here..</i>",
+            parse_mode=ParseMode.HTML
+        )
+        asyncio.create_task(delete_message_after_delay(context, message))
+        return
+
+    try:
+        # Send the acknowledgement
+        message = await context.bot.send_message(
+            chat_id=chat_id,
+            text="<i style='color:#808080;'> Response will be sent privately.</i>",
+            parse_mode=ParseMode.HTML
+        )
+        asyncio.create_task(delete_message_after_delay(context, message))
+
+        args = [arg.lower() for arg in context.args]
+        if args and args[0] == 'off':
+            policy_id = int(args[1].lstrip('#')) if len(args) > 1 else None
+            deleted = delete_purge_policies(chat_id, policy_id)
+            logging.warning(f"AUTOPURGE: {deleted} purge policies removed from {chat_name} by {update.effective_user.full_name}.")
+            text = f"Removed {deleted} auto-purge {'policy' if deleted == 1 else 'policies'} from {chat_name}."
+        elif args:
+            if args[0] == 'daily':
+                weekday = None
+            else:
+                weekday = [day for day in WEEKDAYS if args[0].startswith(day)][0]
+                weekday = WEEKDAYS.index(weekday)
+            inactive_for = context.args[1]
+            parse_duration(inactive_for)
+            hour = int(args[2]) if len(args) > 2 and args[2].isdigit() else 3
+            if not 0 <= hour <= 23:
+                raise ValueError("Invalid hour")
+            ban = 'ban' in args[2:]
+            policy_id = insert_purge_policy(chat_id, weekday, hour, inactive_for, ban, update.effective_user.full_name, issuer_user_id)
+            policy = {'policy_id': policy_id, 'weekday': weekday, 'hour': hour, 'inactive_for': inactive_for, 'ban': ban}
+            logging.warning(f"AUTOPURGE: Policy added in {chat_name} - {describe_purge_policy(policy)}")
+            text = f"Auto-purge set for {chat_name}:\n{describe_purge_policy(policy)}"
+        else:
+            policies = get_purge_policies(chat_id)
+            text = f"Auto-purge policies for {chat_name}:\n\n" + "\n".join(describe_purge_policy(policy) for policy in policies) if policies else f"No auto-purge policies set for {chat_name}."
+        await context.bot.send_message(chat_id=issuer_user_id, text=text)
+
+    except (IndexError, ValueError, TypeError):
+        await context.bot.send_message(chat_id=issuer_user_id, text="Invalid command format. Use /autopurge <day|daily> <time> [hour] [ban] (e.g., /autopurge mon 14d 3), or /autopurge off.")
+    except Exception as e:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        await debug_to_chat(exc_type, exc_value, exc_traceback, update=update)
+        logging.error(f"Error in the autopurge() function: {e}")
     return
 
 
@@ -2635,7 +3750,31 @@ async def inactive_ban_loop(update: Update, context: CallbackContext):
 # Command to simulate kick purge without really doing it. Starts a separate async event loop.
 @authorized_admin_check
 async def pretend_kick_loop(update: Update, context: CallbackContext):
-    asyncio.create_task(kick_inactive_users(update, context, pretend=True, ban=False))
+    if context.args and context.args[-1].lower() == 'live':
+        asyncio.create_task(kick_inactive_users(update, context, pretend=True, ban=False))
+    else:
+        asyncio.create_task(preview_purge(update, context))
+
+
+# Command to show or change the chat's scheduled purges. Starts a separate async event loop.
+@authorized_admin_check
+async def autopurge_loop(update: Update, context: CallbackContext):
+    asyncio.create_task(autopurge(update, context))
+    return
+
+
+# Command to stop the purge underway in the chat. Starts a separate async event loop.
+@authorized_admin_check
+async def cancel_kick_loop(update: Update, context: CallbackContext):
+    asyncio.create_task(cancel_kick(update, context))
+    return
+
+
+# Command to begin a trickle purge, spread over a time window. Starts a separate async event loop.
+@authorized_admin_check
+async def trickle_kick_loop(update: Update, context: CallbackContext):
+    asyncio.create_task(kick_inactive_users(update, context, pretend=False, ban=False, trickle=True))
+    return
 
 
 # Command to begin the kick inactive users process. Starts a separate async event loop.
@@ -2652,6 +3791,12 @@ async def clean_database_loop(update: Update, context: CallbackContext):
     return
 
 
+@authorized_admin_check
+async def scan_stats_loop(update: Update, context: CallbackContext):
+    asyncio.create_task(scan_stats(update, context))
+    return
+
+
 #Command to purch the database of data from chats that are no longer active
 @authorized_admin_check
 async def request_log_loop(update: Update, context: CallbackContext):
@@ -2748,6 +3893,9 @@ async def handle_message_loop(update: Update, context: CallbackContext):
 async def stop_and_restart():
     """Gracefully stop the Updater and replace the current process with a new one"""
     await app.stop()
+    # Let a standby take over now rather than after the lease runs out; the new process competes for it like any other
+    if is_leader:
+        release_leader_lease(LEADER_LEASE_NAME, INSTANCE_ID)
     os.execl(sys.executable, sys.executable, *sys.argv)
 
 @authorized_admin_check
@@ -2769,10 +3917,41 @@ async def restart(update, context):
 
 
 async def post_init(application: Application):
+    global telethon_pool
+    global bot_router
+    lanes = [('main', application.bot, bot_api_limiter)]
+    for i, token in enumerate(HELPER_BOT_TOKENS):
+        try:
+            helper = Bot(token)
+            await helper.initialize()
+            lanes.append((f"helper_{i} (@{helper.username})", helper, TokenBucket(HELPER_BOT_RATE_LIMIT)))
+        except Exception as e:
+            logging.warning(f"Helper bot {i} could not start - {e}. Continuing without it.")
+    bot_router = BotRouter(lanes)
+    if len(lanes) > 1:
+        logging.warning(f"Kicking with {len(lanes)} bots: {', '.join(name for name, bot, limiter in lanes)}.")
+    telethon_pool = ClientPool(
+        connect_telethon_client,
+        {'scan': TELETHON_SCAN_CLIENTS, 'interactive': TELETHON_INTERACTIVE_CLIENTS},
+        is_connected=lambda client: client.is_connected(),
+        disconnect=lambda client: client.disconnect(),
+    )
+    if API_ID and API_HASH:
+        for slot_name, e in await telethon_pool.start():
+            logging.warning(f"Telethon client {slot_name} could not connect - {e}. Retrying on first use.")
     await start_chat_member_tracking()  
     asyncio.create_task(cache_admins_on_startup())
+    asyncio.create_task(leader_heartbeat())
     # asyncio.get_event_loop().set_debug(True)
 
+async def post_shutdown(application: Application):
+    for lane in (bot_router.lanes[1:] if bot_router else []):
+        try:
+            await lane['bot'].shutdown()
+        except Exception as e:
+            logging.warning(f"Error shutting down helper bot {lane['name']} - {e}")
+
+
 async def cache_admins_on_startup():
     db_chats = list_chats_in_db()
     for db_chat in db_chats:
@@ -2785,13 +3964,14 @@ def main() -> None:
     global app
 
     # Create the Application and pass it your bot's token.
-    application = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+    application = Application.builder().token(BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
 
     # Commands to leave live for testing
     application.add_handler(CommandHandler("lurkinfo", lookup_loop))  
     application.add_handler(CallbackQueryHandler(button_click, pattern='^setbackup_.*'))
     application.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, handle_message_loop))
     application.add_handler(ChatMemberHandler(handle_new_member_loop, ChatMemberHandler.CHAT_MEMBER))
+    application.add_handler(ChatMemberHandler(handle_my_chat_member, ChatMemberHandler.MY_CHAT_MEMBER))
     application.add_error_handler(error)
 
 
@@ -2799,12 +3979,16 @@ def main() -> None:
     application.add_handler(CommandHandler("inactivekick", inactive_kick_loop))
     application.add_handler(CommandHandler("pretendkick", pretend_kick_loop))
     application.add_handler(CommandHandler("quietkick", quiet_kick_loop))
+    application.add_handler(CommandHandler("tricklekick", trickle_kick_loop))
+    application.add_handler(CommandHandler("cancelkick", cancel_kick_loop))
+    application.add_handler(CommandHandler("autopurge", autopurge_loop))
     application.add_handler(CommandHandler("inactiveban", inactive_ban_loop))
     application.add_handler(CommandHandler("wl_add", whitelist_user_loop))
     application.add_handler(CommandHandler("wl", show_whitelist_loop))
     application.add_handler(CommandHandler("wl_del", dewhitelist_user_loop))
     application.add_handler(CommandHandler("3strikes", three_strikes_mode_loop)) 
     application.add_handler(CommandHandler("log", request_log_loop))     
+    application.add_handler(CommandHandler("scanstats", scan_stats_loop))
     application.add_handler(CommandHandler("gcstats", chat_status_loop)) 
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
@@ -2824,10 +4008,6 @@ def main() -> None:
     try:
         kickbot = application.bot
         app = application
-        if API_ID and API_HASH:
-            global telethon
-            telethon = TelegramClient('memberlist_bot', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
-
         application.run_polling(allowed_updates=Update.ALL_TYPES, close_loop=False)
   
         
@@ -2837,8 +4017,11 @@ def main() -> None:
     finally:
         try:
             schedule.clear()
-            if telethon.is_connected():
-                telethon.disconnect()
+            if is_leader:
+                release_leader_lease(LEADER_LEASE_NAME, INSTANCE_ID)
+            for client in (telethon_pool.clients() if telethon_pool else []):
+                if client.is_connected():
+                    client.disconnect()
         except Exception as e:
             print(e)
 
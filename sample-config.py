@@ -32,10 +32,91 @@ AUTHORIZED_ADMINS = []
 DEBUG_CHATS = []
 
 
-# In order to kick lurkers at the fastest speed, Kickbot breaks up the kick list into batches and kicks people off of all the smaller lists
-# in parallel. The higher the number of batches, the more speed (up to a point). Default is 10.
+# In order to kick lurkers at the fastest speed, Kickbot kicks people in parallel from a shared work queue. It starts with a few
+# workers, adds more while Telegram keeps up, and halves them when Telegram asks it to slow down. NUM_BATCHES is the most
+# workers it will use; KICK_MAX_WORKERS overrides it if set. Default is 10.
 NUM_BATCHES = 10
 
+# How often, in seconds, purge throughput (kicks per second, workers, flood waits) is written to the log. Default is 10.
+KICK_REPORT_SECONDS = 10
+
+# Kick records are saved to the database in chunks of this many users while a purge runs. Default is 500.
+KICK_FLUSH_SIZE = 500
+
+# ...and at least this often, in seconds, so a slow purge never holds many unsaved kicks. Default is 5.
+KICK_FLUSH_SECONDS = 5
+
+# While a purge runs, Kickbot keeps one status message in the chat up to date (done/total, rate, ETA, flood waits).
+# This is the least time, in seconds, between edits of that message. Default is 15.
+PURGE_PROGRESS_SECONDS = 15
+
+# Scheduled purges set with /autopurge are checked for every AUTO_PURGE_CHECK_MINUTES (default 10). When several chats are
+# due at once, their purges start AUTO_PURGE_STAGGER_SECONDS apart (default 300) and share the same Telegram rate budget.
+AUTO_PURGE_CHECK_MINUTES = 10
+AUTO_PURGE_STAGGER_SECONDS = 300
+
+
+# During room scans, participants are written to the database in chunks of this size while the member list is still
+# being fetched. Smaller chunks mean less memory and shorter database locks on very large chats. Default is 1000.
+SCAN_CHUNK_SIZE = 1000
+
+
+# Requests per second that background work (room scans, leaver verification) may make to the Telegram Bot API.
+# Telegram starts answering with flood waits somewhere around 30/sec. Default is 25.
+BOT_API_RATE_LIMIT = 25
+
+# Optional extra bot tokens to share the work of big purges and universal bans. Each helper bot must be an admin with ban
+# rights in the chats it should work in; where it isn't, Kickbot notices and leaves that chat to the other bots.
+# Each helper gets its own budget of HELPER_BOT_RATE_LIMIT requests per second (default is BOT_API_RATE_LIMIT).
+HELPER_BOT_TOKENS = []
+HELPER_BOT_RATE_LIMIT = 25
+
+
+# When a room scan finds users missing from the member list, Kickbot double-checks each one with the Bot API.
+# This is how many of those lookups may be in flight at once. Default is 8.
+VERIFY_CONCURRENCY = 8
+
+
+# Number of recent per-chat scan results kept in memory for the /scanstats command. Default is 500.
+SCAN_METRICS_BUFFER = 500
+
+
+# If a room scan of a big chat is interrupted (e.g. the Telethon connection drops), the next scan continues from where it
+# stopped, as long as the interrupted scan started less than this many minutes ago. Default is 30.
+SCAN_CHECKPOINT_TTL_MINUTES = 30
+
+
+# Kickbot notices when it is removed from a chat, and stops calling chats that keep returning access errors.
+# A full check of every chat in the database runs in the background every LIVENESS_SWEEP_HOURS (default 6), with at most
+# LIVENESS_SWEEP_CONCURRENCY lookups at a time (default 5). Chats found to be gone are deleted from the database.
+LIVENESS_SWEEP_HOURS = 6
+LIVENESS_SWEEP_CONCURRENCY = 5
+
+
+# How often, in minutes, the banned list of each supergroup is compared with the database. Admin bans are recorded as
+# they happen, so this is only a backstop and can be much slower than the 3-minute room scan. Default is 60.
+BANNED_SYNC_MINUTES = 60
+
+
+# More than one kickbot process can share the same database for redundancy. They elect a leader through a lease row in the
+# database; only the leader runs room scans, purges and scheduled jobs, while every instance handles realtime updates.
+# If the leader stops renewing its lease for LEADER_LEASE_SECONDS (default 60), another instance takes over.
+LEADER_LEASE_SECONDS = 60
+
+
+# Supergroups with at least PARTITIONED_SCAN_THRESHOLD members (default 10000) are scanned by splitting the member list
+# into search-query partitions and fetching PARTITION_WORKERS of them at once (default 4). A partition with more matches than
+# one search can return is split by one more letter or digit. Members no search reaches (e.g. names in other scripts) are
+# reported by /scanstats and are only double-checked once rather than on every scan.
+PARTITIONED_SCAN_THRESHOLD = 10000
+PARTITION_WORKERS = 4
+
+
+# Number of Telethon connections kept open for room scans and purges (TELETHON_SCAN_CLIENTS, default 2) and for commands
+# and realtime handling (TELETHON_INTERACTIVE_CLIENTS, default 1). Keeping them apart stops a long scan from delaying commands.
+TELETHON_SCAN_CLIENTS = 2
+TELETHON_INTERACTIVE_CLIENTS = 1
+
 
 # Path to file for your SQLite database. Default is 'user_activity.db'
 DATABASE_PATH = "user_activity.db"
@@ -54,6 +135,9 @@ HELP_MESSAGE =  (f"💥 Welcome to KickBot, your partner in lurker-slaughter 
                 "/help - Show this help message.\n\n"
                 "/inactivekick <time> - Kick inactive users who haven't posted media in the specified time.\n\n"
                 "/pretendkick <time> - Simulate kicking inactive users without actually kicking them.\n\n"
+                "/tricklekick <time> <window> - Kick inactive users gradually over <window>, longest inactive first.\n\n"
+                "/cancelkick - Stop the purge underway in this chat.\n\n"
+                "/autopurge <day|daily> <time> [hour] [ban] - Purge this chat on a schedule (e.g. /autopurge mon 14d 3). /autopurge alone lists the schedule, /autopurge off removes it.\n\n"
                 "/cleandb - Cleans inactive chats from the DB (works only in private chat with bot).\n\n"
                 "For example, the command /inactivekick 1d would kick all who have not posted in the last day, or who have never posted.\n\n"
                 "<time> units use (s)econds, (m)inutes, (h)ours, (d)ays, (M)onths, or (y)ears."
@@ -0,0 +1,49 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# db_utils reads DATABASE_PATH from config.py at import. Tests point it at a fresh file per test instead.
+# kickbot also needs the bot settings; nothing here connects to Telegram.
+if 'config' not in sys.modules:
+    config = types.ModuleType('config')
+    config.DATABASE_PATH = ':memory:'
+    config.BOT_TOKEN = '1:test'
+    config.API_ID = 1
+    config.API_HASH = 'test'
+    config.DEBUG_CHATS = []
+    config.START_PURGE = ''
+    config.HELP_MESSAGE = ''
+    config.AUTHORIZED_ADMINS = []
+    config.NUM_BATCHES = 1
+    sys.modules['config'] = config
+
+
+class Clock:
+    """Stands in for time.monotonic() so cooldowns and rates can be tested without sleeping."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import kick_utils
+    fake = Clock()
+    monkeypatch.setattr(kick_utils.time, 'monotonic', fake)
+    return fake
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    import db_utils
+    path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(db_utils, 'DATABASE_PATH', path)
+    db_utils.initialize_db()
+    return path
@@ -0,0 +1,267 @@
+import sqlite3
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import db_utils
+
+
+# ********* PURGE BOOKKEEPING *********
+
+def test_kick_chunk_written_twice_counts_once(database):
+    run_id = db_utils.insert_purge_run(-1, 'chat', 'admin', 'kick', datetime(2026, 1, 1))
+    db_utils.insert_purge_items(run_id, [(1, None), (2, None)])
+    records = [(1, None, '2026-01-02 00:00:00.000000'), (2, None, '2026-01-02 00:00:00.000000')]
+    assert db_utils.batch_insert_kicked_users(records, -1, run_id) == [1, 2]
+    # The same chunk again, as after a restart that re-kicked users whose chunk had already landed
+    assert db_utils.batch_insert_kicked_users(records, -1, run_id) == []
+    assert db_utils.get_kick_counts(-1) == {1: 1, 2: 1}
+    assert db_utils.get_pending_purge_items(run_id) == []
+    # A later purge counts a second kick
+    next_run_id = db_utils.insert_purge_run(-1, 'chat', 'admin', 'kick', datetime(2026, 2, 1))
+    db_utils.insert_purge_items(next_run_id, [(1, None)])
+    assert db_utils.batch_insert_kicked_users(records[:1], -1, next_run_id) == [1]
+    assert db_utils.get_kick_counts(-1) == {1: 2, 2: 1}
+
+
+def test_unfinished_run_is_claimed_once(database):
+    run_id = db_utils.insert_purge_run(-1, 'chat', 'admin', 'kick', datetime(2026, 1, 1), owner_instance='old')
+    assert db_utils.get_unfinished_purge_runs()[0]['owner_instance'] == 'old'
+    assert db_utils.claim_purge_run(run_id, 'old', 'new')
+    # A second instance that read the run before the claim loses
+    assert not db_utils.claim_purge_run(run_id, 'old', 'other')
+    db_utils.finish_purge_run(run_id, 'completed')
+    assert not db_utils.claim_purge_run(run_id, 'new', 'other')
+
+
+# ********* LEADER LEASE *********
+
+def test_leader_lease_held_until_released_or_expired(database, now):
+    assert db_utils.acquire_leader_lease('scanner', 'a', 60)
+    assert not db_utils.acquire_leader_lease('scanner', 'b', 60)
+    # The holder renews; anyone else releasing it does nothing
+    now.current += timedelta(seconds=50)
+    assert db_utils.acquire_leader_lease('scanner', 'a', 60)
+    db_utils.release_leader_lease('scanner', 'b')
+    now.current += timedelta(seconds=50)
+    assert not db_utils.acquire_leader_lease('scanner', 'b', 60)
+    assert db_utils.get_leader_lease('scanner')['holder'] == 'a'
+
+    # Released, it goes to the next instance that asks
+    db_utils.release_leader_lease('scanner', 'a')
+    assert db_utils.get_leader_lease('scanner') is None
+    assert db_utils.acquire_leader_lease('scanner', 'b', 60)
+
+    # A holder that stops renewing loses it once it expires
+    now.current += timedelta(seconds=59)
+    assert not db_utils.acquire_leader_lease('scanner', 'a', 60)
+    now.current += timedelta(seconds=2)
+    assert db_utils.acquire_leader_lease('scanner', 'a', 60)
+    assert db_utils.get_leader_lease('scanner')['holder'] == 'a'
+
+
+# ********* CHAT ACTIVITY AGGREGATES *********
+
+def scan_rows(chat_id, statuses):
+    # batch_insert_or_update_chat_member() parameters, as a room scan writes them, for {user_id: status}
+    return [
+        (user_id, chat_id, f"user {user_id}", None, False, False, False, False, False, False, None, status, user_id, chat_id, None, None)
+        + (user_id, chat_id) * 9
+        for user_id, status in statuses.items()
+    ]
+
+
+def aggregates(chat_id):
+    with sqlite3.connect(db_utils.DATABASE_PATH) as conn:
+        stats = conn.execute("SELECT members, never_posted FROM chat_activity_stats WHERE chat_id = ?", (chat_id,)).fetchone()
+        hours = dict(conn.execute("SELECT hour, members FROM chat_activity_hours WHERE chat_id = ?", (chat_id,)).fetchall())
+    return stats, hours
+
+
+def assert_matches_rebuild(chat_id):
+    incremental = aggregates(chat_id)
+    db_utils.rebuild_chat_activity_stats(chat_id)
+    assert incremental == aggregates(chat_id)
+
+
+@pytest.fixture
+def now(monkeypatch):
+    # Pins db_utils' clock, so the hour-to-day rollover can be stepped through
+    class FrozenDatetime(datetime):
+        current = datetime(2026, 3, 1, 12, 30)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current.replace(tzinfo=tz) if tz else cls.current
+
+        @classmethod
+        def utcnow(cls):
+            return cls.current
+
+    monkeypatch.setattr(db_utils, 'datetime', FrozenDatetime)
+    return FrozenDatetime
+
+
+def post(user_id, chat_id, moment):
+    db_utils.update_user_activity(user_id, chat_id, moment.replace(tzinfo=timezone.utc))
+
+
+def test_scans_and_purges_keep_aggregates_current(database, now):
+    db_utils.batch_insert_or_update_chat_member(scan_rows(-1, {1: 'Member', 2: 'Member', 3: 'Member', 4: 'Admin'}))
+    post(1, -1, now.current - timedelta(hours=3))
+    post(4, -1, now.current - timedelta(hours=3))
+    db_utils.get_chat_activity_stats(-1)  # first read builds the aggregates
+
+    # A later scan: 5 and 6 appear, 3 is promoted, 2 has left; then 1 posts again
+    db_utils.batch_insert_or_update_chat_member(scan_rows(-1, {1: 'Member', 3: 'Admin', 5: 'Member', 6: 'Member'}))
+    db_utils.batch_update_left([2], -1)
+    post(5, -1, now.current - timedelta(days=2))
+    post(1, -1, now.current - timedelta(minutes=5))
+    assert db_utils.get_chat_activity_stats(-1)['members'] == 3
+    assert_matches_rebuild(-1)
+
+    # A purge chunk, written in the order run_purge writes it
+    db_utils.deleted_kicks_from_user_activity([(5, -1), (6, -1)])
+    db_utils.batch_update_kicked([5], -1)
+    db_utils.batch_update_banned([6], -1)
+    assert db_utils.get_chat_activity_stats(-1) == {'members': 1, 'posters': 1, 'never_posted': 0, 'inactive': []}
+    assert_matches_rebuild(-1)
+
+
+def test_rollover_folds_old_hours_into_days(database, now):
+    start = now.current
+    last_posts = {
+        1: start - timedelta(hours=2),
+        2: start - timedelta(hours=30),
+        3: start - timedelta(days=10),
+        4: start - timedelta(days=29, hours=20),
+        5: start - timedelta(days=45, hours=7),
+        6: None,
+    }
+    db_utils.batch_insert_or_update_chat_member(scan_rows(-1, {user_id: 'Member' for user_id in last_posts}))
+    for user_id, moment in last_posts.items():
+        if moment:
+            post(user_id, -1, moment)
+
+    def expected(cutoffs):
+        return [sum(1 for moment in last_posts.values() if moment is None or moment <= cutoff) for cutoff in cutoffs]
+
+    windows = [timedelta(hours=1), timedelta(days=1), timedelta(days=7), timedelta(days=20), timedelta(days=40), timedelta(days=60)]
+    cutoffs = [start - window for window in windows]
+    assert db_utils.get_chat_activity_stats(-1, cutoffs)['inactive'] == expected(cutoffs)
+
+    # Twelve days on, user 4's hour has aged past 30 days and is read as a whole day
+    now.current = start + timedelta(days=12)
+    cutoffs = [now.current - window for window in windows]
+    stats = db_utils.get_chat_activity_stats(-1, cutoffs)
+    assert stats['inactive'] == expected(cutoffs)
+    with sqlite3.connect(database) as conn:
+        rolled_until = conn.execute("SELECT rolled_until FROM chat_activity_stats WHERE chat_id = -1").fetchone()[0]
+    _, hours = aggregates(-1)
+    assert rolled_until > db_utils.activity_hour(str(last_posts[4]) + '.000000')
+    assert all(hour % 24 == 0 for hour in hours if hour < rolled_until)
+
+    # Deltas after the rollover land in the same buckets a rebuild would use
+    post(6, -1, now.current - timedelta(days=35))
+    last_posts[6] = now.current - timedelta(days=35)
+    db_utils.batch_update_left([2], -1)
+    del last_posts[2]
+    assert db_utils.get_chat_activity_stats(-1, cutoffs)['inactive'] == expected(cutoffs)
+    assert_matches_rebuild(-1)
+
+
+def test_chat_status_snapshot_counts(database, now):
+    # What /gcstats reports without --live: counts from the aggregates and the age of the last scan
+    db_utils.insert_authorized_chat(-1, 'chat')
+    assert db_utils.lookup_last_scan(-1) is None
+    db_utils.batch_insert_or_update_chat_member(scan_rows(-1, {1: 'Member', 2: 'Member', 3: 'Member', 4: 'Administrator', 5: 'Member'}))
+    db_utils.insert_last_scan(-1, now.current - timedelta(minutes=5))
+    post(2, -1, now.current - timedelta(days=3))
+    post(3, -1, now.current - timedelta(minutes=30))
+    post(4, -1, now.current - timedelta(minutes=30))
+
+    windows = [timedelta(days=2), timedelta(hours=1), timedelta(days=1), timedelta(days=7), timedelta(days=30)]
+    stats = db_utils.get_chat_activity_stats(-1, [now.current - window for window in windows])
+    assert (stats['members'], stats['posters'], stats['never_posted']) == (4, 2, 2)
+    assert stats['inactive'] == [3, 3, 3, 2, 2]
+    assert db_utils.lookup_last_scan(-1) == (now.current - timedelta(minutes=5)).replace(tzinfo=timezone.utc)
+
+
+# ********* PURGE PLANNING *********
+
+def test_plan_purge_counts_and_samples_candidates(database, now):
+    db_utils.batch_insert_or_update_chat_member(scan_rows(-1, {1: 'Member', 2: 'Member', 3: 'Member', 4: 'Member', 5: 'Member', 6: 'Left', 7: 'Member'}))
+    post(2, -1, now.current - timedelta(days=30))
+    post(7, -1, now.current - timedelta(days=10))
+    post(3, -1, now.current - timedelta(hours=1))
+    post(6, -1, now.current - timedelta(days=30))
+    with sqlite3.connect(database) as conn:
+        conn.execute("INSERT INTO whitelist (user_id, channel_id) VALUES (5, -1)")
+
+    # 3 posted recently, 4 is exempt (an admin), 5 is whitelisted and 6 has left
+    plan = db_utils.plan_purge(-1, now.current - timedelta(days=7), exempt_ids={4})
+    assert plan['members'] == 6
+    assert plan['candidates'] == 3
+    assert plan['never_posted'] == 1
+    # Never-posted first, then the longest inactive
+    assert [row[0] for row in plan['sample']] == [1, 2, 7]
+    assert [row[0] for row in db_utils.plan_purge(-1, now.current - timedelta(days=7), exempt_ids={4}, sample_size=2)['sample']] == [1, 2]
+
+    assert db_utils.plan_purge(-1, now.current - timedelta(days=60))['candidates'] == 2
+
+
+# ********* SCAN CHECKPOINTS *********
+
+def test_partitioned_checkpoint_keeps_expected_count(database):
+    checkpoint = {
+        'offset': 0, 'participant_count': 3, 'user_ids': array('q', [1, 2, 3]),
+        'started_at': datetime(2026, 1, 1, 12, 0), 'done_partitions': ['a*', 'b'], 'expected_count': 5,
+    }
+    db_utils.save_scan_checkpoint(-1, checkpoint)
+    loaded = db_utils.load_scan_checkpoint(-1)
+    assert loaded['expected_count'] - loaded['participant_count'] == 2
+    assert list(loaded['user_ids']) == [1, 2, 3]
+    assert loaded['done_partitions'] == ['a*', 'b']
+
+    # Offset scans never see an expected count
+    del checkpoint['expected_count']
+    checkpoint['done_partitions'] = None
+    db_utils.save_scan_checkpoint(-2, checkpoint)
+    assert db_utils.load_scan_checkpoint(-2)['expected_count'] is None
+
+
+def test_offset_checkpoint_resumes_from_latest_save(database):
+    started_at = datetime(2026, 1, 1, 12, 0)
+    checkpoint = {'offset': 1000, 'participant_count': 1000, 'user_ids': array('q', range(1000)), 'started_at': started_at, 'done_partitions': None}
+    db_utils.save_scan_checkpoint(-1, checkpoint)
+    checkpoint['offset'] = checkpoint['participant_count'] = 2000
+    checkpoint['user_ids'].extend(range(1000, 2000))
+    db_utils.save_scan_checkpoint(-1, checkpoint)
+
+    # A restarted process picks the scan up where the last save left it
+    loaded = db_utils.load_scan_checkpoint(-1)
+    assert loaded['offset'] == 2000
+    assert loaded['user_ids'] == array('q', range(2000))
+    assert loaded['started_at'] == started_at
+    assert loaded['done_partitions'] is None
+    assert db_utils.load_scan_checkpoint(-2) is None
+
+    db_utils.delete_scan_checkpoint(-1)
+    assert db_utils.load_scan_checkpoint(-1) is None
+
+
+def test_checkpoint_saved_before_migration_still_loads(database):
+    # A checkpoint table from before partitioned scans, with a row left by an interrupted offset scan
+    with sqlite3.connect(database) as conn:
+        conn.execute("DROP TABLE scan_checkpoints")
+        conn.execute('''
+            CREATE TABLE scan_checkpoints (chat_id INTEGER PRIMARY KEY, participant_offset INTEGER, participant_count INTEGER,
+                user_ids BLOB, started_at TIMESTAMP, updated_at TIMESTAMP)
+        ''')
+        conn.execute("INSERT INTO scan_checkpoints VALUES (-1, 400, 400, ?, '2026-01-01 12:00:00.000000', '2026-01-01 12:05:00.000000')",
+            (array('q', [7, 8]).tobytes(),))
+    db_utils.initialize_db()
+    loaded = db_utils.load_scan_checkpoint(-1)
+    assert loaded['offset'] == 400 and list(loaded['user_ids']) == [7, 8]
+    assert loaded['done_partitions'] is None and loaded['expected_count'] is None
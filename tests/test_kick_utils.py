@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import sqlite3
+import time
+
+import pytest
+
+from kick_utils import BufferedWriter, ChatCircuitBreaker, GrowingIdSet, IdSet, KickExecutor, PurgeContext, RetryLater, TokenBucket
+
+
+# ********* RATE LIMITING *********
+
+def test_bucket_allows_burst_then_refills(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    asyncio.run(take(3))
+    assert bucket.wait_time() == 0.5
+    clock.now += 0.25
+    assert bucket.wait_time() == 0.25
+    clock.now += 10  # refills to capacity, not beyond
+    assert bucket.wait_time() == 0.0
+    asyncio.run(take(3))
+    assert bucket.wait_time() == 0.5
+
+
+def test_pause_holds_back_every_caller(clock):
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.pause(30)
+    assert bucket.wait_time() == pytest.approx(30.1)
+    bucket.pause(5)  # a shorter flood wait doesn't cut the longer one short
+    clock.now += 29
+    assert bucket.wait_time() == pytest.approx(1.1)
+    clock.now += 1
+    assert bucket.wait_time() == 0.0
+
+
+# ********* CHAT LIVENESS *********
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = ChatCircuitBreaker(failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.record_failure(-1)
+    assert breaker.allow(-1)
+    breaker.record_failure(-1)
+    assert not breaker.allow(-1)
+    assert not breaker.probe_due(-1)
+
+
+def test_checking_a_chat_does_not_use_up_the_probe(clock):
+    breaker = ChatCircuitBreaker(cooldown=60)
+    breaker.record_failure(-1, fatal=True)
+    clock.now += 61
+    # Any number of looks leave the probe in place
+    for _ in range(3):
+        assert not breaker.allow(-1)
+        assert breaker.probe_due(-1)
+    assert breaker.start_probe(-1)
+    # Only one caller gets it
+    assert not breaker.start_probe(-1)
+    assert not breaker.probe_due(-1)
+
+
+def test_probe_failure_doubles_cooldown_and_success_closes(clock):
+    breaker = ChatCircuitBreaker(cooldown=60)
+    breaker.record_failure(-1, fatal=True)
+    clock.now += 61
+    assert breaker.start_probe(-1)
+    breaker.record_failure(-1)
+    clock.now += 61
+    assert not breaker.probe_due(-1)
+    clock.now += 60
+    assert breaker.start_probe(-1)
+    breaker.record_success(-1)
+    assert breaker.allow(-1)
+    assert breaker.open_chats() == []
+
+
+# ********* COMPACT ID SETS *********
+
+def test_id_set_operations():
+    a = IdSet([5, 1, 3, 3])
+    b = IdSet([3, 4])
+    assert list(a) == [1, 3, 5]
+    assert list(a | b) == [1, 3, 4, 5]
+    assert list(a - b) == [1, 5]
+    assert list(a & b) == [3]
+    assert 5 in a and 2 not in a
+    assert IdSet.frombytes(a.tobytes()) == a
+
+
+def test_id_set_operations_match_python_sets():
+    first = set(range(0, 3000, 3)) | {-5, 10**12}
+    second = set(range(0, 3000, 5)) | {-7, 10**12}
+    a, b = IdSet(first), IdSet(second)
+    assert list(a - b) == sorted(first - second)
+    assert list(b - a) == sorted(second - first)
+    assert list(a & b) == sorted(first & second)
+    assert list(a & IdSet()) == [] and list(IdSet() - a) == []
+
+
+def test_growing_id_set_dedups_across_merges():
+    seen = GrowingIdSet([1, 2])
+    added = [seen.add(user_id) for user_id in [2, 3] + list(range(100, 3000)) + [3, 150]]
+    assert added[:2] == [False, True]
+    assert added[-2:] == [False, False]
+    assert len(seen) == 2 + 1 + 2900
+    frozen = seen.freeze()
+    assert isinstance(frozen, IdSet) and len(frozen) == len(seen)
+    assert 2999 in seen and 3000 not in seen
+
+
+# ********* KICK EXECUTOR *********
+
+def run_executor(handler, items, **kwargs):
+    executor = KickExecutor(handler, None, **kwargs)
+    asyncio.run(executor.run(items))
+    return executor
+
+
+def test_executor_retries_up_to_max_retries():
+    calls = {}
+
+    async def handler(item):
+        calls[item] = calls.get(item, 0) + 1
+        if item == 'bad':
+            raise RetryLater(0, flood=False)
+        return item
+
+    executor = run_executor(handler, ['ok', 'bad'], max_workers=1, max_retries=3)
+    assert executor.results == ['ok']
+    assert executor.failed == ['bad']
+    assert calls['bad'] == 3
+    assert executor.flood_waits == 0
+
+
+def test_failover_does_not_use_up_attempts():
+    # Two broken helpers fail over before the main bot succeeds: still within max_retries=2
+    outcomes = [RetryLater(0, flood=False, count_attempt=False), RetryLater(0, flood=False, count_attempt=False), None]
+
+    async def handler(item):
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+        return item
+
+    executor = run_executor(handler, ['user'], max_workers=1, max_retries=2)
+    assert executor.results == ['user']
+    assert executor.failed == []
+
+
+def test_other_exceptions_fail_without_retry():
+    calls = []
+
+    async def handler(item):
+        calls.append(item)
+        raise ValueError("permanent")
+
+    executor = run_executor(handler, ['user'], max_workers=1, max_retries=3)
+    assert executor.failed == ['user']
+    assert calls == ['user']
+
+
+def test_flood_wait_halves_concurrency_and_counts():
+    flooded = []
+
+    async def handler(item):
+        if item == 0 and not flooded:
+            flooded.append(item)
+            raise RetryLater(0)
+        return item
+
+    executor = run_executor(handler, range(10), max_workers=8, initial_workers=8)
+    assert sorted(executor.results) == list(range(10))
+    assert executor.flood_waits == 1
+    assert executor.concurrency == 4
+
+
+def test_concurrency_grows_after_successes():
+    async def handler(item):
+        return item
+
+    executor = run_executor(handler, range(12), max_workers=4, initial_workers=1, increase_every=5)
+    assert executor.done == 12
+    assert executor.concurrency == 3
+
+
+# ********* BUFFERED WRITES *********
+
+def test_close_waits_for_writes_in_flight():
+    written = []
+
+    def slow_write(records):
+        time.sleep(0.05)
+        written.extend(records)
+
+    async def main():
+        writer = BufferedWriter(slow_write, flush_size=2, flush_interval=60)
+        for i in range(5):
+            writer.add(i)
+        await asyncio.sleep(0)  # let the size-triggered flush hand its batch to a thread
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    assert written == [0, 1, 2, 3, 4]
+    assert not writer.pending
+    assert writer.task is None
+
+
+def test_periodic_flush_and_failed_writes_are_logged(caplog):
+    written = []
+
+    def write(records):
+        if 'bad' in records:
+            raise ValueError('disk full')
+        written.extend(records)
+
+    async def main():
+        writer = BufferedWriter(write, flush_size=100, flush_interval=0.01, name='test rows')
+        writer.add('good')
+        await asyncio.sleep(0.05)
+        assert written == ['good']
+        writer.add('bad')
+        return await writer.close()
+
+    with caplog.at_level(logging.ERROR):
+        errors = asyncio.run(main())
+    assert len(errors) == 1
+    assert 'Failed to write buffered test rows: disk full' in caplog.text
+
+
+def test_failed_kick_flush_keeps_records():
+    written = []
+    failing = [True]
+
+    def write_kicks(records, chat_id):
+        if failing[0]:
+            raise sqlite3.OperationalError('database is locked')
+        written.extend(records)
+
+    async def main():
+        context = PurgeContext(-1, False, {}, write_kicks, flush_size=2)
+        await context.record_kick(1, None, 't1')
+        with pytest.raises(sqlite3.OperationalError):
+            await context.record_kick(2, None, 't2')
+        failing[0] = False
+        await context.record_kick(3, None, 't3')
+        return context
+
+    context = asyncio.run(main())
+    assert [user_id for user_id, _, _ in written] == [1, 2, 3]
+    assert context.pending_kicks == [] and context.kick_count(2) == 1
@@ -0,0 +1,56 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+import db_utils
+
+
+@pytest.fixture(scope='module')
+def kickbot(tmp_path_factory):
+    # kickbot opens app.log in the working directory when it is imported
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('kickbot'))
+    try:
+        import kickbot
+    finally:
+        os.chdir(cwd)
+    return kickbot
+
+
+# ********* SCHEDULED AUTO-PURGE *********
+
+def policy(weekday=None, hour=3, last_run=None):
+    return {'policy_id': 1, 'chat_id': -1, 'weekday': weekday, 'hour': hour, 'last_run': last_run}
+
+
+def test_purge_policy_due_once_per_slot(kickbot):
+    monday = datetime(2026, 3, 2, 5, 0)
+    assert kickbot.purge_policy_due(policy(), monday)
+    assert not kickbot.purge_policy_due(policy(hour=6), monday)
+    assert kickbot.purge_policy_due(policy(weekday=0), monday)
+    assert not kickbot.purge_policy_due(policy(weekday=1), monday)
+    # Ran in today's slot already; yesterday's run doesn't count
+    assert not kickbot.purge_policy_due(policy(last_run='2026-03-02 03:00:00.000000'), monday)
+    assert kickbot.purge_policy_due(policy(last_run='2026-03-01 03:00:00.000000'), monday)
+
+
+def test_skipped_policy_purge_stays_due(kickbot, database, monkeypatch):
+    policy_id = db_utils.insert_purge_policy(-1, None, 0, '7d', False, 'admin', None)
+    monkeypatch.setattr(kickbot, 'is_leader', False)
+
+    async def check():
+        await kickbot.run_due_purge_policies()
+        pending = kickbot.policy_purge_tasks[policy_id]
+        # A second check while the first purge is still pending doesn't start another
+        await kickbot.run_due_purge_policies()
+        assert kickbot.policy_purge_tasks[policy_id] is pending
+        await asyncio.gather(*kickbot.policy_purge_tasks.values())
+        await asyncio.sleep(0)
+
+    asyncio.run(check())
+    assert not kickbot.policy_purge_tasks
+    [stored] = db_utils.get_purge_policies(-1)
+    assert stored['last_run'] is None
+    assert kickbot.purge_policy_due(stored, datetime.utcnow())